@@ -23,10 +23,9 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
-import os
-import subprocess
-
+import click
 from ripley.factory import create_app
+from ripley.lib.startup import load_environment
 
 """Usage mode A:
 
@@ -38,17 +37,15 @@ Usage mode B:
 >>> flask run --help
 >>> flask run --debugger
 >>> flask initdb
+>>> flask worker
+>>> flask serve
 """
 
 # When running under WSGI, system environment variables are not automatically made available to Python code, and
-# an app restart will result in configurations being lost. We work around this with an explicit load from the shell
-# environment, sourcing from the Elastic Beanstalk-provided /opt/python/current/env file if available.
+# an app restart will result in configurations being lost. We work around this with an explicit load from the
+# Elastic Beanstalk-provided /opt/python/current/env file, falling back to the shell environment.
 if __name__.startswith('_mod_wsgi'):
-    command = ['bash', '-c', ' env']
-    shell_environment = subprocess.Popen(command, stdout=subprocess.PIPE)
-    for line in shell_environment.stdout:
-        key, _, value = line.decode('utf-8').rstrip().partition('=')
-        os.environ[key] = value
+    load_environment()
 
 application = create_app()
 
@@ -59,6 +56,53 @@ def initdb():
     development_db.load(create_test_data=False)
 
 
+@application.cli.command()
+@click.option('--concurrency', type=int, default=None, help='Worker threads. Defaults to JOB_CONCURRENCY.')
+@click.option('--once', is_flag=True, help='Run the jobs that are due, then exit.')
+def worker(concurrency, once):
+    """Run queued and scheduled jobs, outside the web request path."""
+    from ripley.jobs.worker import Worker
+    Worker(application, concurrency=concurrency).run(once=once)
+
+
+@application.cli.command('enqueue-job')
+@click.argument('job_key')
+def enqueue_job(job_key):
+    from ripley.jobs.job_queue import enqueue
+    job_id = enqueue(job_key)
+    click.echo(f'Queued job {job_id}.' if job_id else f'{job_key} is already queued or running.')
+
+
+@application.cli.command()
+@click.option('--workers', type=int, default=None, help='Worker processes. Defaults to SERVER_WORKERS.')
+@click.option('--threads', type=int, default=None, help='Request threads per worker. Defaults to SERVER_THREADS.')
+def serve(workers, threads):
+    """Serve HTTP from worker processes forked after startup, which share the startup work and memory."""
+    from ripley.lib import prefork
+    prefork.serve(
+        application,
+        workers=application.config['SERVER_WORKERS'] if workers is None else workers,
+        threads=threads or application.config['SERVER_THREADS'],
+    )
+
+
+@application.cli.command('startup-profile')
+@click.option('--top', type=int, default=25, help='Number of imports to list, costliest first.')
+def startup_profile(top):
+    """Time the phases of app startup, and the imports behind it, in a fresh interpreter."""
+    from ripley.lib.startup import profile_startup
+    profile = profile_startup(top=top)
+    click.echo(f"{'phase':<24}{'ms':>10}")
+    click.echo(f"{'imports':<24}{profile['importSeconds'] * 1000:>10.1f}")
+    for phase in profile['phases']:
+        click.echo(f"{phase['name']:<24}{phase['seconds'] * 1000:>10.1f}")
+    click.echo(f"{'total':<24}{(profile['importSeconds'] + profile['totalSeconds']) * 1000:>10.1f}")
+    click.echo()
+    click.echo(f"{'cumulative ms':>14}{'self ms':>10}  module")
+    for entry in profile['imports']:
+        click.echo(f"{entry['cumulativeSeconds'] * 1000:>14.1f}{entry['selfSeconds'] * 1000:>10.1f}  {'  ' * entry['depth']}{entry['module']}")
+
+
 host = application.config['HOST']
 port = application.config['PORT']
 
@@ -24,8 +24,12 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 # Development environment.
+ACCESS_LOG_LOCATION = 'STDOUT'
+
 DEBUG = True
 
+FRONT_END_SHELL_WATCH = True
+
 INDEX_HTML = 'index.html'
 
 VUE_LOCALHOST_BASE_URL = 'http://localhost:8080'
@@ -22,8 +22,12 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
 ENHANCEMENTS, OR MODIFICATIONS.
 """
+from contextlib import contextmanager
+import time
+
 from flask import current_app as app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 
 __version__ = '0.1'
@@ -37,12 +41,18 @@ def std_commit(allow_test_environment=False):
     This function follows the suggested default, which is to roll back and close the active session, letting the pooled
     connection start a new transaction cleanly. WARNING: Session closure will invalidate any in-memory DB entities. Rows
     will have to be reloaded from the DB to be read or updated.
+
+    Within a savepoint (db.session.begin_nested), only flush: the caller that began the savepoint commits when its unit
+    of work is done.
     """
     # Give a hoot, don't pollute.
     if app.config['TESTING'] and not allow_test_environment:
         # When running tests, session flush generates id and timestamps that would otherwise show up during a commit.
         db.session.flush()
         return
+    if db.session().in_nested_transaction():
+        db.session.flush()
+        return
     successful_commit = False
     try:
         db.session.commit()
@@ -53,3 +63,96 @@ def std_commit(allow_test_environment=False):
     finally:
         if not successful_commit:
             db.session.close()
+
+
+@contextmanager
+def batched_commit(every=500, allow_test_environment=False):
+    """Write many rows in one unit of work, committed in chunks.
+
+    Wrap the work for each row in batch.item(). Each item runs inside a savepoint: if it fails with a SQLAlchemyError,
+    only that item is rolled back and counted in batch.error_count (batch.errors keeps the first 100). Every 'every'
+    items, the batch is committed per std_commit (flush-only in the test environment). Pending items are committed when
+    the block exits normally, and rolled back if the block raises.
+
+        with batched_commit(every=500) as batch:
+            for member in members:
+                with batch.item(member.email_address):
+                    db.session.add(member)
+        app.logger.info(batch.stats())
+    """
+    batch = CommitBatch(every=every, allow_test_environment=allow_test_environment)
+    try:
+        yield batch
+    except Exception:
+        db.session.rollback()
+        raise
+    batch.commit()
+
+
+def stream_query(sql, params=None, yield_per=1000):
+    """Yield rows of a query, fetched yield_per at a time, without loading the result set. On PostgreSQL the cursor is server-side."""
+    connection = db.session.connection().execution_options(stream_results=True, yield_per=yield_per)
+    result = connection.execute(text(sql), params or {})
+    try:
+        for partition in result.partitions(yield_per):
+            yield from partition
+    finally:
+        result.close()
+
+
+class CommitBatch:
+
+    def __init__(self, every, allow_test_environment):
+        self.allow_test_environment = allow_test_environment
+        self.batches = []
+        self.error_count = 0
+        self.errors = []
+        self.every = every
+        self.item_count = 0
+        self._pending_errors = 0
+        self._pending_items = 0
+        self._started_at = time.perf_counter()
+
+    @contextmanager
+    def item(self, description=None):
+        savepoint = db.session.begin_nested()
+        try:
+            yield
+            savepoint.commit()
+            self._pending_items += 1
+        except SQLAlchemyError as e:
+            savepoint.rollback()
+            self._pending_errors += 1
+            if len(self.errors) < 100:
+                self.errors.append({'item': description, 'error': str(e.orig if hasattr(e, 'orig') else e).strip()})
+            app.logger.warning(f'Rolled back {description or "item"} in batch {len(self.batches) + 1}: {e}')
+        except Exception:
+            savepoint.rollback()
+            raise
+        if self._pending_items + self._pending_errors >= self.every:
+            self.commit()
+
+    def commit(self):
+        if not self._pending_items and not self._pending_errors:
+            return
+        std_commit(allow_test_environment=self.allow_test_environment)
+        now = time.perf_counter()
+        self.batches.append({
+            'errors': self._pending_errors,
+            'items': self._pending_items,
+            'seconds': round(now - self._started_at, 4),
+        })
+        app.logger.debug(f'Committed batch {len(self.batches)}: {self.batches[-1]}')
+        self.error_count += self._pending_errors
+        self.item_count += self._pending_items
+        self._pending_errors = 0
+        self._pending_items = 0
+        self._started_at = now
+
+    def stats(self):
+        return {
+            'batches': len(self.batches),
+            'errors': self.error_count,
+            'items': self.item_count,
+            'seconds': round(sum(b['seconds'] for b in self.batches), 4),
+        }
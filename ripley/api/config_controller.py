@@ -24,11 +24,19 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 from collections import OrderedDict
 import json
+import os
+import time
 
 from flask import current_app as app
 from ripley import __version__ as version
-from ripley.lib.http import tolerant_jsonify
+from ripley.lib.http import conditional_response, tolerant_json_dumps
 from ripley.lib.util import get_eb_environment
+from werkzeug.http import generate_etag
+
+# Config and version payloads cannot change after app startup, except for a redeployed build summary. Both are
+# serialized once; the build summary file is re-checked at most every BUILD_SUMMARY_CHECK_INTERVAL seconds.
+
+BUILD_SUMMARY_PATH = 'config/build-summary.json'
 
 PUBLIC_CONFIGS = [
     'DEV_AUTH_ENABLED',
@@ -39,6 +47,43 @@ PUBLIC_CONFIGS = [
 
 @app.route('/api/config')
 def app_config():
+    payload = _get_payloads()['config']
+    return conditional_response(payload['content'], etag=payload['etag'])
+
+
+@app.route('/api/version')
+def app_version():
+    _reload_build_summary_if_changed()
+    payload = _get_payloads()['version']
+    return conditional_response(payload['content'], etag=payload['etag'])
+
+
+def load_json(relative_path):
+    try:
+        with open(app.config['BASE_DIR'] + '/' + relative_path) as file:
+            return json.load(file)
+    except (FileNotFoundError, KeyError, TypeError):
+        return None
+
+
+def reload_api_payloads():
+    """Serialize the config and version payloads. Call again after a change to configs or the build summary."""
+    app.extensions['api_payloads'] = {
+        'config': _serialize(_config_json()),
+        'version': _serialize(_version_json()),
+        'versionCheckedAt': time.monotonic(),
+        'versionMtime': _build_summary_mtime(),
+    }
+
+
+def _build_summary_mtime():
+    try:
+        return os.stat(app.config['BASE_DIR'] + '/' + BUILD_SUMMARY_PATH).st_mtime
+    except (FileNotFoundError, KeyError, TypeError):
+        return None
+
+
+def _config_json():
     def _to_api_key(key):
         chunks = key.split('_')
         return f"{chunks[0].lower()}{''.join(chunk.title() for chunk in chunks[1:])}"
@@ -49,20 +94,37 @@ def app_config():
             'ebEnvironment': get_eb_environment(),
         },
     }
-    return tolerant_jsonify(OrderedDict(sorted(api_json.items())))
+    return OrderedDict(sorted(api_json.items()))
 
 
-@app.route('/api/version')
-def app_version():
-    build_stats = load_json('config/build-summary.json')
-    v = {'version': version}
-    v.update(build_stats or {'build': None})
-    return tolerant_jsonify(v)
+def _get_payloads():
+    if 'api_payloads' not in app.extensions:
+        reload_api_payloads()
+    return app.extensions['api_payloads']
 
 
-def load_json(relative_path):
-    try:
-        file = open(app.config['BASE_DIR'] + '/' + relative_path)
-        return json.load(file)
-    except (FileNotFoundError, KeyError, TypeError):
-        return None
+def _reload_build_summary_if_changed():
+    interval = app.config['BUILD_SUMMARY_CHECK_INTERVAL']
+    payloads = _get_payloads()
+    if interval is None or time.monotonic() - payloads['versionCheckedAt'] < interval:
+        return
+    mtime = _build_summary_mtime()
+    if mtime != payloads['versionMtime']:
+        payloads['version'] = _serialize(_version_json())
+        payloads['versionMtime'] = mtime
+    payloads['versionCheckedAt'] = time.monotonic()
+
+
+def _serialize(obj):
+    content = tolerant_json_dumps(obj).encode('utf-8')
+    return {
+        'content': content,
+        'etag': generate_etag(content),
+    }
+
+
+def _version_json():
+    build_stats = load_json(BUILD_SUMMARY_PATH)
+    v = {'version': version}
+    v.update(build_stats or {'build': None})
+    return v
@@ -0,0 +1,67 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from flask import current_app as app, request
+from ripley.api.errors import BadRequestError, ResourceNotFoundError
+from ripley.api.util import admin_required
+from ripley.lib.http import tolerant_jsonify_stream
+from ripley.models.mailing_list import MailingList
+from ripley.models.mailing_list_members import MailingListMembers
+
+# Members are paginated by keyset: pass the id of the last member received as 'after' to get the next page. A page
+# shorter than 'limit' is the last. With format=ndjson the default is no limit, for export of the whole list.
+
+
+@app.route('/api/mailing_lists/<int:mailing_list_id>/members')
+@admin_required
+def get_mailing_list_members(mailing_list_id):
+    if not MailingList.query.filter_by(id=mailing_list_id).first():
+        raise ResourceNotFoundError(f'Mailing list {mailing_list_id} not found.')
+    ndjson = request.args.get('format') == 'ndjson'
+    after_id = _get_int_arg('after', 0)
+    default_limit = None if ndjson else app.config['MAILING_LIST_MEMBERS_PAGE_SIZE']
+    limit = _get_int_arg('limit', default_limit)
+    if not ndjson and limit > app.config['MAILING_LIST_MEMBERS_MAX_PAGE_SIZE']:
+        raise BadRequestError(f"The limit must not exceed {app.config['MAILING_LIST_MEMBERS_MAX_PAGE_SIZE']}.")
+    members = MailingListMembers.stream_mailing_list_members(
+        mailing_list_id,
+        after_id=after_id,
+        include_deleted=request.args.get('includeDeleted') == 'true',
+        limit=limit,
+    )
+    return tolerant_jsonify_stream(members, ndjson=ndjson)
+
+
+def _get_int_arg(key, default):
+    value = request.args.get(key)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        value = -1
+    if value < 0 or (key == 'limit' and value == 0):
+        raise BadRequestError(f"Invalid '{key}' parameter: {request.args.get(key)}")
+    return value
@@ -25,6 +25,13 @@ ENHANCEMENTS, OR MODIFICATIONS.
 import importlib.util
 import os
 
+# Where an unset external service (Canvas, CalNet, SMTP, Redis) may be replaced by a local stand-in.
+STAND_IN_ENVIRONMENTS = ['demo', 'test']
+
+
+class ConfigurationError(ValueError):
+    pass
+
 
 def load_configs(app):
     """On app creation, load and override configs.
@@ -54,3 +61,9 @@ def load_local_config(app, config_name):
     configs_location = os.environ.get('RIPLEY_LOCAL_CONFIGS') or '../config'
     config_path = configs_location + '/' + config_name
     app.config.from_pyfile(config_path, silent=True)
+
+
+def require_stand_in_allowed(app, setting):
+    """Allow a local stand-in for an unset service only when testing or in a demo. Elsewhere, the unset setting is an error."""
+    if not (app.config['TESTING'] or app.config['RIPLEY_ENV'] in STAND_IN_ENVIRONMENTS):
+        raise ConfigurationError(f"{setting} is not configured. Local stand-ins run only in {' and '.join(STAND_IN_ENVIRONMENTS)} environments.")
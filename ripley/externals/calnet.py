@@ -0,0 +1,256 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+from concurrent.futures import Future
+from contextlib import contextmanager
+import queue
+import threading
+
+from flask import current_app as app
+import ldap3
+from ldap3.core.exceptions import LDAPBindError
+from ldap3.utils.conv import escape_filter_chars
+from ripley.configs import require_stand_in_allowed
+
+# CalNet directory (LDAP) client.
+#
+# Connections are pooled per app. Lookups of many UIDs are issued as chunked OR-filter searches, and concurrent lookups
+# of the same UID share a single in-flight search.
+
+ATTRIBUTES = [
+    'berkeleyEduAffiliations',
+    'berkeleyEduCSID',
+    'berkeleyEduOfficialEmail',
+    'cn',
+    'departmentNumber',
+    'displayName',
+    'givenName',
+    'mail',
+    'sn',
+    'uid',
+]
+EXPIRED_PEOPLE_BASE = 'ou=expired people,dc=berkeley,dc=edu'
+PEOPLE_BASE = 'ou=people,dc=berkeley,dc=edu'
+
+_client_lock = threading.Lock()
+
+
+def get_calnet_user_for_uid(uid):
+    return get_calnet_users_for_uids([uid]).get(str(uid))
+
+
+def get_calnet_users_for_uids(uids):
+    """Return a dict of CalNet profiles keyed by UID. Unknown UIDs are omitted."""
+    return _get_client().get_users(uids)
+
+
+class Client:
+
+    def __init__(self, connection_factory, batch_size=500, pool_size=4, pool_timeout=30):
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(connection_factory, size=pool_size, timeout=pool_timeout)
+        self.search_count = 0
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+
+    def get_users(self, uids):
+        uids = list(dict.fromkeys(str(uid) for uid in uids if uid))
+        claimed = []
+        futures = {}
+        with self._inflight_lock:
+            for uid in uids:
+                future = self._inflight.get(uid)
+                if future is None:
+                    future = self._inflight[uid] = Future()
+                    claimed.append(uid)
+                futures[uid] = future
+        if claimed:
+            try:
+                profiles = self._search(claimed)
+                for uid in claimed:
+                    futures[uid].set_result(profiles.get(uid))
+            except Exception as e:
+                for uid in claimed:
+                    if not futures[uid].done():
+                        futures[uid].set_exception(e)
+                raise
+            finally:
+                with self._inflight_lock:
+                    for uid in claimed:
+                        self._inflight.pop(uid, None)
+        results = {}
+        for uid, future in futures.items():
+            profile = future.result()
+            if profile:
+                results[uid] = profile
+        return results
+
+    def _search(self, uids):
+        profiles = {}
+        for search_base, expired in [(PEOPLE_BASE, False), (EXPIRED_PEOPLE_BASE, True)]:
+            remaining = [uid for uid in uids if uid not in profiles]
+            for i in range(0, len(remaining), self.batch_size):
+                chunk = remaining[i:i + self.batch_size]
+                for entry in self._search_chunk(search_base, chunk):
+                    profile = _to_profile(entry, expired)
+                    profiles[profile['uid']] = profile
+        return profiles
+
+    def _search_chunk(self, search_base, uids):
+        search_filter = _uid_filter(uids)
+        with self._inflight_lock:
+            self.search_count += 1
+        with self.pool.connection() as connection:
+            connection.search(search_base, search_filter, attributes=ATTRIBUTES, size_limit=len(uids))
+            return [entry['attributes'] for entry in connection.response or [] if entry.get('type') == 'searchResEntry']
+
+
+class ConnectionPool:
+    """A fixed-size pool of bound LDAP connections, created lazily and discarded on error."""
+
+    def __init__(self, connection_factory, size=4, timeout=30):
+        self.connection_factory = connection_factory
+        self.size = size
+        self.timeout = timeout
+        self._created = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        except Exception:
+            self._discard(connection)
+            raise
+        else:
+            self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                connection = self.connection_factory()
+                # A failed lookup must raise: read as "no entries found", it would mark users expired.
+                if not connection.bind():
+                    raise LDAPBindError(f'LDAP bind failed: {getattr(connection, "result", None)}')
+                return connection
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No LDAP connection became available within {self.timeout} seconds')
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.unbind()
+        except Exception as e:
+            app.logger.warning(f'Failed to unbind LDAP connection: {e}')
+
+
+def _get_client():
+    client = app.extensions.get('calnet')
+    if client is None:
+        with _client_lock:
+            client = app.extensions.get('calnet')
+            if client is None:
+                client = app.extensions['calnet'] = Client(
+                    batch_size=app.config['LDAP_BATCH_SIZE'],
+                    connection_factory=_connection_factory(app),
+                    pool_size=app.config['LDAP_POOL_SIZE'],
+                    pool_timeout=app.config['LDAP_TIMEOUT'],
+                )
+    return client
+
+
+def _connection_factory(flask_app):
+    host = flask_app.config['LDAP_HOST']
+    if not host:
+        require_stand_in_allowed(flask_app, 'LDAP_HOST')
+        from ripley.externals.fake_calnet import FakeDirectory
+        directory = FakeDirectory.from_fixtures(flask_app.config['FIXTURES_PATH'])
+        return directory.connection
+    server = ldap3.Server(host, port=636, use_ssl=True, get_info=ldap3.NONE, connect_timeout=flask_app.config['LDAP_TIMEOUT'])
+
+    def _connection():
+        return ldap3.Connection(
+            server,
+            user=flask_app.config['LDAP_BIND'],
+            password=flask_app.config['LDAP_PASSWORD'],
+            auto_bind=ldap3.AUTO_BIND_NONE,
+            raise_exceptions=True,
+            receive_timeout=flask_app.config['LDAP_TIMEOUT'],
+        )
+    return _connection
+
+
+def _get_attribute(entry, key):
+    value = entry.get(key)
+    if isinstance(value, list):
+        return value[0] if value else None
+    return value
+
+
+def _to_profile(entry, expired):
+    first_name = _get_attribute(entry, 'givenName')
+    last_name = _get_attribute(entry, 'sn')
+    name = _get_attribute(entry, 'displayName') or ' '.join(n for n in [first_name, last_name] if n) or None
+    return {
+        'affiliations': entry.get('berkeleyEduAffiliations') or [],
+        'campusEmail': _get_attribute(entry, 'mail'),
+        'csid': _get_attribute(entry, 'berkeleyEduCSID'),
+        'deptCode': _get_attribute(entry, 'departmentNumber'),
+        'email': _get_attribute(entry, 'berkeleyEduOfficialEmail') or _get_attribute(entry, 'mail'),
+        'firstName': first_name,
+        'isExpiredPerLdap': expired,
+        'lastName': last_name,
+        'name': name,
+        'uid': str(_get_attribute(entry, 'uid')),
+    }
+
+
+def _uid_filter(uids):
+    clauses = ''.join(f'(uid={escape_filter_chars(uid)})' for uid in uids)
+    return clauses if len(uids) == 1 else f'(|{clauses})'
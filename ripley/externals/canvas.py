@@ -0,0 +1,285 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from concurrent.futures import as_completed, ThreadPoolExecutor
+from contextlib import nullcontext
+import threading
+import time
+
+from flask import current_app as app, has_app_context
+from requests import Session
+from requests.adapters import HTTPAdapter
+from ripley.configs import ConfigurationError, require_stand_in_allowed
+from ripley.lib.cache import memoize
+from ripley.lib.http_cache import HttpCache
+from ripley.lib.metrics import registry as metrics_registry
+
+# Canvas REST API client.
+#
+# One keep-alive requests.Session per app, with a connection pool sized for CANVAS_POOL_SIZE concurrent requests.
+# Paginated endpoints are generators that follow 'Link: rel=next' headers, so items stream page by page. Work across
+# many sites fans out over a bounded thread pool. Canvas meters each access token with a leaky bucket, reported in the
+# X-Rate-Limit-Remaining header: requests slow down as the bucket drains and back off exponentially when throttled.
+# Responses are cached and revalidated by ETag, if CANVAS_HTTP_CACHE_ENABLED. See ripley.lib.http_cache.
+
+_client_lock = threading.Lock()
+
+
+def get_account_courses(account_id, term_id=None):
+    params = {'enrollment_term_id': term_id} if term_id else {}
+    return _get_client().paginate(f'/api/v1/accounts/{account_id}/courses', params)
+
+
+@memoize()
+def get_course(course_id):
+    return _get_client().get(f'/api/v1/courses/{course_id}')
+
+
+def get_course_sections(course_id):
+    return _get_client().paginate(f'/api/v1/courses/{course_id}/sections')
+
+
+def get_course_users(course_id, enrollment_types=None):
+    params = {'include[]': ['email', 'enrollments']}
+    if enrollment_types:
+        params['enrollment_type[]'] = enrollment_types
+    return _get_client().paginate(f'/api/v1/courses/{course_id}/users', params)
+
+
+def http_cache_report(label):
+    """Context manager yielding a dict of HTTP cache counts (e.g., bytes saved, requests avoided) filled on exit."""
+    http_cache = _get_client().http_cache
+    return http_cache.report(label) if http_cache else nullcontext({})
+
+
+def fan_out(fn, items, return_exceptions=False):
+    """Call fn(item) for each item on the Canvas thread pool. Yield (item, result) pairs in order of completion."""
+    return _get_client().fan_out(fn, items, return_exceptions=return_exceptions)
+
+
+class CanvasApiError(Exception):
+
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class Client:
+
+    def __init__(
+        self,
+        base_url,
+        access_token,
+        http_cache=None,
+        max_retries=5,
+        per_page=100,
+        pool_size=8,
+        rate_limit_threshold=200,
+        timeout=30,
+    ):
+        self.base_url = base_url.rstrip('/')
+        self.access_token = access_token
+        self.http_cache = http_cache
+        self.max_retries = max_retries
+        self.per_page = per_page
+        self.pool_size = pool_size
+        self.rate_limiter = RateLimiter(threshold=rate_limit_threshold)
+        self.timeout = timeout
+        self.session = Session()
+        self.session.headers['Authorization'] = f'Bearer {access_token}'
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def get(self, path, params=None):
+        return self._request(f'{self.base_url}{path}', params).json()
+
+    def paginate(self, path, params=None):
+        """Yield the items of each page in turn. Only one page is held in memory at a time."""
+        url = f'{self.base_url}{path}'
+        params = {**(params or {}), 'per_page': self.per_page}
+        while url:
+            response = self._request(url, params)
+            yield from response.json()
+            url = response.links.get('next', {}).get('url')
+            # The next link carries the original query string.
+            params = None
+
+    def fan_out(self, fn, items, return_exceptions=False):
+        fn = _in_app_context(fn)
+        futures = {self._get_executor().submit(fn, item): item for item in items}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                yield item, future.result()
+            except Exception as e:
+                if not return_exceptions:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                yield item, e
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix='canvas')
+        return self._executor
+
+    def _request(self, url, params=None):
+        if self.http_cache:
+            return self.http_cache.get(url, params, lambda headers: self._send(url, params, headers), scope=self.access_token)
+        return self._send(url, params)
+
+    def _send(self, url, params=None, headers=None):
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.wait()
+            start = time.perf_counter()
+            response = self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+            metrics_registry.observe('ripley_canvas_request_duration_seconds', time.perf_counter() - start)
+            metrics_registry.inc('ripley_canvas_requests_total', (('status', str(response.status_code)),))
+            self.rate_limiter.update(response.headers.get('X-Rate-Limit-Remaining'))
+            if _is_throttled(response):
+                metrics_registry.inc('ripley_canvas_throttled_total')
+                delay = self.rate_limiter.throttled()
+                app.logger.warning(f'Canvas throttled {url} (attempt {attempt + 1}); backing off {delay:.2f} s.')
+                continue
+            self.rate_limiter.succeeded()
+            if response.status_code >= 400:
+                raise CanvasApiError(f'Canvas API {response.status_code} on {url}: {response.text[:200]}', response.status_code)
+            return response
+        raise CanvasApiError(f'Canvas API throttled {url} after {self.max_retries} retries', 403)
+
+
+class RateLimiter:
+    """Adaptive pacing shared by all threads of a client.
+
+    While X-Rate-Limit-Remaining is above the threshold, requests go out immediately. Below it, each request waits in
+    proportion to how far the bucket has drained, up to max_delay. After a throttled response the wait doubles, from
+    initial_backoff up to max_delay, and halves again with each successful response.
+    """
+
+    def __init__(self, threshold=200, initial_backoff=0.25, max_delay=30):
+        self.backoff = 0
+        self.initial_backoff = initial_backoff
+        self.max_delay = max_delay
+        self.remaining = None
+        self.threshold = threshold
+        self._lock = threading.Lock()
+
+    def delay(self):
+        with self._lock:
+            pacing = 0
+            if self.remaining is not None and self.remaining < self.threshold:
+                pacing = self.max_delay * (1 - self.remaining / self.threshold) ** 2
+            return min(max(pacing, self.backoff), self.max_delay)
+
+    def succeeded(self):
+        with self._lock:
+            self.backoff = self.backoff / 2 if self.backoff > self.initial_backoff else 0
+
+    def throttled(self):
+        with self._lock:
+            self.backoff = min(max(self.backoff * 2, self.initial_backoff), self.max_delay)
+            return self.backoff
+
+    def update(self, remaining):
+        if remaining is None:
+            return
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return
+        with self._lock:
+            self.remaining = remaining
+
+    def wait(self):
+        delay = self.delay()
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+def _get_client():
+    client = app.extensions.get('canvas')
+    if client is None:
+        with _client_lock:
+            client = app.extensions.get('canvas')
+            if client is None:
+                client = app.extensions['canvas'] = Client(
+                    access_token=app.config['CANVAS_ACCESS_TOKEN'],
+                    base_url=app.config['CANVAS_API_URL'] or _start_fake_canvas(app),
+                    http_cache=_create_http_cache(app),
+                    max_retries=app.config['CANVAS_MAX_RETRIES'],
+                    per_page=app.config['CANVAS_PER_PAGE'],
+                    pool_size=app.config['CANVAS_POOL_SIZE'],
+                    rate_limit_threshold=app.config['CANVAS_RATE_LIMIT_THRESHOLD'],
+                    timeout=app.config['CANVAS_TIMEOUT'],
+                )
+    return client
+
+
+def _create_http_cache(flask_app):
+    if not flask_app.config['CANVAS_HTTP_CACHE_ENABLED']:
+        return None
+    if not flask_app.config['CANVAS_HTTP_CACHE_DIR']:
+        raise ConfigurationError('CANVAS_HTTP_CACHE_DIR is required when CANVAS_HTTP_CACHE_ENABLED')
+    return HttpCache(
+        directory=flask_app.config['CANVAS_HTTP_CACHE_DIR'],
+        max_bytes=flask_app.config['CANVAS_HTTP_CACHE_MAX_BYTES'],
+        ttls=flask_app.config['CANVAS_HTTP_CACHE_TTLS'],
+    )
+
+
+def _in_app_context(fn):
+    # Pool threads do not inherit the caller's app context.
+    if not has_app_context():
+        return fn
+    flask_app = app._get_current_object()
+
+    def _fn(item):
+        with flask_app.app_context():
+            return fn(item)
+    return _fn
+
+
+def _is_throttled(response):
+    # Canvas answers '403 Forbidden (Rate Limit Exceeded)' when the bucket is empty.
+    return response.status_code == 429 or (response.status_code == 403 and 'Rate Limit Exceeded' in response.text)
+
+
+def _start_fake_canvas(flask_app):
+    require_stand_in_allowed(flask_app, 'CANVAS_API_URL')
+    from ripley.externals.fake_canvas import FakeCanvas, FakeCanvasServer
+    server = FakeCanvasServer(FakeCanvas.from_fixtures(flask_app.config['FIXTURES_PATH']))
+    flask_app.extensions['fake_canvas_server'] = server
+    return server.start()
@@ -0,0 +1,117 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import json
+import os
+import re
+import time
+
+from ripley.externals.calnet import EXPIRED_PEOPLE_BASE, PEOPLE_BASE
+
+# Local stand-in for the CalNet directory, used when LDAP_HOST is not configured (e.g., tests and benchmarks).
+#
+# Entries are indexed by UID. Only the equality and OR-of-equality UID filters issued by the CalNet client are supported.
+# An optional per-search latency approximates the network round trip of a real directory.
+
+UID_CLAUSE = re.compile(r'\(uid=([^()]*)\)')
+
+
+class FakeDirectory:
+
+    def __init__(self, latency=0):
+        self.latency = latency
+        self.entries = {
+            EXPIRED_PEOPLE_BASE: {},
+            PEOPLE_BASE: {},
+        }
+
+    @classmethod
+    def from_fixtures(cls, fixtures_path):
+        directory = cls()
+        path = fixtures_path and os.path.join(fixtures_path, 'calnet_entries.json')
+        if path and os.path.exists(path):
+            with open(path) as file:
+                fixtures = json.load(file)
+            for entry in fixtures.get('people', []):
+                directory.add_entry(entry)
+            for entry in fixtures.get('expired', []):
+                directory.add_entry(entry, expired=True)
+        return directory
+
+    def add_entry(self, attributes, expired=False):
+        search_base = EXPIRED_PEOPLE_BASE if expired else PEOPLE_BASE
+        self.entries[search_base][str(attributes['uid'])] = attributes
+
+    def connection(self):
+        return FakeConnection(self)
+
+
+class FakeConnection:
+    """Mimics the subset of ldap3.Connection used by the CalNet client."""
+
+    def __init__(self, directory):
+        self.bound = False
+        self.directory = directory
+        self.response = None
+
+    def bind(self):
+        self.bound = True
+        return True
+
+    def unbind(self):
+        self.bound = False
+        return True
+
+    def search(self, search_base, search_filter, attributes=None, size_limit=0):
+        if self.directory.latency:
+            time.sleep(self.directory.latency)
+        entries = self.directory.entries.get(search_base, {})
+        self.response = []
+        for uid in UID_CLAUSE.findall(search_filter):
+            entry = entries.get(_unescape(uid))
+            if entry:
+                self.response.append({
+                    'attributes': {key: value for key, value in entry.items() if not attributes or key in attributes},
+                    'dn': f'uid={entry["uid"]},{search_base}',
+                    'type': 'searchResEntry',
+                })
+        return bool(self.response)
+
+
+def generate_entries(count, first_uid=10000000):
+    for uid in range(first_uid, first_uid + count):
+        yield {
+            'berkeleyEduAffiliations': ['STUDENT-TYPE-REGISTERED'],
+            'berkeleyEduCSID': str(uid + 20000000),
+            'berkeleyEduOfficialEmail': f'student{uid}@berkeley.edu',
+            'displayName': f'Student {uid}',
+            'givenName': 'Student',
+            'mail': f'student{uid}@berkeley.edu',
+            'sn': str(uid),
+            'uid': str(uid),
+        }
+
+
+def _unescape(value):
+    return re.sub(r'\\([0-9a-fA-F]{2})', lambda m: chr(int(m.group(1), 16)), value)
@@ -0,0 +1,242 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlencode, urlparse
+
+# Local stand-in for the Canvas REST API, used when CANVAS_API_URL is not configured (e.g., tests and benchmarks).
+#
+# FakeCanvasServer serves a FakeCanvas dataset over HTTP on localhost, with Canvas-style 'Link' pagination headers, weak
+# ETags honoring If-None-Match, and a leaky-bucket rate limit reported in X-Rate-Limit-Remaining. Only the endpoints used
+# by the Canvas client are supported.
+
+ROUTES = [
+    (re.compile(r'^/api/v1/accounts/(\d+)/courses$'), 'account_courses'),
+    (re.compile(r'^/api/v1/courses/(\d+)$'), 'course'),
+    (re.compile(r'^/api/v1/courses/(\d+)/sections$'), 'course_sections'),
+    (re.compile(r'^/api/v1/courses/(\d+)/users$'), 'course_users'),
+]
+
+
+class FakeCanvas:
+
+    def __init__(self, bucket_size=700, latency=0, leak_rate=10, request_cost=0):
+        self.bucket_size = bucket_size
+        self.bytes_sent = 0
+        self.courses = {}
+        self.latency = latency
+        self.leak_rate = leak_rate
+        self.not_modified_count = 0
+        self.request_count = 0
+        self.request_cost = request_cost
+        self.throttled_count = 0
+        self._bucket = 0
+        self._bucket_updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_fixtures(cls, fixtures_path):
+        canvas = cls()
+        path = fixtures_path and os.path.join(fixtures_path, 'canvas_courses.json')
+        if path and os.path.exists(path):
+            with open(path) as file:
+                for course in json.load(file):
+                    canvas.add_course(**course)
+        return canvas
+
+    def add_course(self, course, sections=(), users=()):
+        self.courses[int(course['id'])] = {'course': course, 'sections': list(sections), 'users': list(users)}
+
+    def consume(self):
+        """Charge one request to the bucket. Return the remaining allowance, or None if the request is throttled."""
+        with self._lock:
+            now = time.monotonic()
+            self._bucket = max(0, self._bucket - (now - self._bucket_updated_at) * self.leak_rate)
+            self._bucket_updated_at = now
+            self.request_count += 1
+            if self._bucket + self.request_cost > self.bucket_size:
+                self.throttled_count += 1
+                return None
+            self._bucket += self.request_cost
+            return self.bucket_size - self._bucket
+
+    def resolve(self, path, query):
+        for pattern, name in ROUTES:
+            match = pattern.match(path)
+            if match:
+                return getattr(self, f'_{name}')(int(match.group(1)), query)
+        return None
+
+    def _account_courses(self, account_id, query):
+        term_id = query.get('enrollment_term_id', [None])[0]
+        courses = [c['course'] for c in self.courses.values() if c['course'].get('account_id') == account_id]
+        return [c for c in courses if not term_id or str(c.get('enrollment_term_id')) == term_id]
+
+    def _course(self, course_id, query):
+        course = self.courses.get(course_id)
+        return course and course['course']
+
+    def _course_sections(self, course_id, query):
+        course = self.courses.get(course_id)
+        return course and course['sections']
+
+    def _course_users(self, course_id, query):
+        course = self.courses.get(course_id)
+        if not course:
+            return None
+        types = {f'{t.capitalize()}Enrollment' for t in query.get('enrollment_type[]', [])}
+        if not types:
+            return course['users']
+        return [u for u in course['users'] if any(e['type'] in types for e in u.get('enrollments', []))]
+
+
+class FakeCanvasServer:
+
+    def __init__(self, canvas, host='127.0.0.1', port=0):
+        handler = type('FakeCanvasHandler', (FakeCanvasHandler,), {'canvas': canvas})
+        self.canvas = canvas
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, args=(0.05,), name='fake-canvas', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class FakeCanvasHandler(BaseHTTPRequestHandler):
+    canvas = None
+    # Headers and body go out in separate writes; without TCP_NODELAY each response waits on a delayed ACK.
+    disable_nagle_algorithm = True
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # noqa: N802
+        if not self.headers.get('Authorization', '').startswith('Bearer '):
+            return self._respond(401, {'errors': [{'message': 'Invalid access token.'}]})
+        remaining = self.canvas.consume()
+        if remaining is None:
+            return self._respond(403, '403 Forbidden (Rate Limit Exceeded)', {'X-Rate-Limit-Remaining': '0.0'})
+        if self.canvas.latency:
+            time.sleep(self.canvas.latency)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        result = self.canvas.resolve(url.path, query)
+        headers = {'X-Rate-Limit-Remaining': f'{remaining:.1f}'}
+        if result is None:
+            return self._respond(404, {'errors': [{'message': 'The specified resource does not exist.'}]}, headers)
+        if isinstance(result, list):
+            per_page = min(int(query.get('per_page', [10])[0]), 100)
+            page = int(query.get('page', [1])[0])
+            last_page = max(1, -(-len(result) // per_page))
+            headers['Link'] = self._link_header(url.path, query, page, last_page)
+            result = result[(page - 1) * per_page:page * per_page]
+        payload = json.dumps(result).encode()
+        headers['ETag'] = f'W/"{hashlib.md5(payload).hexdigest()}"'
+        if self.headers.get('If-None-Match') == headers['ETag']:
+            self.canvas.not_modified_count += 1
+            return self._respond(304, None, headers)
+        self._respond(200, payload, headers)
+
+    def log_message(self, format, *args):  # noqa: A002
+        pass
+
+    def _link_header(self, path, query, page, last_page):
+        def _link(rel, page_number):
+            params = urlencode({**query, 'page': [str(page_number)]}, doseq=True)
+            return f'<http://{self.headers["Host"]}{path}?{params}>; rel="{rel}"'
+        links = [_link('current', page), _link('first', 1)]
+        if page < last_page:
+            links.append(_link('next', page + 1))
+        if page > 1:
+            links.append(_link('prev', page - 1))
+        links.append(_link('last', last_page))
+        return ','.join(links)
+
+    def _respond(self, status, body, headers=None):
+        if body is None or isinstance(body, bytes):
+            payload = body or b''
+        else:
+            payload = (body if isinstance(body, str) else json.dumps(body)).encode()
+        self.canvas.bytes_sent += len(payload)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def generate_course(course_id, user_count, account_id=129407, term_id=5482, section_count=2):
+    sections = [
+        {'course_id': course_id, 'id': course_id * 10 + i, 'name': f'LEC {i + 1:03d}', 'sis_section_id': f'SEC:{course_id}-{i}'}
+        for i in range(section_count)
+    ]
+    users = []
+    for i in range(user_count):
+        uid = course_id * 1000 + i
+        enrollment_type = 'TeacherEnrollment' if i == 0 else 'StudentEnrollment'
+        users.append({
+            'email': f'user-{uid}@berkeley.edu',
+            'enrollments': [{'course_section_id': sections[i % section_count]['id'], 'type': enrollment_type}],
+            'id': uid,
+            'login_id': str(uid),
+            'name': f'User {uid}',
+            'sortable_name': f'{uid}, User',
+        })
+    return {
+        'course': {
+            'account_id': account_id,
+            'course_code': f'COURSE {course_id}',
+            'enrollment_term_id': term_id,
+            'id': course_id,
+            'name': f'Course {course_id}',
+        },
+        'sections': sections,
+        'users': users,
+    }
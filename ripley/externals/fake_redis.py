@@ -0,0 +1,194 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import re
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+import threading
+import time
+
+# Local Redis stand-in, used when CACHE_REDIS_URL is not configured (e.g., tests and benchmarks).
+#
+# Speaks enough RESP2 for the redis package's cache commands: PING, GET, SET (EX, PX, NX, XX), DEL, EXISTS, SCAN (MATCH,
+# COUNT), DBSIZE, FLUSHDB and QUIT. Data is kept in memory, in one database.
+
+
+class FakeRedisServer:
+
+    def __init__(self, host='127.0.0.1', port=0):
+        handler = type('FakeRedisHandler', (FakeRedisHandler,), {'store': self})
+        self.command_count = 0
+        self.server = ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._data = {}
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), name='fake-redis', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def execute(self, command):
+        name = command[0].upper().decode()
+        with self._lock:
+            self.command_count += 1
+            self._expire()
+            method = getattr(self, f'_{name.lower()}', None)
+            if method is None:
+                return _error(f"unknown command '{name}'")
+            try:
+                return method(*command[1:])
+            except (IndexError, TypeError, ValueError):
+                return _error(f"wrong arguments for '{name}' command")
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _dbsize(self):
+        return _integer(len(self._data))
+
+    def _del(self, *keys):
+        return _integer(sum(self._data.pop(key, None) is not None for key in keys))
+
+    def _exists(self, *keys):
+        return _integer(sum(key in self._data for key in keys))
+
+    def _expire(self):
+        now = time.monotonic()
+        expired = [key for key, (_, expires_at) in self._data.items() if expires_at is not None and expires_at <= now]
+        for key in expired:
+            del self._data[key]
+
+    def _flushdb(self, *args):
+        self._data.clear()
+        return b'+OK\r\n'
+
+    def _get(self, key):
+        entry = self._data.get(key)
+        return _bulk(entry[0] if entry else None)
+
+    def _ping(self, *args):
+        return b'+PONG\r\n'
+
+    def _scan(self, cursor, *options):
+        cursor = int(cursor)
+        pattern, count = None, 10
+        for option, value in zip(options[::2], options[1::2]):
+            if option.upper() == b'MATCH':
+                pattern = _glob_to_regex(value)
+            elif option.upper() == b'COUNT':
+                count = int(value)
+        keys = sorted(self._data)
+        page = keys[cursor:cursor + count]
+        next_cursor = cursor + count if cursor + count < len(keys) else 0
+        matches = [key for key in page if pattern is None or pattern.fullmatch(key)]
+        return b'*2\r\n' + _bulk(str(next_cursor).encode()) + _array(matches)
+
+    def _set(self, key, value, *options):
+        expires_at = None
+        options = [option.upper() for option in options]
+        if b'EX' in options:
+            expires_at = time.monotonic() + int(options[options.index(b'EX') + 1])
+        elif b'PX' in options:
+            expires_at = time.monotonic() + int(options[options.index(b'PX') + 1]) / 1000
+        if (b'NX' in options and key in self._data) or (b'XX' in options and key not in self._data):
+            return _bulk(None)
+        self._data[key] = (value, expires_at)
+        return b'+OK\r\n'
+
+
+class FakeRedisHandler(StreamRequestHandler):
+    disable_nagle_algorithm = True
+    store = None
+
+    def handle(self):
+        while True:
+            command = self._read_command()
+            if not command:
+                return
+            if command[0].upper() == b'QUIT':
+                self.wfile.write(b'+OK\r\n')
+                return
+            self.wfile.write(self.store.execute(command))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            # Inline command, e.g. from telnet.
+            return line.split()
+        command = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            command.append(self.rfile.read(length + 2)[:-2])
+        return command
+
+
+def _array(items):
+    return f'*{len(items)}\r\n'.encode() + b''.join(_bulk(item) for item in items)
+
+
+def _bulk(value):
+    return b'$-1\r\n' if value is None else f'${len(value)}\r\n'.encode() + value + b'\r\n'
+
+
+def _error(message):
+    return f'-ERR {message}\r\n'.encode()
+
+
+def _glob_to_regex(pattern):
+    regex = []
+    characters = iter(pattern.decode('latin-1'))
+    for character in characters:
+        if character == '\\':
+            regex.append(re.escape(next(characters, '\\')))
+        elif character == '*':
+            regex.append('.*')
+        elif character == '?':
+            regex.append('.')
+        elif character == '[':
+            group = ''.join(iter(lambda: next(characters, ']'), ']'))
+            regex.append(f'[{group}]')
+        else:
+            regex.append(re.escape(character))
+    return re.compile(''.join(regex).encode('latin-1'), re.DOTALL)
+
+
+def _integer(value):
+    return f':{value}\r\n'.encode()
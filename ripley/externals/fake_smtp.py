@@ -0,0 +1,126 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from socketserver import StreamRequestHandler, ThreadingTCPServer
+import threading
+import time
+
+# Local SMTP sink, used when SMTP_HOST is not configured (e.g., tests and benchmarks).
+#
+# Speaks enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP and QUIT. Messages are kept in memory rather
+# than delivered. Optional latency per command approximates the round trips to a real mail server.
+
+
+class SmtpSink:
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0):
+        handler = type('SmtpSinkHandler', (SmtpSinkHandler,), {'sink': self})
+        self.latency = latency
+        self.messages = []
+        self.session_count = 0
+        self.server = ThreadingTCPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._lock = threading.Lock()
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), name='smtp-sink', daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_message(self, mail_from, recipients, data):
+        with self._lock:
+            self.messages.append({'data': data, 'mailFrom': mail_from, 'recipients': recipients})
+
+    def new_session(self):
+        with self._lock:
+            self.session_count += 1
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+class SmtpSinkHandler(StreamRequestHandler):
+    disable_nagle_algorithm = True
+    sink = None
+
+    def handle(self):
+        self.sink.new_session()
+        self._reply('220 localhost SMTP sink')
+        mail_from, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if self.sink.latency:
+                time.sleep(self.sink.latency)
+            if verb in ('EHLO', 'HELO'):
+                self._reply('250-localhost', '250 8BITMIME')
+            elif verb == 'MAIL':
+                mail_from, recipients = command[10:].strip('<> '), []
+                self._reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip('<> '))
+                self._reply('250 OK')
+            elif verb == 'DATA':
+                self._reply('354 End data with <CR><LF>.<CR><LF>')
+                self.sink.add_message(mail_from, recipients, self._read_data())
+                mail_from, recipients = None, []
+                self._reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                mail_from, recipients = (None, []) if verb == 'RSET' else (mail_from, recipients)
+                self._reply('250 OK')
+            elif verb == 'QUIT':
+                self._reply('221 Bye')
+                return
+            else:
+                self._reply('502 Command not implemented')
+
+    def _read_data(self):
+        lines = []
+        while True:
+            line = self.rfile.readline()
+            if not line or line in (b'.\r\n', b'.\n'):
+                break
+            lines.append(line[1:] if line.startswith(b'..') else line)
+        return b''.join(lines).decode('utf-8', 'replace')
+
+    def _reply(self, *lines):
+        self.wfile.write(''.join(f'{line}\r\n' for line in lines).encode())
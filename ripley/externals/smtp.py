@@ -0,0 +1,218 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from contextlib import contextmanager
+import logging
+import queue
+import smtplib
+import threading
+
+from flask import current_app as app
+from ripley.configs import require_stand_in_allowed
+
+# Outbound email over pooled SMTP connections.
+#
+# At most SMTP_POOL_SIZE connections are open at once; each is reused across messages (one SMTP session, many MAIL
+# transactions) and replaced if the server drops it.
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Connections are released on pool threads, which have no app context.
+logger = logging.getLogger(__name__)
+
+_pool_lock = threading.Lock()
+
+
+def get_smtp_pool():
+    return _get_pool()
+
+
+def send_message(message):
+    _get_pool().send(message)
+
+
+class SmtpPool:
+
+    def __init__(self, host, port, password=None, size=4, timeout=30, use_tls=False, username=None):
+        self.host = host
+        self.password = password
+        self.port = port
+        self.size = size
+        self.timeout = timeout
+        self.use_tls = use_tls
+        self.username = username
+        self._created = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        try:
+            with self.connection() as connection:
+                connection.send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Idle connections may have been closed by the server. Retry once on a new one.
+            with self.connection() as connection:
+                connection.send_message(message)
+
+    def send_file(self, from_address, recipients, path, headers=b''):
+        """Send the message stored at path, with headers prepended, to all recipients in one SMTP transaction.
+
+        The file is streamed in chunks rather than read into memory. Return a dict of refused recipients.
+        """
+        try:
+            return self._send_file(from_address, recipients, path, headers)
+        except smtplib.SMTPServerDisconnected:
+            return self._send_file(from_address, recipients, path, headers)
+
+    @contextmanager
+    def connection(self):
+        connection = self._acquire()
+        try:
+            yield connection
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError):
+            # The session may still be good. Reset it for the next message, or else let it go.
+            try:
+                connection.rset()
+            except Exception:
+                self._discard(connection)
+            else:
+                self._idle.put(connection)
+            raise
+        except Exception:
+            self._discard(connection)
+            raise
+        else:
+            self._idle.put(connection)
+
+    def close(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(connection)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f'No SMTP connection became available within {self.timeout} seconds')
+
+    def _send_file(self, from_address, recipients, path, headers):
+        with self.connection() as connection:
+            code, response = connection.mail(from_address)
+            if code != 250:
+                raise smtplib.SMTPSenderRefused(code, response, from_address)
+            refused = {}
+            for recipient in recipients:
+                code, response = connection.rcpt(recipient)
+                if code not in (250, 251):
+                    refused[recipient] = (code, response)
+            if len(refused) == len(recipients):
+                raise smtplib.SMTPRecipientsRefused(refused)
+            code, response = connection.docmd('DATA')
+            if code != 354:
+                raise smtplib.SMTPDataError(code, response)
+            _stream_data(connection, path, headers)
+            code, response = connection.getreply()
+            if code != 250:
+                raise smtplib.SMTPDataError(code, response)
+            return refused
+
+    def _connect(self):
+        connection = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        if self.use_tls:
+            connection.starttls()
+        if self.username:
+            connection.login(self.username, self.password)
+        return connection
+
+    def _discard(self, connection):
+        with self._lock:
+            self._created -= 1
+        try:
+            connection.quit()
+        except Exception as e:
+            logger.debug(f'Failed to close SMTP connection: {e}')
+
+
+def _get_pool():
+    pool = app.extensions.get('smtp')
+    if pool is None:
+        with _pool_lock:
+            pool = app.extensions.get('smtp')
+            if pool is None:
+                host, port = app.config['SMTP_HOST'], app.config['SMTP_PORT']
+                if not host:
+                    host, port = _start_smtp_sink(app)
+                pool = app.extensions['smtp'] = SmtpPool(
+                    host=host,
+                    password=app.config['SMTP_PASSWORD'],
+                    port=port,
+                    size=app.config['SMTP_POOL_SIZE'],
+                    timeout=app.config['SMTP_TIMEOUT'],
+                    use_tls=app.config['SMTP_USE_TLS'] and bool(app.config['SMTP_HOST']),
+                    username=app.config['SMTP_USERNAME'],
+                )
+    return pool
+
+
+def _stream_data(connection, path, headers):
+    # Per RFC 5321: CRLF line endings, leading dots doubled, and a lone dot to end the message.
+    chunk = bytearray(headers)
+    with open(path, 'rb') as file:
+        for line in file:
+            if line.startswith(b'.'):
+                chunk += b'.'
+            chunk += line.rstrip(b'\r\n')
+            chunk += b'\r\n'
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                connection.send(bytes(chunk))
+                chunk.clear()
+    chunk += b'.\r\n'
+    connection.send(bytes(chunk))
+
+
+def _start_smtp_sink(flask_app):
+    require_stand_in_allowed(flask_app, 'SMTP_HOST')
+    from ripley.externals.fake_smtp import SmtpSink
+    sink = flask_app.extensions['smtp_sink'] = SmtpSink()
+    sink.start()
+    return sink.host, sink.port
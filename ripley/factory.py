@@ -24,23 +24,40 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 
 from flask import Flask
+from ripley import db
 from ripley.configs import load_configs
+from ripley.lib.cache import initialize_cache
+from ripley.lib.db_pool import engine_options, instrument_pool
+from ripley.lib.startup import StartupTimer
+from ripley.lib.user_cache import initialize_user_cache
 from ripley.logger import initialize_logger
 from ripley.routes import register_routes
 
 
 def create_app():
     """Initialize Ripley."""
-    app = Flask(__name__.split('.')[0])
-    load_configs(app)
-    initialize_logger(app)
-    # TODO for cache?
-    # cache.init_app(app)
-    # cache.clear()
-    # TODO: db
-    # db.init_app(app)
+    timer = StartupTimer()
+    # Static files are served from STATIC_FOLDER by a route of our own. See register_routes.
+    app = Flask(__name__.split('.')[0], static_folder=None)
+    app.extensions['startup_timer'] = timer
+    with timer.phase('load_configs'):
+        load_configs(app)
+    with timer.phase('initialize_logger'):
+        initialize_logger(app)
+    with timer.phase('initialize_cache'):
+        initialize_cache(app)
+        initialize_user_cache(app)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_options(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
+    with timer.phase('initialize_db'):
+        db.init_app(app)
 
     with app.app_context():
-        register_routes(app)
+        with timer.phase('instrument_pool'):
+            instrument_pool(db.engine)
+        with timer.phase('register_routes'):
+            register_routes(app)
 
     return app
@@ -0,0 +1,162 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from datetime import timedelta
+import json
+
+from flask import current_app as app
+from ripley import db, std_commit
+from ripley.lib.util import utc_now
+from sqlalchemy import text
+
+# PostgreSQL-backed job queue.
+#
+# Workers claim queued jobs with SELECT ... FOR UPDATE SKIP LOCKED, so concurrent workers on any number of nodes never
+# claim the same row. A partial unique index allows one queued or running instance per job key. Running jobs are
+# heartbeated; a job whose worker stops heartbeating for JOB_LOCK_TIMEOUT seconds is re-queued. Failed attempts are
+# retried after JOB_RETRY_BACKOFF seconds, doubling with each attempt, up to max_attempts. Every attempt is recorded in
+# job_history with its duration.
+
+
+def enqueue(job_key, args=None, max_attempts=None, run_after=None):
+    """Queue a job. Return its id, or None if an instance of the job is already queued or running."""
+    result = db.session.execute(
+        text("""INSERT INTO jobs (job_key, args, max_attempts, run_after, created_at, updated_at)
+            VALUES (:job_key, CAST(:args AS JSONB), :max_attempts, COALESCE(CAST(:run_after AS TIMESTAMPTZ), now()), now(), now())
+            ON CONFLICT (job_key) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING id"""),
+        {
+            'args': json.dumps(args or {}),
+            'job_key': job_key,
+            'max_attempts': max_attempts or app.config['JOB_MAX_ATTEMPTS'],
+            'run_after': run_after,
+        },
+    ).first()
+    std_commit()
+    return result and result.id
+
+
+def claim_job(worker):
+    result = db.session.execute(
+        text("""UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_by = :worker, locked_at = now(),
+                updated_at = now()
+            WHERE id = (
+                SELECT id FROM jobs WHERE status = 'queued' AND run_after <= now()
+                ORDER BY run_after, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, job_key, args, attempts, max_attempts"""),
+        {'worker': worker},
+    ).mappings().first()
+    std_commit()
+    return result and dict(result)
+
+
+def complete_job(job, worker, started_at, details=None):
+    _record_attempt(job, worker, started_at, 'succeeded', details)
+    db.session.execute(text('DELETE FROM jobs WHERE id = :id'), {'id': job['id']})
+    std_commit()
+
+
+def fail_job(job, worker, started_at, error):
+    """Re-queue the job with backoff, or drop it from the queue after its last attempt. Return True if re-queued."""
+    _record_attempt(job, worker, started_at, 'failed', error)
+    if job['attempts'] >= job['max_attempts']:
+        db.session.execute(text('DELETE FROM jobs WHERE id = :id'), {'id': job['id']})
+        std_commit()
+        return False
+    backoff = app.config['JOB_RETRY_BACKOFF'] * 2 ** (job['attempts'] - 1)
+    db.session.execute(
+        text("""UPDATE jobs SET status = 'queued', run_after = now() + make_interval(secs => :backoff), locked_by = NULL,
+            locked_at = NULL, last_error = :error, updated_at = now() WHERE id = :id"""),
+        {'backoff': backoff, 'error': error, 'id': job['id']},
+    )
+    std_commit()
+    return True
+
+
+def heartbeat(job_ids):
+    if job_ids:
+        db.session.execute(
+            text("UPDATE jobs SET locked_at = now() WHERE id = ANY(:job_ids) AND status = 'running'"),
+            {'job_ids': list(job_ids)},
+        )
+        std_commit()
+
+
+def requeue_stale_jobs():
+    results = db.session.execute(
+        text("""UPDATE jobs SET status = 'queued', locked_by = NULL, locked_at = NULL, updated_at = now()
+            WHERE status = 'running' AND locked_at < now() - make_interval(secs => :lock_timeout)
+            RETURNING id, job_key"""),
+        {'lock_timeout': app.config['JOB_LOCK_TIMEOUT']},
+    ).all()
+    std_commit()
+    for row in results:
+        app.logger.warning(f'Re-queued job {row.id} ({row.job_key}): its worker stopped heartbeating.')
+    return len(results)
+
+
+def schedule_due_jobs():
+    """Queue each job of JOB_SCHEDULE whose last attempt started more than its interval (in seconds) ago."""
+    scheduled = []
+    for job_key, interval in app.config['JOB_SCHEDULE'].items():
+        last_started_at = db.session.execute(
+            text('SELECT MAX(started_at) FROM job_history WHERE job_key = :job_key'),
+            {'job_key': job_key},
+        ).scalar()
+        if last_started_at and last_started_at > utc_now() - timedelta(seconds=interval):
+            continue
+        if enqueue(job_key):
+            scheduled.append(job_key)
+    return scheduled
+
+
+def get_job_history(job_key=None, limit=50):
+    sql = 'SELECT * FROM job_history'
+    if job_key:
+        sql += ' WHERE job_key = :job_key'
+    sql += ' ORDER BY started_at DESC, id DESC LIMIT :limit'
+    return [dict(row) for row in db.session.execute(text(sql), {'job_key': job_key, 'limit': limit}).mappings()]
+
+
+def _record_attempt(job, worker, started_at, status, details):
+    finished_at = utc_now()
+    db.session.execute(
+        text("""INSERT INTO job_history (job_id, job_key, attempt, status, worker, details, started_at, finished_at, duration_ms)
+            VALUES (:job_id, :job_key, :attempt, :status, :worker, :details, :started_at, :finished_at, :duration_ms)"""),
+        {
+            'attempt': job['attempts'],
+            'details': details if details is None or isinstance(details, str) else json.dumps(details, default=str),
+            'duration_ms': int((finished_at - started_at).total_seconds() * 1000),
+            'finished_at': finished_at,
+            'job_id': job['id'],
+            'job_key': job['job_key'],
+            'started_at': started_at,
+            'status': status,
+            'worker': worker,
+        },
+    )
@@ -0,0 +1,157 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from contextlib import nullcontext
+import os
+import signal
+import socket
+import threading
+import time
+
+from flask import current_app, has_app_context
+from ripley import db, std_commit
+from ripley.jobs.job_queue import claim_job, complete_job, fail_job, heartbeat, requeue_stale_jobs, schedule_due_jobs
+from ripley.jobs.registry import get_job
+from ripley.lib.metrics import registry as metrics_registry
+from ripley.lib.util import utc_now
+
+# Worker process for queued jobs, started with 'flask worker'.
+#
+# JOB_CONCURRENCY threads claim and run jobs. The main thread queues scheduled jobs, heartbeats the jobs in progress and
+# re-queues jobs abandoned by dead workers, every JOB_POLL_INTERVAL seconds. SIGTERM or SIGINT lets running jobs finish.
+
+JOB_BUCKETS = (1, 5, 15, 60, 300, 900, 1800, 3600, 7200)
+
+
+class Worker:
+
+    def __init__(self, app, concurrency=None, poll_interval=None):
+        self.app = app
+        self.concurrency = concurrency or app.config['JOB_CONCURRENCY']
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.poll_interval = poll_interval or app.config['JOB_POLL_INTERVAL']
+        self.running_job_ids = set()
+        self._running_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def run(self, once=False):
+        if once:
+            return self.run_pending()
+        for signal_number in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signal_number, lambda *args: self.stop())
+        self.app.logger.info(f'Worker {self.name} started with {self.concurrency} threads.')
+        threads = [
+            threading.Thread(target=self._work, args=(f'{self.name}:{i}',), name=f'worker-{i}', daemon=True)
+            for i in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        while not self._stopping.is_set():
+            self._maintain()
+            self._stopping.wait(self.poll_interval)
+        for thread in threads:
+            thread.join()
+        self.app.logger.info(f'Worker {self.name} stopped.')
+
+    def run_pending(self):
+        """Queue scheduled jobs and run every due job in this thread. Return the number of jobs run."""
+        self._maintain()
+        count = 0
+        with self._app_context():
+            while True:
+                job = claim_job(self.name)
+                if not job:
+                    return count
+                self._run_job(job, self.name)
+                count += 1
+
+    def stop(self):
+        self.app.logger.info(f'Worker {self.name} stopping after jobs in progress.')
+        self._stopping.set()
+
+    def _app_context(self):
+        # Reuse the caller's app context, e.g. that of the 'flask worker' command. Worker threads push their own.
+        if has_app_context() and current_app._get_current_object() is self.app:
+            return nullcontext()
+        return self.app.app_context()
+
+    def _maintain(self):
+        with self._app_context():
+            try:
+                with self._running_lock:
+                    job_ids = set(self.running_job_ids)
+                heartbeat(job_ids)
+                requeue_stale_jobs()
+                for job_key in schedule_due_jobs():
+                    self.app.logger.info(f'Scheduled job {job_key}.')
+            except Exception as e:
+                self.app.logger.exception(f'Worker {self.name} maintenance failed: {e}')
+
+    def _run_job(self, job, worker_name):
+        fn = get_job(job['job_key'])
+        started_at = utc_now()
+        start = time.perf_counter()
+        with self._running_lock:
+            self.running_job_ids.add(job['id'])
+        self.app.logger.info(f"Running job {job['id']} ({job['job_key']}), attempt {job['attempts']} of {job['max_attempts']}.")
+        try:
+            if fn is None:
+                # Retrying cannot help.
+                job['attempts'] = job['max_attempts']
+                raise LookupError(f"No job registered as '{job['job_key']}'")
+            # The job's writes, and its completion, are committed together or not at all.
+            savepoint = db.session.begin_nested()
+            try:
+                details = fn(**job['args'])
+                complete_job(job, worker_name, started_at, details)
+                savepoint.commit()
+            except Exception:
+                savepoint.rollback()
+                raise
+            std_commit()
+            status = 'succeeded'
+        except Exception as e:
+            self.app.logger.exception(f"Job {job['id']} ({job['job_key']}) failed: {e}")
+            status = 'retrying' if fail_job(job, worker_name, started_at, f'{type(e).__name__}: {e}') else 'failed'
+        finally:
+            with self._running_lock:
+                self.running_job_ids.discard(job['id'])
+        seconds = time.perf_counter() - start
+        metrics_registry.inc('ripley_jobs_total', (('job', job['job_key']), ('status', status)))
+        metrics_registry.observe('ripley_job_duration_seconds', seconds, (('job', job['job_key']),), buckets=JOB_BUCKETS)
+        self.app.logger.info(f"Job {job['id']} ({job['job_key']}) {status} in {seconds:.3f} s.")
+
+    def _work(self, worker_name):
+        while not self._stopping.is_set():
+            with self._app_context():
+                try:
+                    job = claim_job(worker_name)
+                    if job:
+                        self._run_job(job, worker_name)
+                except Exception as e:
+                    job = None
+                    self.app.logger.exception(f'Worker {worker_name} failed to claim a job: {e}')
+            if not job:
+                self._stopping.wait(self.poll_interval)
@@ -0,0 +1,124 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+from collections import defaultdict
+import json
+import logging
+import random
+import re
+import time
+import uuid
+
+from flask import current_app as app, g, request, session
+from ripley.logger import ACCESS_LOGGER_NAME
+
+REQUEST_ID_HEADER = 'X-Request-Id'
+
+# Accept upstream request IDs only if they cannot corrupt a log line.
+VALID_REQUEST_ID = re.compile(r'^[A-Za-z0-9._:-]{1,128}$')
+
+
+def start_request_timer():
+    g.request_started_at = time.perf_counter()
+    request_id = request.headers.get(REQUEST_ID_HEADER)
+    g.request_id = request_id if request_id and VALID_REQUEST_ID.match(request_id) else uuid.uuid4().hex
+
+
+def request_duration_ms():
+    started_at = g.get('request_started_at')
+    return round((time.perf_counter() - started_at) * 1000, 3) if started_at else None
+
+
+def log_request(response):
+    sample_rate = 1 if response.status_code >= 400 else app.config['ACCESS_LOG_SAMPLE_RATE']
+    if sample_rate < 1 and random.random() >= sample_rate:
+        return
+    forwarded_for = request.headers.get('X-Forwarded-For')
+    forwarded_for = forwarded_for.split(',')[0].strip() if forwarded_for else None
+    record = {
+        'durationMs': request_duration_ms(),
+        'method': request.method,
+        'path': request.path,
+        'remoteAddr': forwarded_for or request.remote_addr,
+        'requestId': g.get('request_id'),
+        'responseBytes': response.calculate_content_length(),
+        'route': request.url_rule.rule if request.url_rule else None,
+        'sampleRate': sample_rate,
+        'status': response.status_code,
+        'timestamp': time.time(),
+        'uid': session.get('_user_id'),
+    }
+    if response.status_code >= 500:
+        level = logging.ERROR
+    elif response.status_code >= 400:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    logging.getLogger(ACCESS_LOGGER_NAME).log(level, json.dumps(record, separators=(',', ':')))
+
+
+def latency_report(lines):
+    """Aggregate access log lines into per-route request counts and latency percentiles.
+
+    Sampled records are weighted by the inverse of their sample rate, so counts and percentiles estimate all traffic.
+    """
+    samples = defaultdict(list)
+    errors = defaultdict(float)
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(record, dict) or record.get('durationMs') is None:
+            continue
+        key = (record.get('method'), record.get('route') or record.get('path'))
+        weight = 1 / (record.get('sampleRate') or 1)
+        samples[key].append((record['durationMs'], weight))
+        if record.get('status', 0) >= 500:
+            errors[key] += weight
+    rows = []
+    for (method, route), durations in samples.items():
+        durations.sort()
+        total_weight = sum(weight for _, weight in durations)
+        rows.append({
+            'count': round(total_weight),
+            'errors': round(errors[(method, route)]),
+            'max': durations[-1][0],
+            'method': method,
+            'p50': _weighted_percentile(durations, total_weight, 0.5),
+            'p95': _weighted_percentile(durations, total_weight, 0.95),
+            'p99': _weighted_percentile(durations, total_weight, 0.99),
+            'route': route,
+        })
+    return sorted(rows, key=lambda row: row['p95'], reverse=True)
+
+
+def _weighted_percentile(durations, total_weight, percentile):
+    threshold = total_weight * percentile
+    cumulative = 0
+    for duration, weight in durations:
+        cumulative += weight
+        if cumulative >= threshold:
+            return duration
+    return durations[-1][0]
@@ -0,0 +1,482 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from collections import OrderedDict
+from functools import wraps
+import hashlib
+import importlib
+import json
+import math
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import threading
+import time
+from urllib.parse import quote
+
+from flask import current_app as app, has_app_context
+from ripley.configs import ConfigurationError, require_stand_in_allowed
+from ripley.lib.metrics import registry as metrics_registry
+from ripley.lib.util import ensure_private_directory
+
+# Cache for expensive lookups, upstream Canvas, SIS and LDAP calls above all.
+#
+# Entries live in a namespace, e.g. one per memoized function, which can be invalidated as a whole. CACHE_BACKEND picks
+# where entries are kept:
+#
+#  - memory: in-process LRU cache. Each worker process has its own.
+#  - filesystem: JSON files under CACHE_DIR, private to the app's user and shared by the worker processes of one host.
+#  - redis: shared by all hosts. If CACHE_REDIS_URL is None, a local stand-in server is started (tests and benchmarks).
+#
+# Stampedes are prevented two ways. Concurrent misses on one key in a process wait for a single load (single flight). And
+# a hit may recompute early, with a probability that rises as expiry nears and with the cost of the last load, so that
+# popular entries are refreshed before they expire rather than by every process at once when they do (XFetch).
+
+# Weight of early recomputation. Greater than 1 favors earlier recomputation; 0 disables it.
+EARLY_RECOMPUTE_BETA = 1.0
+
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe, in-process cache with per-entry expiry and least-recently-used eviction."""
+
+    def __init__(self, max_size=1024, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):  # noqa: A003
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def delete_prefix(self, prefix):
+        with self._lock:
+            keys = [key for key in self._entries if isinstance(key, str) and key.startswith(prefix)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class FileSystemBackend:
+    """JSON entries in one directory per namespace. Writes are atomic, by rename.
+
+    Values must be JSON-serializable; others are not cached. The directory is accessible to the app's user only.
+    """
+
+    def __init__(self, directory):
+        self.directory = ensure_private_directory(directory)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as file:
+                stored_key, expires_at, value = json.load(file)
+        except (FileNotFoundError, TypeError, ValueError):
+            return None
+        if stored_key != key:
+            return None
+        if expires_at is not None and expires_at <= time.time():
+            self._remove(path)
+            return None
+        return value
+
+    def set(self, key, value, ttl=None):  # noqa: A003
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        expires_at = time.time() + ttl if ttl else None
+        file = tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), delete=False, prefix='.')
+        try:
+            with file:
+                json.dump([key, expires_at, value], file)
+            os.replace(file.name, path)
+        except BaseException:
+            self._remove(file.name)
+            raise
+
+    def delete(self, key):
+        return self._remove(self._path(key))
+
+    def delete_prefix(self, prefix):
+        namespace, _, rest = prefix.partition(':')
+        directory = os.path.join(self.directory, quote(namespace, safe=''))
+        if not rest:
+            # Move aside first, so that no reader sees a half-deleted namespace.
+            doomed = f'{directory}.deleted-{os.getpid()}-{threading.get_ident()}'
+            try:
+                os.rename(directory, doomed)
+            except FileNotFoundError:
+                return 0
+            count = len(os.listdir(doomed))
+            shutil.rmtree(doomed, ignore_errors=True)
+            return count
+        count = 0
+        for entry in os.scandir(directory) if os.path.isdir(directory) else []:
+            try:
+                with open(entry.path) as file:
+                    stored_key = json.load(file)[0]
+            except (FileNotFoundError, ValueError, IndexError):
+                continue
+            if stored_key.startswith(prefix):
+                count += self._remove(entry.path)
+        return count
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+    def _path(self, key):
+        namespace, _, rest = key.partition(':')
+        return os.path.join(self.directory, quote(namespace, safe=''), hashlib.sha256(rest.encode()).hexdigest())
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+
+class RedisBackend:
+    """Pickled entries in Redis, under key_prefix. Expiry is left to Redis."""
+
+    def __init__(self, url, key_prefix='', timeout=1):
+        # Imported only when configured: it adds noticeably to worker startup.
+        import redis
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=timeout, socket_timeout=timeout)
+        self.key_prefix = key_prefix
+
+    def get(self, key):
+        value = self.client.get(self.key_prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value, ttl=None):  # noqa: A003
+        self.client.set(self.key_prefix + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), ex=ttl or None)
+
+    def delete(self, key):
+        return bool(self.client.delete(self.key_prefix + key))
+
+    def delete_prefix(self, prefix):
+        count = 0
+        batch = []
+        match = self._escape(self.key_prefix + prefix) + '*'
+        for key in self.client.scan_iter(match=match, count=1000):
+            batch.append(key)
+            if len(batch) >= 500:
+                count += self.client.delete(*batch)
+                batch = []
+        if batch:
+            count += self.client.delete(*batch)
+        return count
+
+    def clear(self):
+        return self.delete_prefix('')
+
+    @staticmethod
+    def _escape(pattern):
+        for character in '\\*?[]':
+            pattern = pattern.replace(character, '\\' + character)
+        return pattern
+
+
+class Cache:
+
+    def __init__(self, backend, default_ttl=300, ttls=None, early_recompute_beta=EARLY_RECOMPUTE_BETA):
+        self.backend = backend
+        self.default_ttl = default_ttl
+        self.early_recompute_beta = early_recompute_beta
+        self.ttls = ttls or {}
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+
+    def get_or_load(self, namespace, key, loader, ttl=None):
+        """Return the cached value, or the value of loader(), which is then cached. Exceptions are not cached."""
+        full_key = _full_key(namespace, key)
+        entry = self._backend_call(namespace, self.backend.get, full_key)
+        if entry is not None:
+            value, expires_at, load_seconds = entry
+            if not self._recompute_early(expires_at, load_seconds):
+                self._increment(namespace, 'hits')
+                return value
+            self._increment(namespace, 'earlyRecomputes')
+            # Whoever is already recomputing it, others keep the current value meanwhile.
+            return self._load_once(namespace, full_key, loader, ttl, current=value)
+        self._increment(namespace, 'misses')
+        return self._load_once(namespace, full_key, loader, ttl)
+
+    def get(self, namespace, key, default=None):
+        entry = self._backend_call(namespace, self.backend.get, _full_key(namespace, key))
+        return default if entry is None else entry[0]
+
+    def set(self, namespace, key, value, ttl=None):  # noqa: A003
+        ttl = self._ttl(namespace, ttl)
+        self._backend_call(namespace, self.backend.set, _full_key(namespace, key), (value, time.time() + ttl, 0), ttl)
+
+    def delete(self, namespace, key):
+        self._increment(namespace, 'invalidations')
+        return self._backend_call(namespace, self.backend.delete, _full_key(namespace, key))
+
+    def invalidate_namespace(self, namespace):
+        """Delete all entries of the namespace. Return the number deleted, if the backend can tell."""
+        self._increment(namespace, 'invalidations')
+        return self._backend_call(namespace, self.backend.delete_prefix, f'{namespace}:')
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        with self._stats_lock:
+            stats = {namespace: dict(counts) for namespace, counts in self._stats.items()}
+        for counts in stats.values():
+            lookups = counts['hits'] + counts['earlyRecomputes'] + counts['misses']
+            counts['hitRatio'] = round((lookups - counts['misses']) / lookups, 4) if lookups else None
+            counts['meanLoadSeconds'] = round(counts['loadSeconds'] / counts['loads'], 6) if counts['loads'] else None
+        return stats
+
+    def _backend_call(self, namespace, method, *args):
+        # A cache outage must not become an application outage: treat errors as misses.
+        try:
+            return method(*args)
+        except Exception as e:
+            self._increment(namespace, 'errors')
+            if has_app_context():
+                app.logger.warning(f'Cache backend error in {namespace}: {e}')
+            return None
+
+    def _increment(self, namespace, key, value=1):
+        with self._stats_lock:
+            counts = self._stats.get(namespace)
+            if counts is None:
+                counts = self._stats[namespace] = {
+                    'coalesced': 0,
+                    'earlyRecomputes': 0,
+                    'errors': 0,
+                    'hits': 0,
+                    'invalidations': 0,
+                    'loadSeconds': 0.0,
+                    'loads': 0,
+                    'misses': 0,
+                }
+            counts[key] += value
+
+    def _load_once(self, namespace, full_key, loader, ttl, current=_MISSING):
+        with self._flights_lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = _Flight()
+        if not leader:
+            self._increment(namespace, 'coalesced')
+            if current is not _MISSING:
+                return current
+            return flight.wait()
+        try:
+            start = time.perf_counter()
+            value = loader()
+            load_seconds = time.perf_counter() - start
+            self._increment(namespace, 'loads')
+            self._increment(namespace, 'loadSeconds', load_seconds)
+            metrics_registry.observe('ripley_cache_load_seconds', load_seconds, (('cache', namespace),))
+            ttl = self._ttl(namespace, ttl)
+            self._backend_call(namespace, self.backend.set, full_key, (value, time.time() + ttl, load_seconds), ttl)
+            flight.value = value
+            return value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._flights_lock:
+                del self._flights[full_key]
+            flight.done.set()
+
+    def _recompute_early(self, expires_at, load_seconds):
+        if not (self.early_recompute_beta and load_seconds):
+            return False
+        return time.time() - load_seconds * self.early_recompute_beta * math.log(1 - random.random()) >= expires_at
+
+    def _ttl(self, namespace, ttl):
+        return self.ttls.get(namespace) or ttl or self.default_ttl
+
+
+class _Flight:
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+        self.value = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error:
+            raise self.error
+        return self.value
+
+
+def initialize_cache(app):
+    app.extensions['cache'] = Cache(
+        backend=create_backend(app),
+        default_ttl=app.config['CACHE_DEFAULT_TTL'],
+        ttls=app.config['CACHE_TTLS'],
+    )
+    metrics_registry.register_collector('cache', _metrics)
+
+
+def create_backend(app):
+    backend = app.config['CACHE_BACKEND']
+    if backend == 'memory':
+        return LRUCache(max_size=app.config['CACHE_MAX_SIZE'])
+    if backend == 'filesystem':
+        if not app.config['CACHE_DIR']:
+            raise ConfigurationError("CACHE_DIR is required when CACHE_BACKEND is 'filesystem'")
+        return FileSystemBackend(app.config['CACHE_DIR'])
+    if backend == 'redis':
+        url = app.config['CACHE_REDIS_URL'] or _start_redis_stand_in(app)
+        return RedisBackend(url, key_prefix=app.config['CACHE_KEY_PREFIX'])
+    return import_backend(backend, app)
+
+
+def get_cache():
+    return app.extensions.get('cache') if has_app_context() else None
+
+
+def memoize(namespace=None, ttl=None, key=None):
+    """Cache the return values of the decorated function, by its arguments or by key(*args, **kwargs).
+
+    The namespace defaults to the function's module and name. The decorated function gains invalidate(*args,
+    **kwargs), to delete one entry, and invalidate_all(). Without an app context, the function is called uncached.
+    """
+    def decorator(fn):
+        fn_namespace = namespace or f'{fn.__module__}.{fn.__qualname__}'
+
+        def _key(args, kwargs):
+            return str(key(*args, **kwargs)) if key else _arguments_key(args, kwargs)
+
+        @wraps(fn)
+        def _memoized(*args, **kwargs):
+            cache = get_cache()
+            if cache is None:
+                return fn(*args, **kwargs)
+            return cache.get_or_load(fn_namespace, _key(args, kwargs), lambda: fn(*args, **kwargs), ttl)
+
+        def _invalidate(*args, **kwargs):
+            cache = get_cache()
+            if cache:
+                cache.delete(fn_namespace, _key(args, kwargs))
+
+        def _invalidate_all():
+            cache = get_cache()
+            if cache:
+                cache.invalidate_namespace(fn_namespace)
+
+        _memoized.invalidate = _invalidate
+        _memoized.invalidate_all = _invalidate_all
+        _memoized.namespace = fn_namespace
+        return _memoized
+    return decorator
+
+
+def invalidate_namespace(namespace):
+    cache = get_cache()
+    return cache.invalidate_namespace(namespace) if cache else 0
+
+
+def cache_stats():
+    cache = get_cache()
+    return cache.stats() if cache else None
+
+
+def import_backend(dotted_path, app):
+    """Instantiate a shared cache backend from a dotted path such as 'mypackage.cache.RedisBackend'.
+
+    A backend is any object with get(key), set(key, value, ttl) and delete(key) methods. Its constructor takes the
+    Flask app so that it can read its own configs.
+    """
+    if not dotted_path:
+        return None
+    module_name, _, class_name = dotted_path.rpartition('.')
+    return getattr(importlib.import_module(module_name), class_name)(app)
+
+
+def _arguments_key(args, kwargs):
+    key = repr((args, sorted(kwargs.items()))) if kwargs else repr(args)
+    return key if len(key) <= 200 else hashlib.sha256(key.encode()).hexdigest()
+
+
+def _full_key(namespace, key):
+    return f'{namespace}:{key}'
+
+
+def _metrics():
+    cache = get_cache()
+    metrics = {}
+    for namespace, counts in (cache.stats() if cache else {}).items():
+        labels = (('cache', namespace),)
+        metrics[('ripley_cache_hits_total', labels)] = counts['hits'] + counts['earlyRecomputes']
+        metrics[('ripley_cache_misses_total', labels)] = counts['misses']
+    return metrics
+
+
+def _start_redis_stand_in(flask_app):
+    require_stand_in_allowed(flask_app, 'CACHE_REDIS_URL')
+    from ripley.externals.fake_redis import FakeRedisServer
+    server = flask_app.extensions.get('redis_stand_in')
+    if server is None:
+        server = flask_app.extensions['redis_stand_in'] = FakeRedisServer()
+        server.start()
+    return f'redis://{server.host}:{server.port}/0'
@@ -0,0 +1,103 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import time
+
+from ripley.lib.metrics import registry as metrics_registry
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool, StaticPool
+
+_counters = {}
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waits, including time to open a new connection."""
+
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        metrics_registry.observe('ripley_db_pool_checkout_seconds', time.perf_counter() - start)
+        return connection
+
+
+def engine_options(config):
+    """Build SQLAlchemy engine options from DB_* configs."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # An in-memory SQLite database exists only on the connection that created it.
+        return {
+            'connect_args': {'check_same_thread': False},
+            'poolclass': StaticPool,
+        }
+    options = {
+        'max_overflow': config['DB_POOL_MAX_OVERFLOW'],
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_size': config['DB_POOL_SIZE'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_use_lifo': config['DB_POOL_USE_LIFO'],
+        'poolclass': TimedQueuePool,
+    }
+    if url.get_backend_name() == 'postgresql' and config['DB_STATEMENT_TIMEOUT']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT']}"}
+    elif url.get_backend_name() == 'sqlite':
+        # Pooled SQLite connections are handed from thread to thread.
+        options['connect_args'] = {'check_same_thread': False}
+    return options
+
+
+def instrument_pool(engine):
+    """Count connection churn: connections opened, closed and invalidated, and checkouts returned to the pool."""
+    for event_name, metric_name in [
+        ('checkin', 'ripley_db_pool_checkins_total'),
+        ('close', 'ripley_db_connections_closed_total'),
+        ('connect', 'ripley_db_connections_opened_total'),
+        ('invalidate', 'ripley_db_connections_invalidated_total'),
+    ]:
+        listener = _counter(metric_name)
+        if not event.contains(engine, event_name, listener):
+            event.listen(engine, event_name, listener)
+
+
+def pool_status(engine):
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return {'class': type(pool).__name__}
+    return {
+        'checkedIn': pool.checkedin(),
+        'checkedOut': pool.checkedout(),
+        'class': type(pool).__name__,
+        'overflow': pool.overflow(),
+        'size': pool.size(),
+    }
+
+
+def _counter(metric_name):
+    # The same function object per metric, so that listeners are registered only once per engine.
+    if metric_name not in _counters:
+        def _increment(*args):
+            metrics_registry.inc(metric_name)
+        _counters[metric_name] = _increment
+    return _counters[metric_name]
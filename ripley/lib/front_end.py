@@ -0,0 +1,128 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import gzip
+import os
+import re
+import threading
+import time
+
+from flask import request, Response
+from werkzeug.http import generate_etag
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# The front-end shell (index.html) is served for every deep link, so it is read and compressed once, at startup.
+
+# Content codings we can serve, in order of preference.
+ENCODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+# Vite 4 (Rollup 3) names build output [name]-[hash].[ext], with an 8-digit hex content hash. Those files never change
+# under the same name. Other static files, e.g. favicon.ico from public/, keep their names across builds.
+HASHED_ASSET_PATTERN = re.compile(r'-[0-9a-f]{8}\.[A-Za-z0-9]+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+
+class FrontEndShell:
+
+    def __init__(self, path):
+        self.path = path
+        self.etag = None
+        self.mtime = None
+        self.variants = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        with open(self.path, 'rb') as file:
+            content = file.read()
+        etag = generate_etag(content)
+        variants = {'identity': (content, etag)}
+        variants['gzip'] = (gzip.compress(content, compresslevel=9, mtime=0), f'{etag}-gzip')
+        if brotli:
+            variants['br'] = (brotli.compress(content, quality=11), f'{etag}-br')
+        with self._lock:
+            self.etag = etag
+            self.mtime = os.stat(self.path).st_mtime
+            self.variants = variants
+
+    def reload_if_changed(self):
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+        if mtime == self.mtime:
+            return False
+        self.load()
+        return True
+
+    def response(self):
+        encoding = _negotiate_encoding()
+        content, etag = self.variants[encoding]
+        response = Response(content, mimetype='text/html')
+        if encoding != 'identity':
+            response.content_encoding = encoding
+        response.vary.add('Accept-Encoding')
+        # The shell must be revalidated so that a deploy is picked up, but an unchanged shell costs only a 304.
+        response.cache_control.no_cache = True
+        response.set_etag(etag)
+        return response.make_conditional(request)
+
+    def watch(self, interval=1):
+        """Rebuild compressed variants whenever the file changes on disk. For development only."""
+        def _poll():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reload_if_changed()
+                except OSError:
+                    pass
+        thread = threading.Thread(target=_poll, name='front-end-shell-watcher', daemon=True)
+        thread.start()
+        return thread
+
+
+def set_static_cache_headers(response, filename):
+    """Cache content-hashed assets for a year. Anything else must be revalidated, which costs a 304 if unchanged."""
+    if HASHED_ASSET_PATTERN.search(os.path.basename(filename)):
+        response.cache_control.public = True
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+
+def _negotiate_encoding():
+    accept_encodings = request.accept_encodings
+    best = None
+    best_quality = 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best or 'identity'
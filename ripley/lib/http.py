@@ -23,10 +23,29 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 
+from itertools import islice
 import urllib
 
-from flask import Response
+from flask import request, Response, stream_with_context
 import simplejson as json
+from werkzeug.http import generate_etag
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# JSON responses are compact and NaN-tolerant: NaN and infinities are encoded as null. Streamed responses use orjson,
+# if installed, for items that it can encode the same way.
+
+# Datetimes and dataclasses are passed through to the simplejson fallback, which rejects them as tolerant_jsonify does.
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+STREAM_BATCH_SIZE = 500
+STREAM_CHUNK_SIZE = 16 * 1024
+
+_ENCODER = json.JSONEncoder(ignore_nan=True, separators=(',', ':'))
+_STREAM_ENCODER = json.JSONEncoder(ignore_nan=True, iterable_as_array=True, separators=(',', ':'))
 
 
 def add_param_to_url(url, param):
@@ -36,6 +55,78 @@ def add_param_to_url(url, param):
     return urllib.parse.urlunparse(parsed_url._replace(query=urllib.parse.urlencode(parsed_query)))
 
 
+def tolerant_json_dumps(obj, **kwargs):
+    return json.dumps(obj, ignore_nan=True, separators=(',', ':'), **kwargs)
+
+
 def tolerant_jsonify(obj, status=200, **kwargs):
-    content = json.dumps(obj, ignore_nan=True, separators=(',', ':'), **kwargs)
+    content = tolerant_json_dumps(obj, **kwargs)
     return Response(content, mimetype='application/json', status=status)
+
+
+def tolerant_jsonify_stream(obj, status=200, ndjson=False):
+    """Stream a JSON response, encoding as the client reads rather than building the whole payload in memory.
+
+    A dict is encoded incrementally, and any iterators or generators within it as arrays. Any other iterable, e.g. a
+    generator of rows, is streamed as an array of its items, or as newline-delimited JSON if ndjson.
+    """
+    if ndjson:
+        content = _chunked(_ndjson_items(obj))
+    elif isinstance(obj, dict):
+        content = _chunked(s.encode('utf-8') for s in _STREAM_ENCODER.iterencode(obj))
+    else:
+        content = _chunked(_json_array_items(obj))
+    # Without a Content-Length, the WSGI server sends the body with chunked transfer-encoding.
+    return Response(stream_with_context(content), mimetype='application/x-ndjson' if ndjson else 'application/json', status=status)
+
+
+def _chunked(pieces, chunk_size=STREAM_CHUNK_SIZE):
+    # Coalesce small pieces so that each write to the client carries a useful amount of data.
+    buffer = []
+    size = 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _dumps(obj):
+    if orjson:
+        try:
+            return orjson.dumps(obj, option=ORJSON_OPTIONS)
+        except TypeError:
+            # E.g., a Decimal. Encode as simplejson would, or fail as it would.
+            pass
+    return _ENCODER.encode(obj).encode('utf-8')
+
+
+def _json_array_items(items):
+    # Items are encoded STREAM_BATCH_SIZE at a time, as a list, for the speed of one-shot encoding in C.
+    items = iter(items)
+    separator = b'['
+    while True:
+        batch = list(islice(items, STREAM_BATCH_SIZE))
+        if not batch:
+            break
+        yield separator
+        yield _dumps(batch)[1:-1]
+        separator = b','
+    yield b'[]' if separator == b'[' else b']'
+
+
+def _ndjson_items(items):
+    for item in items:
+        yield _dumps(item)
+        yield b'\n'
+
+
+def conditional_response(content, etag=None, mimetype='application/json'):
+    """Respond with pre-serialized content and a strong ETag. Matching If-None-Match requests get a 304."""
+    response = Response(content, mimetype=mimetype)
+    response.set_etag(etag or generate_etag(content))
+    return response.make_conditional(request)
@@ -0,0 +1,282 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import zlib
+
+from flask import current_app as app, has_app_context
+from requests import Response
+from requests.models import PreparedRequest
+from requests.structures import CaseInsensitiveDict
+from ripley.lib.util import ensure_private_directory
+
+# Client-side cache of HTTP GET responses that carry an ETag or Last-Modified validator.
+#
+# Bodies are stored zlib-compressed on disk, after a line of JSON metadata, one file per URL and scope, behind an
+# in-memory LRU index capped at max_bytes of files. A cached response younger than its TTL is served without a request.
+# Otherwise the request is conditional (If-None-Match, If-Modified-Since), and a 304 Not Modified is answered from the
+# cache. TTLs default to 0, i.e. always revalidate, and are overridden per endpoint by the first matching pattern in ttls,
+# a dict of URL path regex to seconds. The scope of a request, e.g. its access token, is part of the cache key, so that
+# responses are never shared across credentials. The directory is private to the app's user.
+
+# Response headers kept with the body. 'Link' carries Canvas pagination.
+STORED_HEADERS = ['Content-Type', 'ETag', 'Last-Modified', 'Link']
+
+
+class CachedEntry:
+
+    def __init__(self, path, size, stored_at, etag=None, last_modified=None):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.path = path
+        self.size = size
+        self.stored_at = stored_at
+
+    def validators(self):
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+        return headers
+
+
+class HttpCache:
+
+    def __init__(self, directory, max_bytes=512 * 1024 * 1024, ttls=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttls = [(re.compile(pattern), ttl) for pattern, ttl in (ttls or {}).items()]
+        self.total_bytes = 0
+        self._counts = {
+            'bytesSaved': 0,
+            'evictions': 0,
+            'misses': 0,
+            'requestsAvoided': 0,
+            'revalidated': 0,
+            'stored': 0,
+        }
+        self._entries = None
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, send=None, scope=None):
+        """Return the response to GET url, from the cache if fresh or not modified.
+
+        The send(headers) function makes the request, with validator headers if a stale copy is cached. Responses are
+        cached per scope, e.g. the access token sent with the request.
+        """
+        url = full_url(url, params)
+        key = _key(url, scope)
+        entry = self._lookup(key)
+        if entry and time.time() - entry.stored_at < self._ttl(url):
+            response = self._read(key, entry, url)
+            if response is not None:
+                self._increment('requestsAvoided')
+                self._increment('bytesSaved', len(response.content))
+                return response
+            entry = None
+        response = send(entry.validators() if entry else {})
+        if response.status_code == 304 and entry:
+            cached = self._read(key, entry, url)
+            if cached is not None:
+                self._touch(entry)
+                self._increment('revalidated')
+                self._increment('bytesSaved', len(cached.content))
+                return cached
+            # The cached copy is gone. Fetch anew.
+            response = send({})
+        if entry is None:
+            self._increment('misses')
+        if response.status_code == 200 and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+            self._store(key, url, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            for entry in (self._entries or {}).values():
+                _remove(entry.path)
+            self._entries = OrderedDict()
+            self.total_bytes = 0
+
+    @contextmanager
+    def report(self, label):
+        """Yield a dict which, on exit, holds the counts of the block: e.g., bytes saved and requests avoided in a run."""
+        before = self.stats()
+        report = {}
+        try:
+            yield report
+        finally:
+            after = self.stats()
+            report.update({key: after[key] - before[key] for key in self._counts})
+            if has_app_context():
+                app.logger.info(f'HTTP cache report of {label}: {report}')
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counts,
+                'entries': len(self._entries or {}),
+                'totalBytes': self.total_bytes,
+            }
+
+    def _increment(self, key, value=1):
+        with self._lock:
+            self._counts[key] += value
+
+    def _load_index(self):
+        # Entries left by earlier processes, least recently stored or revalidated first.
+        ensure_private_directory(self.directory)
+        found = []
+        for file in os.scandir(self.directory):
+            if file.name.startswith('.'):
+                continue
+            try:
+                with open(file.path, 'rb') as f:
+                    meta = _read_meta(f)
+                stat = file.stat()
+            except (OSError, ValueError, KeyError):
+                _remove(file.path)
+                continue
+            entry = CachedEntry(file.path, stat.st_size, stat.st_mtime, etag=meta.get('etag'), last_modified=meta.get('lastModified'))
+            found.append((file.name, entry))
+        self._entries = OrderedDict(sorted(found, key=lambda item: item[1].stored_at))
+        self.total_bytes = sum(entry.size for entry in self._entries.values())
+
+    def _lookup(self, key):
+        with self._lock:
+            if self._entries is None:
+                self._load_index()
+            entry = self._entries.get(key)
+            if entry:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _read(self, key, entry, url):
+        try:
+            with open(entry.path, 'rb') as file:
+                meta = _read_meta(file)
+                body = zlib.decompress(file.read())
+        except (OSError, ValueError, KeyError, zlib.error):
+            self._evict(key, entry)
+            return None
+        response = Response()
+        response._content = body
+        response.encoding = 'utf-8'
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.status_code = 200
+        response.url = url
+        return response
+
+    def _store(self, key, url, response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        meta = {'etag': headers.get('ETag'), 'headers': headers, 'lastModified': headers.get('Last-Modified'), 'url': url}
+        path = os.path.join(self.directory, key)
+        file = tempfile.NamedTemporaryFile(dir=self.directory, delete=False, prefix='.')
+        try:
+            with file:
+                file.write(json.dumps(meta).encode() + b'\n')
+                file.write(zlib.compress(response.content, 6))
+            size = os.path.getsize(file.name)
+            os.replace(file.name, path)
+        except OSError as e:
+            _remove(file.name)
+            if has_app_context():
+                app.logger.warning(f'Failed to cache {url}: {e}')
+            return
+        entry = CachedEntry(path, size, time.time(), etag=meta['etag'], last_modified=meta['lastModified'])
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous:
+                self.total_bytes -= previous.size
+            self._entries[key] = entry
+            self.total_bytes += size
+            self._counts['stored'] += 1
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, oldest = self._entries.popitem(last=False)
+                self.total_bytes -= oldest.size
+                self._counts['evictions'] += 1
+                evicted.append(oldest.path)
+        for evicted_path in evicted:
+            _remove(evicted_path)
+
+    def _evict(self, key, entry):
+        # Unless a fresh copy has been stored meanwhile, drop the entry and its file, so total_bytes matches the disk.
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            del self._entries[key]
+            self.total_bytes -= entry.size
+            _remove(entry.path)
+
+    def _touch(self, entry):
+        # The file's mtime is its stored_at across restarts.
+        entry.stored_at = time.time()
+        try:
+            os.utime(entry.path)
+        except OSError:
+            pass
+
+    def _ttl(self, url):
+        if self.ttls:
+            path = url.split('?', 1)[0]
+            for pattern, ttl in self.ttls:
+                if pattern.search(path):
+                    return ttl
+        return 0
+
+
+def full_url(url, params=None):
+    if not params:
+        return url
+    request = PreparedRequest()
+    request.prepare_url(url, params)
+    return request.url
+
+
+def _key(url, scope=None):
+    return hashlib.sha256(f'{scope or ""}\n{url}'.encode()).hexdigest()
+
+
+def _read_meta(file):
+    meta = json.loads(file.readline())
+    if not isinstance(meta, dict) or not isinstance(meta.get('headers'), dict):
+        raise ValueError('Malformed cache entry')
+    return meta
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
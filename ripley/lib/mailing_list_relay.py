@@ -0,0 +1,234 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import os
+import shutil
+from smtplib import SMTPRecipientsRefused
+import tempfile
+import threading
+import time
+
+from flask import current_app as app, has_app_context
+from ripley import db
+from ripley.externals.smtp import get_smtp_pool
+from ripley.lib.metrics import registry as metrics_registry
+from sqlalchemy import text
+
+# Fan-out of inbound mail to the members of a mailing list.
+#
+# Membership is served from an in-process index: list name to list id, and per list a tuple of recipient addresses plus
+# a frozenset of the addresses allowed to send. Members of a list are loaded on first use. Every
+# RELAY_INDEX_CHECK_INTERVAL seconds, one query over 'canvas_site_mailing_lists' finds lists whose updated_at changed
+# (e.g., repopulated by another process) and drops them from the index; populate_mailing_list invalidates in-process.
+#
+# Recipients are split into batches of RELAY_BATCH_SIZE, one SMTP transaction (many RCPT, one DATA) per batch, with up to
+# RELAY_CONCURRENCY batches in flight. The message is spooled to disk once and streamed from there by each batch, so
+# large attachments are neither held in memory nor copied per recipient.
+
+
+class ListMembers:
+
+    __slots__ = ['list_name', 'mailing_list_id', 'recipients', 'senders', 'version']
+
+    def __init__(self, mailing_list_id, list_name, recipients, senders, version):
+        self.list_name = list_name
+        self.mailing_list_id = mailing_list_id
+        self.recipients = recipients
+        self.senders = senders
+        self.version = version
+
+    def can_send(self, email_address):
+        return (email_address or '').strip().lower() in self.senders
+
+
+class MembershipIndex:
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._checked_at = None
+        self._counts = {'hits': 0, 'invalidations': 0, 'loads': 0}
+        self._lists = {}
+        self._lock = threading.Lock()
+        self._members = {}
+
+    def get(self, list_name):
+        """Return ListMembers of the named list, or None if there is no such list."""
+        list_name = (list_name or '').strip().lower()
+        with self._lock:
+            self._check_for_changes()
+            entry = self._lists.get(list_name)
+            if entry is None:
+                return None
+            mailing_list_id, version = entry
+            members = self._members.get(mailing_list_id)
+            if members is None:
+                members = self._members[mailing_list_id] = _load_members(mailing_list_id, list_name, version)
+                self._counts['loads'] += 1
+            else:
+                self._counts['hits'] += 1
+            return members
+
+    def invalidate(self, mailing_list_id=None):
+        """Drop one list, or all lists if mailing_list_id is None, and re-check list versions on next use."""
+        with self._lock:
+            self._counts['invalidations'] += 1
+            if mailing_list_id is None:
+                self._members.clear()
+            else:
+                self._members.pop(mailing_list_id, None)
+            self._checked_at = None
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._counts,
+                'lists': len(self._lists),
+                'loadedLists': len(self._members),
+                'loadedMembers': sum(len(members.recipients) for members in self._members.values()),
+            }
+
+    def _check_for_changes(self):
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return
+        lists = {}
+        for mailing_list_id, list_name, version in db.session.execute(
+            text('SELECT id, lower(list_name), updated_at FROM canvas_site_mailing_lists WHERE list_name IS NOT NULL'),
+        ).all():
+            lists[list_name] = (mailing_list_id, version)
+        current = {mailing_list_id: version for mailing_list_id, version in lists.values()}
+        for mailing_list_id, members in list(self._members.items()):
+            if current.get(mailing_list_id) != members.version:
+                del self._members[mailing_list_id]
+        self._lists = lists
+        self._checked_at = now
+
+
+def get_membership_index():
+    index = app.extensions.get('mailing_list_index')
+    if index is None:
+        index = app.extensions.setdefault(
+            'mailing_list_index',
+            MembershipIndex(check_interval=app.config['RELAY_INDEX_CHECK_INTERVAL']),
+        )
+    return index
+
+
+def invalidate_mailing_list(mailing_list_id):
+    index = app.extensions.get('mailing_list_index') if has_app_context() else None
+    if index:
+        index.invalidate(mailing_list_id)
+
+
+def relay_message(list_address, sender, message):
+    """Deliver an inbound message to all members of the list, if the sender is allowed to post to it.
+
+    The message is raw RFC 5322 bytes: a binary file object or a file path. Return a summary with status 'delivered',
+    'rejected' (sender may not post) or 'unknown_list'.
+    """
+    started_at = time.perf_counter()
+    list_name = list_address.split('@', 1)[0]
+    members = get_membership_index().get(list_name)
+    if members is None:
+        status = 'unknown_list'
+    elif not members.can_send(sender):
+        status = 'rejected'
+    else:
+        status = 'delivered'
+    summary = {'batches': 0, 'delivered': 0, 'failed': 0, 'listName': list_name, 'refused': 0, 'status': status}
+    if status == 'delivered':
+        summary.update(_deliver(members, message))
+    summary['seconds'] = round(time.perf_counter() - started_at, 3)
+    metrics_registry.inc('ripley_relay_messages_total', (('status', status),))
+    for outcome in ('delivered', 'failed', 'refused'):
+        if summary[outcome]:
+            metrics_registry.inc('ripley_relay_recipients_total', (('outcome', outcome),), summary[outcome])
+    app.logger.info(f'Relayed message from {sender} to {list_address}: {summary}')
+    return summary
+
+
+def _deliver(members, message):
+    domain = app.config['RELAY_LIST_DOMAIN']
+    envelope_from = f'{members.list_name}-bounces@{domain}'
+    headers = (
+        f'List-Id: <{members.list_name}.{domain}>\r\n'
+        f'List-Post: <mailto:{members.list_name}@{domain}>\r\n'
+        'Precedence: list\r\n'
+    ).encode()
+    batch_size = app.config['RELAY_BATCH_SIZE']
+    recipients = members.recipients
+    batches = [recipients[i:i + batch_size] for i in range(0, len(recipients), batch_size)]
+    pool = get_smtp_pool()
+    summary = {'batches': len(batches), 'delivered': 0, 'failed': 0, 'refused': 0}
+    with _spooled(message) as path:
+        with ThreadPoolExecutor(max_workers=app.config['RELAY_CONCURRENCY'], thread_name_prefix='relay') as executor:
+            results = executor.map(lambda batch: _send_batch(pool, envelope_from, batch, path, headers), batches)
+            for batch, (refused, error) in zip(batches, results):
+                if error:
+                    app.logger.warning(f'Failed to relay to {len(batch)} members of {members.list_name}: {error}')
+                    summary['failed'] += len(batch)
+                else:
+                    summary['delivered'] += len(batch) - len(refused)
+                    summary['refused'] += len(refused)
+    return summary
+
+
+def _load_members(mailing_list_id, list_name, version):
+    recipients = []
+    senders = set()
+    for email_address, can_send in db.session.execute(
+        text("""SELECT email_address, can_send FROM canvas_site_mailing_list_members
+            WHERE mailing_list_id = :mailing_list_id AND deleted_at IS NULL ORDER BY email_address"""),
+        {'mailing_list_id': mailing_list_id},
+    ).all():
+        recipients.append(email_address)
+        if can_send:
+            senders.add(email_address)
+    return ListMembers(mailing_list_id, list_name, tuple(recipients), frozenset(senders), version)
+
+
+def _send_batch(pool, envelope_from, recipients, path, headers):
+    # Runs on the executor, outside the app context. Return refused recipients and the error, if any.
+    try:
+        return pool.send_file(envelope_from, recipients, path, headers), None
+    except SMTPRecipientsRefused as e:
+        return e.recipients, None
+    except Exception as e:
+        return {}, e
+
+
+@contextmanager
+def _spooled(message):
+    if isinstance(message, (str, os.PathLike)):
+        yield message
+        return
+    with tempfile.NamedTemporaryFile(delete=False, prefix='relay-', suffix='.eml') as file:
+        shutil.copyfileobj(message, file)
+    try:
+        yield file.name
+    finally:
+        os.unlink(file.name)
@@ -0,0 +1,318 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import csv
+import hashlib
+import io
+import time
+
+from flask import current_app as app
+from ripley import batched_commit, db, std_commit
+from ripley.lib.mailing_list_relay import invalidate_mailing_list
+from ripley.lib.util import utc_now
+from ripley.models.mailing_list import MailingList
+from sqlalchemy import bindparam, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Population of mailing lists: diff the Canvas site roster against list members, then write changes in bulk.
+#
+# Roster members are dicts with keys email_address, can_send, first_name and last_name. Adds, restores (previously
+# removed members back on the roster), can_send flips and name changes are applied with one upsert; on PostgreSQL rows
+# are staged with COPY. Removals are soft deletes (deleted_at) in one UPDATE. If a bulk statement fails, its rows are
+# written one by one so that a bad row is counted as an error instead of failing the whole list.
+#
+# Each error-free population stores a fingerprint of the roster, and later runs skip sites whose roster is unchanged.
+
+SENDER_ENROLLMENT_TYPES = ['DesignerEnrollment', 'TaEnrollment', 'TeacherEnrollment']
+STAGING_TABLE = 'mailing_list_members_staging'
+
+
+class MembershipChanges:
+
+    def __init__(self):
+        self.adds = []
+        self.invalid = []
+        self.removes = []
+        self.restores = []
+        self.unchanged = 0
+        self.updates = []
+
+    @property
+    def upserts(self):
+        return self.adds + self.restores + self.updates
+
+    def to_api_json(self):
+        return {
+            'added': len(self.adds),
+            'invalid': len(self.invalid),
+            'removed': len(self.removes),
+            'restored': len(self.restores),
+            'unchanged': self.unchanged,
+            'updated': len(self.updates),
+        }
+
+
+def compute_membership_changes(existing_members, roster):
+    """Diff in memory. The existing_members dict is keyed by email address and includes soft-deleted members."""
+    changes = MembershipChanges()
+    wanted, changes.invalid = _normalize_roster(roster)
+    for email_address, candidate in wanted.items():
+        member = existing_members.get(email_address)
+        if not member:
+            changes.adds.append(candidate)
+        elif member['deleted_at']:
+            changes.restores.append(candidate)
+        elif any(member[key] != candidate[key] for key in ('can_send', 'first_name', 'last_name')):
+            changes.updates.append(candidate)
+        else:
+            changes.unchanged += 1
+    for email_address, member in existing_members.items():
+        if email_address not in wanted and not member['deleted_at']:
+            changes.removes.append(email_address)
+    return changes
+
+
+def get_canvas_site_roster(canvas_site_id):
+    """Roster of a Canvas site, as expected by populate_mailing_list. Teachers, TAs and designers can send."""
+    # Imported here so that web workers, which never fetch rosters, start without the Canvas client and its deps.
+    from ripley.externals.canvas import get_course_users
+    roster = []
+    for user in get_course_users(canvas_site_id):
+        last_name, _, first_name = (user.get('sortable_name') or '').partition(',')
+        roster.append({
+            'can_send': any(e.get('type') in SENDER_ENROLLMENT_TYPES for e in user.get('enrollments') or []),
+            'email_address': user.get('email'),
+            'first_name': first_name.strip() or None,
+            'last_name': last_name.strip() or None,
+        })
+    return roster
+
+
+def roster_fingerprint(roster):
+    """Hash of the sorted, normalized member tuples. Entry order and duplicate entries do not change the fingerprint."""
+    wanted, _ = _normalize_roster(roster)
+    digest = hashlib.sha256()
+    for email_address in sorted(wanted):
+        member = wanted[email_address]
+        digest.update(repr((email_address, member['can_send'], member['first_name'], member['last_name'])).encode())
+    return digest.hexdigest()
+
+
+def populate_mailing_list(mailing_list_id, roster, force=False):
+    """Diff and write, unless the roster fingerprint matches the one stored by the last error-free population."""
+    started_at = time.perf_counter()
+    fingerprint = roster_fingerprint(roster)
+    if not force:
+        stored_fingerprint = db.session.execute(
+            text('SELECT roster_fingerprint FROM canvas_site_mailing_lists WHERE id = :id'),
+            {'id': mailing_list_id},
+        ).scalar()
+        if stored_fingerprint == fingerprint:
+            return {'skipped': True}
+    changes = compute_membership_changes(_get_existing_members(mailing_list_id), roster)
+    add_errors = len(changes.invalid) + _upsert_members(mailing_list_id, changes.upserts)
+    remove_errors = _soft_delete_members(mailing_list_id, changes.removes)
+    members_count = db.session.execute(
+        text("""SELECT COUNT(*) FROM canvas_site_mailing_list_members
+            WHERE mailing_list_id = :mailing_list_id AND deleted_at IS NULL"""),
+        {'mailing_list_id': mailing_list_id},
+    ).scalar()
+    MailingList.update_population_stats(
+        mailing_list_id=mailing_list_id,
+        members_count=members_count,
+        add_errors=add_errors,
+        remove_errors=remove_errors,
+        # After errors, leave no fingerprint so that the next run retries.
+        roster_fingerprint=None if (add_errors or remove_errors) else fingerprint,
+    )
+    invalidate_mailing_list(mailing_list_id)
+    summary = {
+        **changes.to_api_json(),
+        'addErrors': add_errors,
+        'membersCount': members_count,
+        'removeErrors': remove_errors,
+        'seconds': round(time.perf_counter() - started_at, 3),
+        'skipped': False,
+    }
+    app.logger.info(f'Populated mailing list {mailing_list_id}: {summary}')
+    return summary
+
+
+def sync_mailing_lists(get_roster, force=False):
+    """Nightly run over all mailing lists. The get_roster function takes a Canvas site id and returns its roster.
+
+    Sites whose roster fingerprint is unchanged are skipped. Time saved is estimated from the mean duration of sites
+    that were re-diffed in the same run. Each site is written in a savepoint and committed when done. A site that fails,
+    e.g. a Canvas site since deleted, is rolled back, logged and counted as failed, and the run goes on to the next site.
+    """
+    started_at = time.perf_counter()
+    failed = 0
+    populated_seconds = []
+    skipped = 0
+    for mailing_list_id, canvas_site_id in db.session.execute(
+        text('SELECT id, canvas_site_id FROM canvas_site_mailing_lists ORDER BY id'),
+    ).all():
+        site_started_at = time.perf_counter()
+        savepoint = db.session.begin_nested()
+        try:
+            summary = populate_mailing_list(mailing_list_id, get_roster(canvas_site_id), force=force)
+            savepoint.commit()
+        except Exception as e:
+            savepoint.rollback()
+            app.logger.exception(f'Failed to sync mailing list {mailing_list_id} of Canvas site {canvas_site_id}: {e}')
+            failed += 1
+            continue
+        std_commit()
+        if summary['skipped']:
+            skipped += 1
+        else:
+            populated_seconds.append(time.perf_counter() - site_started_at)
+    mean_seconds = sum(populated_seconds) / len(populated_seconds) if populated_seconds else 0
+    summary = {
+        'failed': failed,
+        'populated': len(populated_seconds),
+        'seconds': round(time.perf_counter() - started_at, 3),
+        'secondsSavedEstimate': round(skipped * mean_seconds, 3),
+        'skipped': skipped,
+    }
+    app.logger.info(
+        f"Mailing list sync: {summary['populated']} sites populated, {skipped} unchanged sites skipped and {failed} "
+        f"failed in {summary['seconds']} s; skipping saved about {summary['secondsSavedEstimate']} s.",
+    )
+    return summary
+
+
+def _normalize_roster(roster):
+    invalid = []
+    wanted = {}
+    for member in roster:
+        email_address = (member.get('email_address') or '').strip().lower()
+        if not email_address:
+            invalid.append(member)
+            continue
+        candidate = {
+            'can_send': bool(member.get('can_send')),
+            'email_address': email_address,
+            'first_name': member.get('first_name') or None,
+            'last_name': member.get('last_name') or None,
+        }
+        if email_address in wanted:
+            # One address, more than one roster entry: sending rights win.
+            candidate['can_send'] = candidate['can_send'] or wanted[email_address]['can_send']
+        wanted[email_address] = candidate
+    return wanted, invalid
+
+
+def _get_existing_members(mailing_list_id):
+    results = db.session.execute(
+        text("""SELECT email_address, can_send, first_name, last_name, deleted_at
+            FROM canvas_site_mailing_list_members WHERE mailing_list_id = :mailing_list_id"""),
+        {'mailing_list_id': mailing_list_id},
+    )
+    return {row['email_address']: dict(row) for row in results.mappings()}
+
+
+def _upsert_members(mailing_list_id, members):
+    """Return the number of members that could not be written."""
+    if not members:
+        return 0
+    if db.session.get_bind().dialect.name == 'postgresql':
+        connection = db.session.connection()
+        savepoint = db.session.begin_nested()
+        try:
+            _copy_to_staging_table(connection, members)
+            db.session.execute(
+                text(f"""INSERT INTO canvas_site_mailing_list_members
+                    (mailing_list_id, email_address, can_send, first_name, last_name, created_at, updated_at)
+                    SELECT :mailing_list_id, email_address, can_send, first_name, last_name, :now, :now
+                    FROM {STAGING_TABLE}
+                    ON CONFLICT (mailing_list_id, email_address) DO UPDATE SET
+                        can_send = EXCLUDED.can_send, first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name,
+                        deleted_at = NULL, updated_at = EXCLUDED.updated_at"""),
+                {'mailing_list_id': mailing_list_id, 'now': utc_now()},
+            )
+            db.session.execute(text(f'DROP TABLE {STAGING_TABLE}'))
+            savepoint.commit()
+            return 0
+        except (SQLAlchemyError, connection.dialect.dbapi.Error) as e:
+            savepoint.rollback()
+            app.logger.warning(f'Bulk upsert to mailing list {mailing_list_id} failed, falling back to row-by-row: {e}')
+    return _upsert_members_row_by_row(mailing_list_id, members)
+
+
+def _copy_to_staging_table(connection, members):
+    db.session.execute(
+        text(f"""CREATE TEMPORARY TABLE {STAGING_TABLE} (
+            email_address CHARACTER VARYING(255) NOT NULL,
+            can_send BOOLEAN NOT NULL,
+            first_name CHARACTER VARYING(255),
+            last_name CHARACTER VARYING(255)
+        ) ON COMMIT DROP"""),
+    )
+    rows = io.StringIO()
+    writer = csv.writer(rows)
+    for member in members:
+        writer.writerow([member['email_address'], member['can_send'], member['first_name'], member['last_name']])
+    rows.seek(0)
+    # COPY needs the DBAPI cursor. The statement runs on the session's connection, within its open transaction.
+    with connection.connection.cursor() as cursor:
+        sql = f'COPY {STAGING_TABLE} (email_address, can_send, first_name, last_name) FROM STDIN WITH (FORMAT csv)'
+        cursor.copy_expert(sql, rows)
+
+
+def _upsert_members_row_by_row(mailing_list_id, members):
+    statement = text("""INSERT INTO canvas_site_mailing_list_members
+        (mailing_list_id, email_address, can_send, first_name, last_name, created_at, updated_at)
+        VALUES (:mailing_list_id, :email_address, :can_send, :first_name, :last_name, :now, :now)
+        ON CONFLICT (mailing_list_id, email_address) DO UPDATE SET
+            can_send = EXCLUDED.can_send, first_name = EXCLUDED.first_name, last_name = EXCLUDED.last_name,
+            deleted_at = NULL, updated_at = EXCLUDED.updated_at""")
+    now = utc_now()
+    with batched_commit(every=500) as batch:
+        for member in members:
+            with batch.item(member['email_address']):
+                db.session.execute(statement, {**member, 'mailing_list_id': mailing_list_id, 'now': now})
+    return batch.error_count
+
+
+def _soft_delete_members(mailing_list_id, email_addresses):
+    """Return the number of members that could not be removed."""
+    if not email_addresses:
+        return 0
+    savepoint = db.session.begin_nested()
+    try:
+        now = utc_now()
+        db.session.execute(
+            text("""UPDATE canvas_site_mailing_list_members SET deleted_at = :now, updated_at = :now
+                WHERE mailing_list_id = :mailing_list_id AND deleted_at IS NULL
+                AND email_address IN :email_addresses""").bindparams(bindparam('email_addresses', expanding=True)),
+            {'email_addresses': email_addresses, 'mailing_list_id': mailing_list_id, 'now': now},
+        )
+        savepoint.commit()
+        return 0
+    except SQLAlchemyError as e:
+        savepoint.rollback()
+        app.logger.error(f'Failed to remove {len(email_addresses)} members from mailing list {mailing_list_id}: {e}')
+        return len(email_addresses)
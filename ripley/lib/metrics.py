@@ -0,0 +1,314 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+from bisect import bisect_left
+import glob
+import json
+import os
+import threading
+import time
+import weakref
+
+from flask import current_app as app, g, request
+
+# Process-local metrics with Prometheus text exposition.
+#
+# Writers never take a lock: each thread updates its own shard, and shards are summed when metrics are rendered. When a
+# thread exits, its shard is folded into the retired totals. Under mod_wsgi, each worker process also writes a snapshot
+# to METRICS_MULTIPROCESS_DIR at most every METRICS_FLUSH_INTERVAL seconds, and /api/metrics merges the snapshots of all
+# workers.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+METRICS = {
+    'ripley_cache_hit_ratio': ('gauge', 'Share of cache lookups served without calling the loader.'),
+    'ripley_cache_load_seconds': ('histogram', 'Time spent computing values on cache misses.'),
+    'ripley_cache_hits_total': ('counter', 'Cache lookups served from a cache tier.'),
+    'ripley_cache_misses_total': ('counter', 'Cache lookups that called the loader.'),
+    'ripley_canvas_request_duration_seconds': ('histogram', 'Canvas API request latency.'),
+    'ripley_canvas_requests_total': ('counter', 'Canvas API requests, by status.'),
+    'ripley_canvas_throttled_total': ('counter', 'Canvas API requests rejected by the Canvas rate limit.'),
+    'ripley_db_connections_closed_total': ('counter', 'DB connections closed by the pool.'),
+    'ripley_db_connections_invalidated_total': ('counter', 'DB connections invalidated, e.g. by a failed pre-ping.'),
+    'ripley_db_connections_opened_total': ('counter', 'DB connections opened by the pool.'),
+    'ripley_db_pool_checkins_total': ('counter', 'DB connections returned to the pool.'),
+    'ripley_db_pool_checkout_seconds': ('histogram', 'Time spent waiting for a connection from the DB pool.'),
+    'ripley_job_duration_seconds': ('histogram', 'Duration of job attempts, by job.'),
+    'ripley_jobs_total': ('counter', 'Job attempts, by job and outcome.'),
+    'ripley_log_queue_depth': ('gauge', 'Log records waiting to be written, by queue.'),
+    'ripley_log_records_dropped_total': ('counter', 'Log records dropped because the queue was full, by queue.'),
+    'ripley_http_request_duration_seconds': ('histogram', 'HTTP request latency.'),
+    'ripley_http_requests_in_flight': ('gauge', 'HTTP requests currently being handled.'),
+    'ripley_http_requests_total': ('counter', 'HTTP requests handled, by route and status.'),
+    'ripley_relay_messages_total': ('counter', 'Inbound mailing list messages, by status.'),
+    'ripley_relay_recipients_total': ('counter', 'Mailing list members relayed to, by outcome.'),
+}
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._collectors = {}
+        self._retired = self._new_shard()
+        self._shards_lock = threading.RLock()
+        self._shards = [self._retired]
+        self._local = threading.local()
+        self.last_flush = 0
+
+    def inc(self, name, labels=(), value=1):
+        counters = self._shard()['counters']
+        key = (name, labels)
+        counters[key] = counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=DEFAULT_BUCKETS):
+        histograms = self._shard()['histograms']
+        key = (name, labels)
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = {'buckets': buckets, 'counts': [0] * (len(buckets) + 1), 'sum': 0.0}
+        histogram['counts'][bisect_left(histogram['buckets'], value)] += 1
+        histogram['sum'] += value
+
+    def request_started(self):
+        self._shard()['inFlight'][0] += 1
+
+    def request_finished(self):
+        self._shard()['inFlight'][1] += 1
+
+    def register_collector(self, key, collector):
+        """Register a callable returning {(name, labels): value}, read at snapshot time.
+
+        Values are cumulative counters, except for metrics of type gauge in METRICS, which are current values.
+        """
+        self._collectors[key] = collector
+
+    def snapshot(self):
+        counters = {}
+        histograms = {}
+        in_flight = 0
+        # Holding the lock keeps the shard of a thread that exits mid-snapshot from counting twice, live and retired.
+        with self._shards_lock:
+            for shard in self._shards:
+                # Copies of dicts and lists are atomic under the GIL, so the owning thread may keep writing.
+                for key, value in shard['counters'].copy().items():
+                    counters[key] = counters.get(key, 0) + value
+                for key, histogram in shard['histograms'].copy().items():
+                    _merge_histogram(histograms, key, histogram['buckets'], list(histogram['counts']), histogram['sum'])
+                started, finished = list(shard['inFlight'])
+                in_flight += started - finished
+        gauges = {('ripley_http_requests_in_flight', ()): in_flight}
+        for collector in list(self._collectors.values()):
+            for key, value in collector().items():
+                values = gauges if METRICS.get(key[0], ('counter',))[0] == 'gauge' else counters
+                values[key] = values.get(key, 0) + value
+        return {
+            'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+            'gauges': [[name, list(labels), value] for (name, labels), value in gauges.items()],
+            'histograms': [[name, list(labels), h['buckets'], h['counts'], h['sum']] for (name, labels), h in histograms.items()],
+            'pid': os.getpid(),
+        }
+
+    def flush(self, directory):
+        """Write this process's snapshot where other workers can read it. Rename is atomic, so readers never see a partial file."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(tmp_path, path)
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self, directory, interval):
+        if directory and time.monotonic() - self.last_flush >= interval:
+            self.flush(directory)
+
+    def render(self, directory=None):
+        snapshots = [self.snapshot()]
+        if directory:
+            snapshots += _read_snapshots(directory, exclude_pid=os.getpid())
+        return render_snapshots(snapshots)
+
+    def reset(self):
+        """Forget all observations, as in a worker process forked from one that has made some."""
+        self._retired = self._new_shard()
+        self._shards_lock = threading.RLock()
+        self._shards = [self._retired]
+        # Dropping the old thread-locals retires their shards, which are no longer registered and so are ignored.
+        self._local = threading.local()
+        self.last_flush = 0
+
+    def _shard(self):
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            holder = self._local.holder = _ShardHolder()
+            with self._shards_lock:
+                self._shards.append(holder.shard)
+            # A thread's locals are released when it exits, and the holder with them.
+            weakref.finalize(holder, self._retire, holder.shard)
+        return holder.shard
+
+    @staticmethod
+    def _new_shard():
+        return {'counters': {}, 'histograms': {}, 'inFlight': [0, 0]}
+
+    def _retire(self, shard):
+        """Fold the shard of an exited thread into the retired totals, so that shards do not pile up as threads come and go."""
+        with self._shards_lock:
+            if not any(s is shard for s in self._shards):
+                return
+            self._shards = [s for s in self._shards if s is not shard]
+            retired = self._retired
+            for key, value in shard['counters'].items():
+                retired['counters'][key] = retired['counters'].get(key, 0) + value
+            for key, histogram in shard['histograms'].items():
+                _merge_histogram(retired['histograms'], key, histogram['buckets'], histogram['counts'], histogram['sum'])
+            retired['inFlight'] = [a + b for a, b in zip(retired['inFlight'], shard['inFlight'])]
+
+
+class _ShardHolder:
+
+    def __init__(self):
+        self.shard = MetricsRegistry._new_shard()
+
+
+registry = MetricsRegistry()
+
+
+def start_request_metrics():
+    if app.config['METRICS_ENABLED']:
+        registry.request_started()
+        g.metrics_in_flight = True
+
+
+def observe_request(response, duration_ms):
+    if not app.config['METRICS_ENABLED']:
+        return
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    registry.inc('ripley_http_requests_total', (('method', request.method), ('route', route), ('status', str(response.status_code))))
+    if duration_ms is not None:
+        registry.observe('ripley_http_request_duration_seconds', duration_ms / 1000, (('method', request.method), ('route', route)))
+    registry.maybe_flush(app.config['METRICS_MULTIPROCESS_DIR'], app.config['METRICS_FLUSH_INTERVAL'])
+
+
+def finish_request_metrics():
+    if g.pop('metrics_in_flight', False):
+        registry.request_finished()
+
+
+def render_snapshots(snapshots):
+    values, histograms = _merge_snapshots(snapshots)
+    names = sorted({name for name, _ in values} | {name for name, _ in histograms})
+    lines = []
+    for name in names:
+        metric_type, description = METRICS.get(name, ('untyped', name))
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} {metric_type}']
+        if metric_type == 'histogram':
+            for (_, labels), histogram in sorted(item for item in histograms.items() if item[0][0] == name):
+                lines += _histogram_lines(name, labels, histogram)
+        else:
+            for (_, labels), value in sorted(item for item in values.items() if item[0][0] == name):
+                lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels)
+    return '{' + pairs + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _histogram_lines(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip([*histogram['buckets'], '+Inf'], histogram['counts']):
+        cumulative += count
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+    lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+    lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(histogram["sum"])}')
+    return lines
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _labels_key(labels):
+    return tuple(tuple(pair) for pair in labels)
+
+
+def _merge_histogram(histograms, key, buckets, counts, total):
+    histogram = histograms.get(key)
+    if histogram is None:
+        histograms[key] = {'buckets': buckets, 'counts': list(counts), 'sum': total}
+    else:
+        histogram['counts'] = [a + b for a, b in zip(histogram['counts'], counts)]
+        histogram['sum'] += total
+
+
+def _merge_snapshots(snapshots):
+    values = {}
+    histograms = {}
+    for snapshot in snapshots:
+        # Counters of exited workers still count toward totals, but their gauges no longer describe anything.
+        gauges = snapshot['gauges'] if snapshot.get('alive', True) else []
+        for name, labels, value in snapshot['counters'] + gauges:
+            key = (name, _labels_key(labels))
+            values[key] = values.get(key, 0) + value
+        for name, labels, buckets, counts, total in snapshot['histograms']:
+            _merge_histogram(histograms, (name, _labels_key(labels)), tuple(buckets), counts, total)
+    for (name, labels), hits in list(values.items()):
+        if name == 'ripley_cache_hits_total':
+            lookups = hits + values.get(('ripley_cache_misses_total', labels), 0)
+            if lookups:
+                values[('ripley_cache_hit_ratio', labels)] = round(hits / lookups, 4)
+    return values, histograms
+
+
+def _read_snapshots(directory, exclude_pid):
+    snapshots = []
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        try:
+            with open(path) as file:
+                snapshot = json.load(file)
+        except (OSError, ValueError):
+            continue
+        if snapshot.get('pid') != exclude_pid:
+            snapshot['alive'] = _is_alive(snapshot.get('pid'))
+            snapshots.append(snapshot)
+    return snapshots
@@ -0,0 +1,220 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import importlib
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+
+from ripley import db
+from ripley.lib.metrics import registry as metrics_registry
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# A pre-forking HTTP server.
+#
+# The master process creates the app, warms it up and freezes the garbage collector before forking workers. Each worker
+# then shares the master's memory pages, copy-on-write, instead of importing and loading everything for itself. Each
+# worker serves requests from a pool of threads, accepting from a listening socket that all workers share.
+
+# Idle keep-alive connections are closed after this many seconds, so that they do not hold request threads.
+KEEP_ALIVE_TIMEOUT = 15
+
+# Workers that exit within this many seconds of starting are respawned only after a pause of as many seconds.
+RESPAWN_BACKOFF = 1
+
+# Imported by request handlers on first use. Importing them in the master shares their code objects.
+WARM_UP_MODULES = (
+    'ripley.models.user',
+)
+
+QUEUE_HANDLER_KEYS = ('logging_queue', 'access_log_queue')
+
+
+def serve(app, workers, threads, host=None, port=None):
+    """Serve app on host:port, from this process if workers is zero, else from that many forked worker processes."""
+    host = app.config['HOST'] if host is None else host
+    port = app.config['PORT'] if port is None else port
+    warm_up(app)
+    listener = socket.create_server((host, port), backlog=socket.SOMAXCONN)
+    app.logger.info(f'Listening on {host}:{listener.getsockname()[1]} with {workers} workers of {threads} threads')
+    if not workers:
+        _serve_forever(app, listener, threads)
+        return
+    # Anything still reachable now is shared by every worker. A collection in a worker would touch (and so copy) each
+    # object's page, so frozen objects are exempt from collection.
+    gc.collect()
+    gc.freeze()
+    Master(app, listener, workers, threads).run()
+
+
+def warm_up(app):
+    """Load in this process whatever workers would otherwise each load for themselves on first use.
+
+    The API payloads and the compressed front-end shell are already built by create_app.
+    """
+    for module in WARM_UP_MODULES:
+        importlib.import_module(module)
+
+
+class Master:
+
+    def __init__(self, app, listener, workers, threads):
+        self.app = app
+        self.listener = listener
+        self.threads = threads
+        self.workers = workers
+        self.pids = {}
+        self.stopping = False
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self._stop)
+        signal.signal(signal.SIGINT, self._stop)
+        for _ in range(self.workers):
+            self._spawn()
+        while self.pids:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            started_at = self.pids.pop(pid, None)
+            if started_at is None or self.stopping:
+                continue
+            self.app.logger.warning(f'Worker {pid} exited with status {os.waitstatus_to_exitcode(status)}')
+            if time.monotonic() - started_at < RESPAWN_BACKOFF:
+                time.sleep(RESPAWN_BACKOFF)
+            if not self.stopping:
+                self._spawn()
+        self.listener.close()
+
+    def _spawn(self):
+        _stop_queue_listeners(self.app)
+        pid = os.fork()
+        if pid:
+            _start_queue_listeners(self.app)
+            self.pids[pid] = time.monotonic()
+            return
+        exit_code = 1
+        try:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            signal.signal(signal.SIGTERM, _raise_keyboard_interrupt)
+            _after_fork(self.app)
+            _serve_forever(self.app, self.listener, self.threads)
+            exit_code = 0
+        except BaseException:
+            self.app.logger.exception(f'Worker {os.getpid()} failed')
+        finally:
+            _stop_queue_listeners(self.app)
+            logging.shutdown()
+            os._exit(exit_code)
+
+    def _stop(self, signum, frame):
+        self.stopping = True
+        for pid in list(self.pids):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Serve each connection from a bounded pool of threads. While all are busy, stop accepting: other workers will."""
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads, fd=None):
+        super().__init__(host, port, app, handler=RequestHandler, fd=fd)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='request')
+        self.idle_threads = threading.BoundedSemaphore(threads)
+
+    def process_request(self, request, client_address):
+        self.idle_threads.acquire()
+        self.executor.submit(self._process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.executor.shutdown(wait=True)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self.idle_threads.release()
+
+
+class RequestHandler(WSGIRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEP_ALIVE_TIMEOUT
+
+
+def _after_fork(app):
+    # Threads, connections and metrics inherited from the master belong to the master.
+    _start_queue_listeners(app)
+    metrics_registry.reset()
+    with app.app_context():
+        db.engine.dispose(close=False)
+    if app.config['FRONT_END_SHELL_WATCH'] and app.extensions.get('front_end_shell'):
+        app.extensions['front_end_shell'].watch()
+
+
+def _raise_keyboard_interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+
+def _serve_forever(app, listener, threads):
+    host, port = listener.getsockname()[:2]
+    server = PooledWSGIServer(host, port, app, threads, fd=listener.fileno())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        # Requests in progress are allowed to finish.
+        server.server_close()
+
+
+def _start_queue_listeners(app):
+    for key in QUEUE_HANDLER_KEYS:
+        queue_handler = app.extensions.get(key)
+        if queue_handler:
+            queue_handler.listener.start()
+
+
+def _stop_queue_listeners(app):
+    # A listener thread does not survive a fork. Stop it first, so that no record is stranded mid-write.
+    for key in QUEUE_HANDLER_KEYS:
+        queue_handler = app.extensions.get(key)
+        if queue_handler:
+            queue_handler.listener.stop()
@@ -0,0 +1,141 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import csv
+import gzip
+import io
+from itertools import islice
+import os
+import time
+
+from flask import current_app as app
+from ripley import stream_query
+
+# CSV sets for Canvas SIS imports, written in constant memory.
+#
+# Rows stream from the DB over a server-side cursor, fetched SIS_IMPORT_CSV_YIELD_PER at a time, and are written to
+# numbered files of at most SIS_IMPORT_CSV_MAX_BYTES (measured before compression). Every file starts with the header
+# row, so each one can be imported on its own.
+
+ENROLLMENTS_CSV_HEADER = ['course_id', 'user_id', 'role', 'section_id', 'status']
+
+
+def export_query_to_csv(sql, directory, basename, params=None, header=None, compress=None, max_bytes=None):
+    """Write the results of a query to a CSV set. Column names are the header unless one is given."""
+    started_at = time.perf_counter()
+    rows = stream_query(sql, params, yield_per=app.config['SIS_IMPORT_CSV_YIELD_PER'])
+    with ChunkedCsvWriter(directory, basename, header=header, compress=compress, max_bytes=max_bytes) as writer:
+        writer.writerows(rows)
+    summary = {
+        'files': writer.paths,
+        'rows': writer.row_count,
+        'seconds': round(time.perf_counter() - started_at, 3),
+    }
+    app.logger.info(f"Wrote {summary['rows']} rows of {basename} to {len(summary['files'])} files in {summary['seconds']} s")
+    return summary
+
+
+class ChunkedCsvWriter:
+
+    def __init__(self, directory, basename, header=None, compress=None, max_bytes=None):
+        self.basename = basename
+        self.compress = app.config['SIS_IMPORT_CSV_GZIP'] if compress is None else compress
+        self.directory = directory
+        self.header = header
+        self.max_bytes = max_bytes or app.config['SIS_IMPORT_CSV_MAX_BYTES']
+        self.paths = []
+        self.row_count = 0
+        self._buffer = io.StringIO()
+        self._csv = csv.writer(self._buffer)
+        self._file = None
+        self._file_bytes = 0
+        self._file_rows = 0
+
+    def writerow(self, row):
+        if self.header is None:
+            self.header = list(row._fields) if hasattr(row, '_fields') else None
+        data = self._encode(row)
+        if self._file is None or (self._file_rows and self._file_bytes + len(data) > self.max_bytes):
+            self._open_next_file()
+        self._file.write(data)
+        self._file_bytes += len(data)
+        self._file_rows += 1
+        self.row_count += 1
+
+    def writerows(self, rows):
+        rows = iter(rows)
+        while True:
+            chunk = list(islice(rows, 1000))
+            if not chunk:
+                break
+            if self._file is None:
+                self.writerow(chunk.pop(0))
+            # Encode and write a chunk at a time; fall back to row by row where a file boundary falls within it.
+            data = self._encode_rows(chunk)
+            if self._file_bytes + len(data) > self.max_bytes:
+                for row in chunk:
+                    self.writerow(row)
+                continue
+            self._file.write(data)
+            self._file_bytes += len(data)
+            self._file_rows += len(chunk)
+            self.row_count += len(chunk)
+
+    def close(self):
+        if self._file is None and self.header:
+            # An empty set is still one file with a header row.
+            self._open_next_file()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _encode(self, row):
+        return self._encode_rows([row])
+
+    def _encode_rows(self, rows):
+        self._buffer.seek(0)
+        self._buffer.truncate()
+        self._csv.writerows(rows)
+        return self._buffer.getvalue().encode('utf-8')
+
+    def _open_next_file(self):
+        if self._file is not None:
+            self._file.close()
+        suffix = '.csv.gz' if self.compress else '.csv'
+        path = os.path.join(self.directory, f'{self.basename}-{len(self.paths) + 1:03d}{suffix}')
+        self._file = gzip.open(path, 'wb', compresslevel=6) if self.compress else open(path, 'wb')
+        self.paths.append(path)
+        self._file_bytes = 0
+        self._file_rows = 0
+        if self.header:
+            data = self._encode(self.header)
+            self._file.write(data)
+            self._file_bytes += len(data)
@@ -0,0 +1,154 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import os
+import sqlite3
+import time
+
+from flask import current_app as app
+from ripley.lib.sis_import_csv import ChunkedCsvWriter, ENROLLMENTS_CSV_HEADER
+
+# Delta enrollment CSVs: only the enrollments added or dropped since the last set that Canvas imported.
+#
+# Each enrollment set is kept on disk as a SQLite snapshot keyed and clustered on (section_id, user_id, role). The new
+# set is written to a pending snapshot and the two are diffed with a sorted merge, so memory use does not depend on the
+# size of the term. Adds are emitted with status 'active' and drops with status 'deleted'. The pending snapshot replaces
+# the previous one only on commit(), i.e., once Canvas has accepted the import.
+#
+#     delta = EnrollmentDelta(snapshot_path)
+#     summary = delta.export(rows, directory, 'enrollments')
+#     ...upload summary['files'] to Canvas...
+#     delta.commit()
+
+INSERT_BATCH_SIZE = 10000
+
+
+class EnrollmentDelta:
+
+    def __init__(self, snapshot_path):
+        self.pending_path = f'{snapshot_path}.pending'
+        self.snapshot_path = snapshot_path
+
+    def export(self, rows, directory, basename, compress=None, max_bytes=None):
+        """Snapshot rows, which are in ENROLLMENTS_CSV_HEADER order, and write the delta to a CSV set."""
+        started_at = time.perf_counter()
+        current_count = write_snapshot(self.pending_path, rows)
+        previous = self.snapshot_path if os.path.exists(self.snapshot_path) else None
+        added = dropped = 0
+        with ChunkedCsvWriter(directory, basename, header=ENROLLMENTS_CSV_HEADER, compress=compress, max_bytes=max_bytes) as writer:
+            for change, (section_id, user_id, role, course_id) in diff_snapshots(previous, self.pending_path):
+                if change == 'add':
+                    added += 1
+                    writer.writerow([course_id, user_id, role, section_id, 'active'])
+                else:
+                    dropped += 1
+                    writer.writerow([course_id, user_id, role, section_id, 'deleted'])
+        summary = {
+            'added': added,
+            'dropped': dropped,
+            'enrollments': current_count,
+            'files': writer.paths,
+            'full': previous is None,
+            'seconds': round(time.perf_counter() - started_at, 3),
+        }
+        full_export = ' (no previous set, full export)' if previous is None else ''
+        app.logger.info(
+            f'Enrollment delta of {basename}: {added} adds and {dropped} drops against {current_count} enrollments '
+            f"in {summary['seconds']} s{full_export}",
+        )
+        return summary
+
+    def commit(self):
+        os.replace(self.pending_path, self.snapshot_path)
+
+    def discard(self):
+        if os.path.exists(self.pending_path):
+            os.remove(self.pending_path)
+
+
+def diff_snapshots(previous_path, current_path):
+    """Yield ('add', row) and ('drop', row) by merging the two snapshots in key order. Without a previous path, all adds."""
+    current = _iterate_snapshot(current_path)
+    previous = _iterate_snapshot(previous_path) if previous_path else iter(())
+    previous_row = next(previous, None)
+    current_row = next(current, None)
+    while previous_row or current_row:
+        if previous_row is None or (current_row is not None and current_row[:3] < previous_row[:3]):
+            yield 'add', current_row
+            current_row = next(current, None)
+        elif current_row is None or previous_row[:3] < current_row[:3]:
+            yield 'drop', previous_row
+            previous_row = next(previous, None)
+        else:
+            if current_row[3] != previous_row[3]:
+                # Same section, user and role under a different course: a cross-listing change. Re-enroll.
+                yield 'drop', previous_row
+                yield 'add', current_row
+            previous_row = next(previous, None)
+            current_row = next(current, None)
+
+
+def write_snapshot(path, rows):
+    """Write rows, in ENROLLMENTS_CSV_HEADER order, to a new snapshot. Return the count of distinct active enrollments."""
+    if os.path.exists(path):
+        os.remove(path)
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute('PRAGMA journal_mode = OFF')
+        connection.execute('PRAGMA synchronous = OFF')
+        connection.execute("""CREATE TABLE enrollments (
+            section_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            role TEXT NOT NULL,
+            course_id TEXT NOT NULL,
+            PRIMARY KEY (section_id, user_id, role)
+        ) WITHOUT ROWID""")
+        batch = []
+        for course_id, user_id, role, section_id, *status in rows:
+            if status and status[0] != 'active':
+                continue
+            batch.append((str(section_id), str(user_id), str(role), str(course_id)))
+            if len(batch) >= INSERT_BATCH_SIZE:
+                connection.executemany('INSERT OR REPLACE INTO enrollments VALUES (?, ?, ?, ?)', batch)
+                batch = []
+        if batch:
+            connection.executemany('INSERT OR REPLACE INTO enrollments VALUES (?, ?, ?, ?)', batch)
+        connection.commit()
+        return connection.execute('SELECT COUNT(*) FROM enrollments').fetchone()[0]
+    finally:
+        connection.close()
+
+
+def _iterate_snapshot(path):
+    connection = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+    try:
+        cursor = connection.execute('SELECT section_id, user_id, role, course_id FROM enrollments ORDER BY section_id, user_id, role')
+        while True:
+            rows = cursor.fetchmany(INSERT_BATCH_SIZE)
+            if not rows:
+                break
+            yield from rows
+    finally:
+        connection.close()
@@ -0,0 +1,144 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from contextlib import contextmanager
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import time
+
+# Worker bootstrap: environment loading and a profile of app startup.
+#
+# Under mod_wsgi, the process environment lacks the variables that Elastic Beanstalk sets. They are read from the
+# Elastic Beanstalk env file (RIPLEY_ENV_FILE, default /opt/python/current/env) by a line parser. Only where there is no
+# env file do we fall back to running 'bash -c env'.
+
+EB_ENV_FILE = '/opt/python/current/env'
+
+IMPORT_TIME_PATTERN = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# A line that needs no shell unquoting beyond optional outer double quotes: the common case, which skips shlex.
+SIMPLE_ASSIGNMENT_PATTERN = re.compile(r'^(?:export\s+)?([A-Za-z_][A-Za-z0-9_]*)=(?:"([^"\\$`]*)"|([^\s"\'\\$`;#]*))$')
+
+
+def load_environment(path=None):
+    """Copy variables from the env file, or else from a login shell, to os.environ. Return the number of variables."""
+    path = path or os.environ.get('RIPLEY_ENV_FILE') or EB_ENV_FILE
+    try:
+        with open(path) as file:
+            variables = parse_env_file(file)
+    except FileNotFoundError:
+        variables = _shell_environment()
+    os.environ.update(variables)
+    return len(variables)
+
+
+def parse_env_file(lines):
+    """Parse lines of KEY=value, as written for a shell to source: with optional 'export' and shell quoting."""
+    variables = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        match = SIMPLE_ASSIGNMENT_PATTERN.match(line)
+        if match:
+            key, quoted, bare = match.groups()
+            variables[key] = bare if quoted is None else quoted
+            continue
+        try:
+            tokens = shlex.split(line)
+        except ValueError:
+            continue
+        if tokens and tokens[0] == 'export':
+            tokens = tokens[1:]
+        for token in tokens:
+            key, separator, value = token.partition('=')
+            if separator and key.isidentifier():
+                variables[key] = value
+    return variables
+
+
+class StartupTimer:
+    """Durations of the phases of create_app, in order."""
+
+    def __init__(self):
+        self.phases = []
+        self.started_at = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def to_api_json(self):
+        return {
+            'phases': [{'name': name, 'seconds': round(seconds, 6)} for name, seconds in self.phases],
+            'totalSeconds': round(time.perf_counter() - self.started_at, 6),
+        }
+
+
+def profile_startup(top=25):
+    """Create the app in a fresh interpreter, with -X importtime. Return phase durations and the costliest imports."""
+    script = (
+        'import json, time; start = time.perf_counter(); '
+        'from ripley.factory import create_app; imported = time.perf_counter(); app = create_app(); '
+        "print(json.dumps({'importSeconds': imported - start, **app.extensions['startup_timer'].to_api_json()}))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', script],
+        capture_output=True,
+        check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+        text=True,
+    )
+    profile = json.loads(result.stdout.strip().splitlines()[-1])
+    imports = []
+    for line in result.stderr.splitlines():
+        match = IMPORT_TIME_PATTERN.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append({
+                'cumulativeSeconds': int(cumulative_us) / 1e6,
+                'depth': len(indent) // 2,
+                'module': module,
+                'selfSeconds': int(self_us) / 1e6,
+            })
+    profile['imports'] = sorted(imports, key=lambda i: i['cumulativeSeconds'], reverse=True)[:top]
+    return profile
+
+
+def _shell_environment():
+    output = subprocess.run(['bash', '-c', 'env'], capture_output=True, check=True).stdout.decode('utf-8')
+    variables = {}
+    for line in output.splitlines():
+        key, _, value = line.partition('=')
+        variables[key] = value
+    return variables
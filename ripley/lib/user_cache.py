@@ -0,0 +1,238 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+from itertools import chain
+import threading
+
+from flask import current_app as app, has_app_context, has_request_context, request
+from ripley.lib.cache import import_backend, LRUCache
+from ripley.lib.metrics import registry as metrics_registry
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+# User profiles are cached in three tiers, keyed by UID.
+#
+#  - Request: Flask-Login may ask for the same user more than once per request. Memoized in the WSGI environ.
+#  - In-process: LRU cache with TTL, shared by all threads of a worker.
+#  - Shared (optional): pluggable backend, e.g. Redis, shared by all workers. See USER_CACHE_BACKEND config. If 'cache',
+#    the backend of ripley.lib.cache is shared.
+#
+# Changes to 'user_auths' or 'user_data' rows made through the ORM session invalidate the cached profile once they are
+# committed. Changes made with raw SQL must call invalidate_user(uid) explicitly.
+
+CHANGED_UIDS_KEY = 'ripley.changed_user_uids'
+REQUEST_ENVIRON_KEY = 'ripley.user_profiles'
+USER_TABLES = ['user_auths', 'user_data']
+
+
+class UserCache:
+
+    def __init__(self, max_size, ttl, backend=None):
+        self.backend = backend
+        self.local = LRUCache(max_size=max_size, ttl=ttl)
+        self.ttl = ttl
+        self._counts = {
+            'requestHits': 0,
+            'localHits': 0,
+            'sharedHits': 0,
+            'misses': 0,
+            'invalidations': 0,
+        }
+        self._counts_lock = threading.Lock()
+
+    def get(self, uid, loader):
+        profile = self.local.get(uid)
+        if profile is not None:
+            self._increment('localHits')
+            return profile
+        if self.backend:
+            profile = self.backend.get(_shared_key(uid))
+            if profile is not None:
+                self._increment('sharedHits')
+                self.local.set(uid, profile)
+                return profile
+        self._increment('misses')
+        profile = loader(uid)
+        self.local.set(uid, profile)
+        if self.backend:
+            self.backend.set(_shared_key(uid), profile, self.ttl)
+        return profile
+
+    def get_many(self, uids, batch_loader):
+        profiles = {}
+        missing = []
+        for uid in uids:
+            profile = self.local.get(uid)
+            if profile is None and self.backend:
+                profile = self.backend.get(_shared_key(uid))
+                if profile is not None:
+                    self._increment('sharedHits')
+                    self.local.set(uid, profile)
+            elif profile is not None:
+                self._increment('localHits')
+            if profile is None:
+                missing.append(uid)
+            else:
+                profiles[uid] = profile
+        if missing:
+            for _ in missing:
+                self._increment('misses')
+            for uid, profile in batch_loader(missing).items():
+                profiles[uid] = profile
+                self.local.set(uid, profile)
+                if self.backend:
+                    self.backend.set(_shared_key(uid), profile, self.ttl)
+        return profiles
+
+    def invalidate(self, uid):
+        self._increment('invalidations')
+        self.local.delete(uid)
+        if self.backend:
+            self.backend.delete(_shared_key(uid))
+
+    def clear(self):
+        self.local.clear()
+
+    def stats(self):
+        with self._counts_lock:
+            counts = dict(self._counts)
+        lookups = counts['requestHits'] + counts['localHits'] + counts['sharedHits'] + counts['misses']
+        hits = lookups - counts['misses']
+        return {
+            **counts,
+            'hitRatio': round(hits / lookups, 4) if lookups else None,
+            'size': len(self.local),
+        }
+
+    def _increment(self, key):
+        with self._counts_lock:
+            self._counts[key] += 1
+
+
+def initialize_user_cache(app):
+    backend = app.config['USER_CACHE_BACKEND']
+    app.extensions['user_cache'] = UserCache(
+        backend=app.extensions['cache'].backend if backend == 'cache' else import_backend(backend, app),
+        max_size=app.config['USER_CACHE_MAX_SIZE'],
+        ttl=app.config['USER_CACHE_TTL'],
+    )
+    _register_invalidation_listeners()
+    metrics_registry.register_collector('user_cache', _metrics)
+
+
+def get_user_profile(uid, loader):
+    """Return the cached profile of the user, calling loader(uid) only when no cache tier has it."""
+    cache = _get_cache()
+    if not uid or cache is None:
+        return loader(uid)
+    uid = str(uid)
+    if has_request_context():
+        request_profiles = request.environ.setdefault(REQUEST_ENVIRON_KEY, {})
+        if uid in request_profiles:
+            cache._increment('requestHits')
+            return request_profiles[uid]
+        profile = request_profiles[uid] = dict(cache.get(uid, loader))
+        return profile
+    return dict(cache.get(uid, loader))
+
+
+def get_user_profiles(uids, batch_loader):
+    """Return a dict of cached profiles keyed by UID, calling batch_loader(uids) once for all cache misses."""
+    uids = list(dict.fromkeys(str(uid) for uid in uids if uid))
+    cache = _get_cache()
+    if cache is None:
+        return batch_loader(uids)
+    request_profiles = request.environ.setdefault(REQUEST_ENVIRON_KEY, {}) if has_request_context() else {}
+    profiles = {}
+    for uid in uids:
+        if uid in request_profiles:
+            cache._increment('requestHits')
+            profiles[uid] = request_profiles[uid]
+    uncached = [uid for uid in uids if uid not in profiles]
+    if uncached:
+        for uid, profile in cache.get_many(uncached, batch_loader).items():
+            profiles[uid] = request_profiles[uid] = dict(profile)
+    return profiles
+
+
+def invalidate_user(uid):
+    if uid:
+        uid = str(uid)
+        cache = _get_cache()
+        if cache:
+            cache.invalidate(uid)
+        if has_request_context():
+            request.environ.get(REQUEST_ENVIRON_KEY, {}).pop(uid, None)
+
+
+def user_cache_stats():
+    cache = _get_cache()
+    return cache.stats() if cache else None
+
+
+def _get_cache():
+    return app.extensions.get('user_cache') if has_app_context() else None
+
+
+def _collect_changed_users(session, flush_context):
+    # Evicting at flush would be premature: a rollback makes it pointless, and a reader could re-cache the uncommitted row.
+    uids = session.info.setdefault(CHANGED_UIDS_KEY, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if getattr(obj, '__tablename__', None) in USER_TABLES and getattr(obj, 'uid', None):
+            uids.add(str(obj.uid))
+
+
+def _forget_changed_users(session):
+    session.info.pop(CHANGED_UIDS_KEY, None)
+
+
+def _invalidate_committed_users(session):
+    for uid in session.info.pop(CHANGED_UIDS_KEY, ()):
+        invalidate_user(uid)
+
+
+def _metrics():
+    stats = user_cache_stats()
+    if not stats:
+        return {}
+    labels = (('cache', 'user'),)
+    return {
+        ('ripley_cache_hits_total', labels): stats['requestHits'] + stats['localHits'] + stats['sharedHits'],
+        ('ripley_cache_misses_total', labels): stats['misses'],
+    }
+
+
+def _register_invalidation_listeners():
+    for event_name, listener in [
+        ('after_commit', _invalidate_committed_users),
+        ('after_flush', _collect_changed_users),
+        ('after_rollback', _forget_changed_users),
+    ]:
+        if not event.contains(Session, event_name, listener):
+            event.listen(Session, event_name, listener)
+
+
+def _shared_key(uid):
+    # The backend adds its own key prefix, e.g. CACHE_KEY_PREFIX.
+    return f'user:{uid}'
@@ -23,6 +23,8 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 from datetime import datetime
+import os
+import stat
 
 from dateutil.tz import tzutc
 from flask import current_app as app
@@ -47,3 +49,16 @@ def utc_now():
 
 def get_eb_environment():
     return app.config['EB_ENVIRONMENT'] if 'EB_ENVIRONMENT' in app.config else None
+
+
+def ensure_private_directory(path):
+    """Create the directory if need be, accessible to this process's user only. Refuse one that another user owns."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    status = os.lstat(path)
+    if not stat.S_ISDIR(status.st_mode):
+        raise NotADirectoryError(f'{path} is not a directory')
+    if status.st_uid != os.getuid():
+        raise PermissionError(f'{path} is owned by another user')
+    if stat.S_IMODE(status.st_mode) & 0o077:
+        os.chmod(path, 0o700)
+    return path
@@ -0,0 +1,127 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+from string import Template
+import time
+
+from flask import current_app as app
+from ripley import db, std_commit
+from ripley.externals.smtp import get_smtp_pool
+from sqlalchemy import text
+
+# Welcome emails to new members of mailing lists.
+#
+# Un-welcomed members are read in keyset-paginated batches of WELCOME_EMAIL_BATCH_SIZE. Each batch is sent by up to
+# SMTP_POOL_SIZE threads over pooled SMTP connections, and the members sent to are marked welcomed in one UPDATE.
+# Members whose email failed stay un-welcomed and are retried on the next run.
+#
+# Subject and body are string.Template text with list placeholders ($list_name, $canvas_site_name) and member
+# placeholders ($first_name, $last_name, $email_address), all substituted in one pass per message.
+
+
+def send_welcome_emails(mailing_list_id=None):
+    started_at = time.perf_counter()
+    summary = {'failed': 0, 'lists': 0, 'sent': 0}
+    sql = """SELECT id, canvas_site_name, list_name, welcome_email_subject, welcome_email_body
+        FROM canvas_site_mailing_lists
+        WHERE welcome_email_active IS TRUE AND welcome_email_subject <> '' AND welcome_email_body <> ''"""
+    if mailing_list_id:
+        sql += ' AND id = :mailing_list_id'
+    mailing_lists = db.session.execute(text(sql), {'mailing_list_id': mailing_list_id}).mappings().all()
+    with ThreadPoolExecutor(max_workers=app.config['SMTP_POOL_SIZE'], thread_name_prefix='smtp') as executor:
+        for mailing_list in mailing_lists:
+            sent, failed = _send_to_mailing_list(executor, mailing_list)
+            summary['failed'] += failed
+            summary['lists'] += 1
+            summary['sent'] += sent
+    summary['seconds'] = round(time.perf_counter() - started_at, 3)
+    app.logger.info(f'Welcome emails: {summary}')
+    return summary
+
+
+def _send_to_mailing_list(executor, mailing_list):
+    list_values = {'canvas_site_name': mailing_list['canvas_site_name'] or '', 'list_name': mailing_list['list_name'] or ''}
+    subject = Template(mailing_list['welcome_email_subject'])
+    body = Template(mailing_list['welcome_email_body'])
+    from_address = app.config['WELCOME_EMAIL_FROM']
+    pool = get_smtp_pool()
+    sent = failed = 0
+    last_id = 0
+    while True:
+        members = _get_unwelcomed_members(mailing_list['id'], last_id)
+        if not members:
+            break
+        last_id = members[-1]['id']
+        welcomed_ids = []
+        errors = executor.map(lambda member: _send(pool, from_address, member, list_values, subject, body), members)
+        for member, error in zip(members, errors):
+            if error:
+                app.logger.warning(f"Failed to send welcome email to {member['email_address']}: {error}")
+            else:
+                welcomed_ids.append(member['id'])
+        if welcomed_ids:
+            db.session.execute(
+                text('UPDATE canvas_site_mailing_list_members SET welcomed_at = now(), updated_at = now() WHERE id = ANY(:ids)'),
+                {'ids': welcomed_ids},
+            )
+            std_commit()
+        sent += len(welcomed_ids)
+        failed += len(members) - len(welcomed_ids)
+    return sent, failed
+
+
+def _get_unwelcomed_members(mailing_list_id, after_id):
+    return db.session.execute(
+        text("""SELECT id, email_address, first_name, last_name FROM canvas_site_mailing_list_members
+            WHERE mailing_list_id = :mailing_list_id AND welcomed_at IS NULL AND deleted_at IS NULL AND id > :after_id
+            ORDER BY id LIMIT :limit"""),
+        {'after_id': after_id, 'limit': app.config['WELCOME_EMAIL_BATCH_SIZE'], 'mailing_list_id': mailing_list_id},
+    ).mappings().all()
+
+
+def _send(pool, from_address, member, list_values, subject, body):
+    # Runs on the executor, outside the app context. Return the error, if any, of building or sending the message.
+    try:
+        pool.send(_to_message(from_address, member, list_values, subject, body))
+    except Exception as e:
+        return e
+
+
+def _to_message(from_address, member, list_values, subject, body):
+    # One pass over list and member values, so that substituted values are never themselves expanded.
+    values = {
+        **list_values,
+        'email_address': member['email_address'],
+        'first_name': member['first_name'] or '',
+        'last_name': member['last_name'] or '',
+    }
+    message = EmailMessage()
+    message['From'] = from_address
+    message['To'] = member['email_address']
+    message['Subject'] = subject.safe_substitute(values)
+    message.set_content(body.safe_substitute(values))
+    return message
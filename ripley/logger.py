@@ -22,8 +22,21 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
 ENHANCEMENTS, OR MODIFICATIONS.
 """
+import atexit
+import copy
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+import os
+import queue
+import sys
+
+from ripley.lib.metrics import registry as metrics_registry
+
+ACCESS_LOGGER_NAME = 'ripley.access'
+
+# The queue handlers of this process, by name. create_app may run more than once per process, e.g. in tests and
+# scripts, and each run replaces the handlers (and listener threads) of the one before.
+_queue_handlers = {}
 
 
 def initialize_logger(app):
@@ -57,6 +70,13 @@ def initialize_logger(app):
         formatter = logging.Formatter(app.config['LOGGING_FORMAT'])
         handler.setFormatter(formatter)
 
+    for logger in loggers:
+        _remove_queue_handler(logger, 'logging_queue')
+
+    if app.config['LOGGING_QUEUE_ENABLED']:
+        handlers = [_queue_handler(app, handlers, 'logging_queue')]
+        metrics_registry.register_collector('logging_queue', _metrics)
+
     for logger in loggers:
         for handler in handlers:
             logger.addHandler(handler)
@@ -65,8 +85,118 @@ def initialize_logger(app):
     for name in ['boto3', 'botocore', 's3transfer', 'werkzeug']:
         logging.getLogger(name).setLevel(log_propagation_level)
 
+    _initialize_access_logger(app)
+
     def address_string(self):
         forwarded_for = self.headers.get('X-Forwarded-For')
         forwarded_for = forwarded_for.split(',')[0] if forwarded_for else None
         return forwarded_for or self.client_address[0]
     WSGIRequestHandler.address_string = address_string
+
+
+def _initialize_access_logger(app):
+    # One JSON document per line, with no prefix, so that the file can be parsed offline.
+    location = access_log_location(app)
+    if location == 'STDOUT':
+        handler = logging.StreamHandler(sys.stdout)
+    else:
+        handler = RotatingFileHandler(location, mode='a', maxBytes=1024 * 1024 * 100, backupCount=20)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger = logging.getLogger(ACCESS_LOGGER_NAME)
+    _remove_queue_handler(logger, 'access_log_queue')
+    if app.config['LOGGING_QUEUE_ENABLED']:
+        handler = _queue_handler(app, [handler], 'access_log_queue')
+    logger.handlers = [handler]
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+
+
+def access_log_location(app):
+    """ACCESS_LOG_LOCATION if set. Otherwise STDOUT or, if the app log is a file, ripley-access.log in its directory."""
+    location = app.config['ACCESS_LOG_LOCATION']
+    if location:
+        return location
+    logging_location = app.config['LOGGING_LOCATION']
+    if logging_location == 'STDOUT':
+        return 'STDOUT'
+    return os.path.join(os.path.dirname(logging_location), 'ripley-access.log')
+
+
+def _queue_handler(app, handlers, extension_key):
+    # Formatting and file I/O move to a background thread. Request threads only enqueue records.
+    log_queue = queue.Queue(maxsize=app.config['LOGGING_QUEUE_SIZE'])
+    queue_handler = BoundedQueueHandler(log_queue, block=app.config['LOGGING_QUEUE_POLICY'] == 'block')
+    queue_handler.listener = FlushingQueueListener(log_queue, *handlers, respect_handler_level=True)
+    queue_handler.listener.start()
+    atexit.register(queue_handler.listener.stop)
+    app.extensions[extension_key] = queue_handler
+    _queue_handlers[extension_key] = queue_handler
+    return queue_handler
+
+
+def _remove_queue_handler(logger, extension_key):
+    # Stop the listener before detaching the handler, so that records already queued are written.
+    queue_handler = _queue_handlers.pop(extension_key, None)
+    if queue_handler:
+        queue_handler.listener.stop()
+        atexit.unregister(queue_handler.listener.stop)
+    logger.handlers = [h for h in logger.handlers if not isinstance(h, BoundedQueueHandler)]
+
+
+def logging_queue_stats():
+    """Stats of each logging queue of this process, by name."""
+    return {extension_key: queue_handler.stats() for extension_key, queue_handler in _queue_handlers.items()}
+
+
+def _metrics():
+    values = {}
+    for extension_key, stats in logging_queue_stats().items():
+        labels = (('queue', extension_key),)
+        values[('ripley_log_queue_depth', labels)] = stats['depth']
+        values[('ripley_log_records_dropped_total', labels)] = stats['dropped']
+    return values
+
+
+class BoundedQueueHandler(QueueHandler):
+    """When the queue is full, either drop the record (and count it) or block until the listener catches up."""
+
+    def __init__(self, log_queue, block=False):
+        super().__init__(log_queue)
+        self.block = block
+        self.dropped = 0
+        self.listener = None
+
+    def enqueue(self, record):
+        if self.block:
+            self.queue.put(record)
+        else:
+            try:
+                self.queue.put_nowait(record)
+            except queue.Full:
+                self.dropped += 1
+
+    def prepare(self, record):
+        # Unlike the parent class, defer formatting to the listener thread. Message args are merged eagerly
+        # because they may be mutated after the call to log.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def stats(self):
+        return {
+            'depth': self.queue.qsize(),
+            'dropped': self.dropped,
+            'maxSize': self.queue.maxsize,
+        }
+
+
+class FlushingQueueListener(QueueListener):
+
+    def enqueue_sentinel(self):
+        # Wait for room so that records already queued are written before shutdown.
+        self.queue.put(self._sentinel)
+
+    def stop(self):
+        if self._thread:
+            super().stop()
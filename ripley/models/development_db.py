@@ -27,12 +27,24 @@ from ripley import db, std_commit
 from sqlalchemy.sql import text
 
 
+def clear():
+    with open(f"{app.config['BASE_DIR']}/scripts/db/drop_schema.sql", 'r') as ddl_file:
+        _execute_ddl(ddl_file.read())
+
+
 def load(create_test_data=True):
     _load_schemas()
+    return db
 
 
 def _load_schemas():
     """Create DB schema from SQL file."""
     with open(f"{app.config['BASE_DIR']}/scripts/db/schema.sql", 'r') as ddl_file:
-        db.session().execute(text(ddl_file.read()))
-        std_commit()
+        _execute_ddl(ddl_file.read())
+
+
+def _execute_ddl(ddl):
+    db.session().execute(text(ddl))
+    # The pg_dump preamble SETs statement_timeout and friends on the pooled connection; restore connect-time defaults.
+    db.session().execute(text('RESET ALL'))
+    std_commit(allow_test_environment=True)
@@ -0,0 +1,100 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from ripley import db, std_commit
+from ripley.lib.util import to_isoformat, utc_now
+from ripley.models.base import Base
+
+
+class MailingList(Base):
+    __tablename__ = 'canvas_site_mailing_lists'
+
+    id = db.Column(db.Integer, nullable=False, primary_key=True)  # noqa: A003
+    canvas_site_id = db.Column(db.Integer, nullable=False)
+    canvas_site_name = db.Column(db.String(255))
+    list_name = db.Column(db.String(255))
+    members_count = db.Column(db.Integer)
+    populate_add_errors = db.Column(db.Integer)
+    populate_remove_errors = db.Column(db.Integer)
+    populated_at = db.Column(db.DateTime(timezone=True))
+    roster_fingerprint = db.Column(db.String(64))
+    state = db.Column(db.String(255))
+    type = db.Column(db.String(255))  # noqa: A003
+    welcome_email_active = db.Column(db.Boolean, default=False, nullable=False)
+    welcome_email_body = db.Column(db.Text)
+    welcome_email_subject = db.Column(db.Text)
+
+    def __repr__(self):
+        return f"""<MailingList
+                    id={self.id},
+                    canvas_site_id={self.canvas_site_id},
+                    list_name={self.list_name},
+                    members_count={self.members_count},
+                    populated_at={self.populated_at}>
+                """
+
+    @classmethod
+    def create(cls, canvas_site_id, canvas_site_name=None, list_name=None, list_type='mailing_list'):
+        mailing_list = cls(
+            canvas_site_id=canvas_site_id,
+            canvas_site_name=canvas_site_name,
+            list_name=list_name,
+            type=list_type,
+        )
+        db.session.add(mailing_list)
+        std_commit()
+        return mailing_list
+
+    @classmethod
+    def find_by_canvas_site_id(cls, canvas_site_id):
+        return cls.query.filter_by(canvas_site_id=canvas_site_id).first()
+
+    @classmethod
+    def update_population_stats(cls, mailing_list_id, members_count, add_errors, remove_errors, roster_fingerprint=None):
+        mailing_list = cls.query.filter_by(id=mailing_list_id).first()
+        mailing_list.members_count = members_count
+        mailing_list.populate_add_errors = add_errors
+        mailing_list.populate_remove_errors = remove_errors
+        mailing_list.populated_at = utc_now()
+        mailing_list.roster_fingerprint = roster_fingerprint
+        std_commit()
+        return mailing_list
+
+    def to_api_json(self):
+        return {
+            'id': self.id,
+            'canvasSiteId': self.canvas_site_id,
+            'canvasSiteName': self.canvas_site_name,
+            'listName': self.list_name,
+            'membersCount': self.members_count,
+            'populateAddErrors': self.populate_add_errors,
+            'populateRemoveErrors': self.populate_remove_errors,
+            'populatedAt': to_isoformat(self.populated_at),
+            'state': self.state,
+            'type': self.type,
+            'welcomeEmailActive': self.welcome_email_active,
+            'createdAt': to_isoformat(self.created_at),
+            'updatedAt': to_isoformat(self.updated_at),
+        }
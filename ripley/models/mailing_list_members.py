@@ -0,0 +1,96 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from ripley import db, stream_query
+from ripley.lib.util import to_isoformat
+from ripley.models.base import Base
+
+
+class MailingListMembers(Base):
+    __tablename__ = 'canvas_site_mailing_list_members'
+
+    id = db.Column(db.Integer, nullable=False, primary_key=True)  # noqa: A003
+    mailing_list_id = db.Column(db.Integer, nullable=False)
+    email_address = db.Column(db.String(255), nullable=False)
+    can_send = db.Column(db.Boolean, default=False, nullable=False)
+    first_name = db.Column(db.String(255))
+    last_name = db.Column(db.String(255))
+    deleted_at = db.Column(db.DateTime(timezone=True))
+    welcomed_at = db.Column(db.DateTime(timezone=True))
+
+    __table_args__ = (db.UniqueConstraint(
+        'mailing_list_id',
+        'email_address',
+        name='canvas_site_mailing_list_members_unique_constraint',
+    ),)
+
+    def __repr__(self):
+        return f"""<MailingListMembers
+                    id={self.id},
+                    mailing_list_id={self.mailing_list_id},
+                    email_address={self.email_address},
+                    can_send={self.can_send},
+                    deleted_at={self.deleted_at}>
+                """
+
+    @classmethod
+    def get_mailing_list_members(cls, mailing_list_id, include_deleted=False):
+        query = cls.query.filter_by(mailing_list_id=mailing_list_id)
+        if not include_deleted:
+            query = query.filter(cls.deleted_at.is_(None))
+        return query.order_by(cls.email_address).all()
+
+    @classmethod
+    def stream_mailing_list_members(cls, mailing_list_id, after_id=0, limit=None, include_deleted=False):
+        """Yield API JSON of members with id greater than after_id, in id order, without loading the result set."""
+        sql = """SELECT id, mailing_list_id, email_address, can_send, first_name, last_name, deleted_at, welcomed_at,
+                created_at, updated_at
+            FROM canvas_site_mailing_list_members
+            WHERE mailing_list_id = :mailing_list_id AND id > :after_id"""
+        if not include_deleted:
+            sql += ' AND deleted_at IS NULL'
+        sql += ' ORDER BY id'
+        if limit:
+            sql += ' LIMIT :limit'
+        for row in stream_query(sql, {'after_id': after_id, 'limit': limit, 'mailing_list_id': mailing_list_id}):
+            yield _row_to_api_json(row)
+
+    def to_api_json(self):
+        return _row_to_api_json(self)
+
+
+def _row_to_api_json(row):
+    return {
+        'id': row.id,
+        'mailingListId': row.mailing_list_id,
+        'emailAddress': row.email_address,
+        'canSend': row.can_send,
+        'firstName': row.first_name,
+        'lastName': row.last_name,
+        'deletedAt': to_isoformat(row.deleted_at),
+        'welcomedAt': to_isoformat(row.welcomed_at),
+        'createdAt': to_isoformat(row.created_at),
+        'updatedAt': to_isoformat(row.updated_at),
+    }
@@ -23,19 +23,15 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 from flask_login import UserMixin
+from ripley.externals.calnet import get_calnet_user_for_uid, get_calnet_users_for_uids
+from ripley.lib.user_cache import get_user_profile, get_user_profiles
 
 
 class User(UserMixin):
 
-    def __init__(self, uid=None):
-        if uid:
-            try:
-                self.uid = str(int(uid))
-            except ValueError:
-                self.uid = None
-        else:
-            self.uid = None
-        self.user = self._load_user(self.uid)
+    def __init__(self, uid=None, user=None):
+        self.uid = _normalize_uid(uid)
+        self.user = user or get_user_profile(self.uid, self._load_user)
 
     def get_id(self):
         # Type 'int' is required for Flask-login user_id
@@ -66,7 +62,14 @@ class User(UserMixin):
 
     @classmethod
     def load_user(cls, user_id):
-        return cls._load_user(uid=user_id)
+        return get_user_profile(_normalize_uid(user_id), cls._load_user)
+
+    @classmethod
+    def load_users(cls, uids):
+        """Load many users with one directory search per chunk of uncached UIDs. Order of UIDs is preserved."""
+        uids = [uid for uid in (_normalize_uid(uid) for uid in uids) if uid]
+        profiles = get_user_profiles(uids, cls._load_users)
+        return [cls(uid, user=profiles[uid]) for uid in uids if uid in profiles]
 
     @property
     def name(self):
@@ -77,8 +80,17 @@ class User(UserMixin):
 
     @classmethod
     def _load_user(cls, uid=None):
-        calnet_profile = {}  # TODO: get_calnet_user_for_uid(app, uid) if uid else {}
-        expired = False  # TODO: calnet_profile.get('isExpiredPerLdap', True)
+        calnet_profile = (get_calnet_user_for_uid(uid) if uid else None) or {}
+        return cls._to_user_json(uid, calnet_profile)
+
+    @classmethod
+    def _load_users(cls, uids):
+        calnet_profiles = get_calnet_users_for_uids(uids)
+        return {uid: cls._to_user_json(uid, calnet_profiles.get(uid) or {}) for uid in uids}
+
+    @classmethod
+    def _to_user_json(cls, uid, calnet_profile):
+        expired = calnet_profile.get('isExpiredPerLdap', True)
         is_admin = False
         is_teaching = False
         is_active = (is_teaching or is_admin) and not expired
@@ -97,3 +109,13 @@ class User(UserMixin):
                 'uid': uid,
             },
         }
+
+
+def _normalize_uid(uid):
+    # UIDs are numeric strings, e.g. '007' is '7'.
+    if uid:
+        try:
+            return str(int(uid))
+        except ValueError:
+            return None
+    return None
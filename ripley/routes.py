@@ -23,9 +23,14 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 ENHANCEMENTS, OR MODIFICATIONS.
 """
 import datetime
+import os
+import time
 
-from flask import jsonify, make_response, redirect, request, session
+from flask import g, jsonify, redirect, request, send_from_directory, session
 from flask_login import LoginManager
+from ripley.lib.access_log import log_request, request_duration_ms, REQUEST_ID_HEADER, start_request_timer
+from ripley.lib.front_end import FrontEndShell, set_static_cache_headers
+from ripley.lib.metrics import finish_request_metrics, observe_request, start_request_metrics
 from werkzeug.exceptions import HTTPException
 
 
@@ -38,11 +43,14 @@ def register_routes(app):
 
     # Register API routes.
     import ripley.api.config_controller
+    import ripley.api.mailing_list_controller
+    import ripley.api.metrics_controller
+    ripley.api.config_controller.reload_api_payloads()
 
     # Register error handlers.
     import ripley.api.error_handlers
 
-    index_html = open(app.config['INDEX_HTML']).read()
+    app.permanent_session_lifetime = datetime.timedelta(minutes=app.config['INACTIVE_SESSION_LIFETIME'])
 
     @app.login_manager.unauthorized_handler
     def unauthorized_handler():
@@ -54,32 +62,28 @@ def register_routes(app):
         app.logger.error('The requested resource could not be found.')
         raise ripley.api.errors.ResourceNotFoundError('The requested resource could not be found.')
 
-    # Non-API routes are handled by the front end.
-    @app.route('/', defaults={'path': ''})
-    @app.route('/<path:path>', methods=['GET', 'POST', 'PUT'])
-    def front_end_route(**kwargs):
-        vue_base_url = app.config['VUE_LOCALHOST_BASE_URL']
-        return redirect(vue_base_url + request.full_path) if vue_base_url else make_response(index_html)
+    _register_front_end_routes(app)
 
     @app.errorhandler(Exception)
     def handle_exception(e):
         subject = str(e)
         if isinstance(e, HTTPException):
             app.logger.warn(f'HTTPException: {subject} (Ops will not be notified)')
+            return {'message': subject}, 400
         else:
-            pass
+            app.logger.exception(e)
             # TODO? Notify Ripley Ops teams
             # send_system_error_email(
             #     message=f'{subject}\n\n<pre>{traceback.format_exc()}</pre>',
             #     subject=f'{subject[:50]}...' if len(subject) > 50 else subject,
             # )
-        return {'message': subject}, 400
+            return {'message': subject}, 500
 
     @app.before_request
     def before_request():
-        session.permanent = True
-        app.permanent_session_lifetime = datetime.timedelta(minutes=app.config['INACTIVE_SESSION_LIFETIME'])
-        session.modified = True
+        start_request_timer()
+        start_request_metrics()
+        _refresh_session(app)
 
     @app.after_request
     def after_api_request(response):
@@ -89,24 +93,55 @@ def register_routes(app):
             response.headers['Access-Control-Allow-Origin'] = app.config['VUE_LOCALHOST_BASE_URL']
             response.headers['Access-Control-Allow-Credentials'] = 'true'
             response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS, PUT, DELETE'
+        if g.get('request_id'):
+            response.headers[REQUEST_ID_HEADER] = g.request_id
+        observe_request(response, request_duration_ms())
         if request.full_path.startswith('/api'):
-            forwarded_for = request.headers.get('X-Forwarded-For')
-            forwarded_for = forwarded_for.split(',')[0] if forwarded_for else None
-
-            log_message = ' '.join([
-                forwarded_for or request.remote_addr,
-                request.method,
-                request.full_path,
-                response.status,
-            ])
-            if response.status_code >= 500:
-                app.logger.error(log_message)
-            elif response.status_code >= 400:
-                app.logger.warning(log_message)
-            else:
-                app.logger.info(log_message)
+            log_request(response)
         return response
 
+    @app.teardown_request
+    def teardown_request(exception=None):
+        finish_request_metrics()
+
+
+def _register_front_end_routes(app):
+    front_end_shell = app.extensions['front_end_shell'] = FrontEndShell(app.config['INDEX_HTML'])
+    if app.config['FRONT_END_SHELL_WATCH']:
+        front_end_shell.watch()
+
+    # Vite build output. In deployed environments Apache serves these files before requests reach Flask.
+    @app.route('/static/<path:filename>')
+    def static_asset(filename):
+        static_folder = os.path.join(app.config['BASE_DIR'], app.config['STATIC_FOLDER'])
+        if os.path.abspath(os.path.join(static_folder, filename)) == os.path.abspath(app.config['INDEX_HTML']):
+            return front_end_shell.response()
+        return set_static_cache_headers(send_from_directory(static_folder, filename, conditional=True), filename)
+
+    # Non-API routes are handled by the front end.
+    @app.route('/', defaults={'path': ''})
+    @app.route('/<path:path>', methods=['GET', 'POST', 'PUT'])
+    def front_end_route(**kwargs):
+        vue_base_url = app.config['VUE_LOCALHOST_BASE_URL']
+        return redirect(vue_base_url + request.full_path) if vue_base_url else front_end_shell.response()
+
+
+def _refresh_session(app):
+    if not app.config['SESSION_SLIDING_EXPIRATION']:
+        session.permanent = True
+        session.modified = True
+        return
+    # Front-end routes and anonymous users have no session worth extending.
+    if not request.path.startswith('/api') or '_user_id' not in session:
+        return
+    # Re-issue the session cookie only when a fraction of its lifetime has elapsed since it was last issued.
+    now = int(time.time())
+    refreshed_at = session.get('_refreshed_at')
+    refresh_interval = app.permanent_session_lifetime.total_seconds() * app.config['SESSION_REFRESH_FRACTION']
+    if refreshed_at is None or now - refreshed_at >= refresh_interval:
+        session.permanent = True
+        session['_refreshed_at'] = now
+
 
 def _user_loader(user_id=None):
     from ripley.models.user import User
@@ -0,0 +1,56 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import argparse
+import fileinput
+
+from ripley.lib.access_log import latency_report
+
+DESCRIPTION = """Per-route latency percentiles from Ripley's JSON access logs.
+
+Usage:
+    python -m scripts.access_log_report ripley-access.log ripley-access.log.1
+    zcat ripley-access.log.*.gz | python -m scripts.access_log_report --top 20
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='*', help='Access log files. Reads stdin if none.')
+    parser.add_argument('--top', type=int, default=None, help='Only show the N routes with highest p95')
+    args = parser.parse_args()
+
+    with fileinput.input(files=args.files or ('-',)) as lines:
+        rows = latency_report(lines)
+    rows = rows[:args.top] if args.top else rows
+    print(f"{'count':>9} {'errors':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}  route")
+    for row in rows:
+        print(
+            f"{row['count']:>9} {row['errors']:>7} {row['p50']:>9.1f} {row['p95']:>9.1f} {row['p99']:>9.1f} "
+            f"{row['max']:>9.1f}  {row['method']} {row['route']}",
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import tempfile
+import time
+
+from ripley.externals.fake_redis import FakeRedisServer
+from ripley.lib.cache import Cache, FileSystemBackend, LRUCache, RedisBackend
+
+DESCRIPTION = """Measure cache backends, and stampede protection on a hot key whose upstream call is slow.
+
+Naive caching (get, and on a miss load and set) is compared with Cache.get_or_load, which coalesces concurrent misses
+and recomputes popular entries early.
+
+Usage:
+    python -m scripts.benchmarks.cache --threads 16 --seconds 5 --ttl 1 --load-ms 100
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--load-ms', type=float, default=100)
+    parser.add_argument('--operations', type=int, default=5000)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ttl', type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory, FakeRedisServer() as redis_server:
+        backends = {
+            'memory': LRUCache(),
+            'filesystem': FileSystemBackend(directory),
+            'redis stand-in': RedisBackend(f'redis://{redis_server.host}:{redis_server.port}/0'),
+        }
+        print(f"{'backend':<16} {'get µs':>8} {'set µs':>8}")
+        value = {'id': 1010101, 'name': 'Stellar Dynamics and Galactic Structure', 'sections': list(range(20))}
+        for name, backend in backends.items():
+            start = time.perf_counter()
+            for i in range(args.operations):
+                backend.set(f'canvas:{i % 100}', value, 60)
+            set_us = (time.perf_counter() - start) / args.operations * 1e6
+            start = time.perf_counter()
+            for i in range(args.operations):
+                backend.get(f'canvas:{i % 100}')
+            get_us = (time.perf_counter() - start) / args.operations * 1e6
+            print(f'{name:<16} {get_us:>8.1f} {set_us:>8.1f}')
+
+        print(f"\n{'hot key, ' + str(args.threads) + ' threads':<28} {'loads':>6} {'lookups':>8} {'max ms':>7}")
+        for name, backend in backends.items():
+            for label, lookup in [('naive', _naive_lookup), ('get_or_load', _protected_lookup)]:
+                backend.clear()
+                cache = Cache(backend, default_ttl=args.ttl)
+                loads, lookups, max_ms = _hammer(cache, lookup, args)
+                print(f'{name + ", " + label:<28} {loads:>6} {lookups:>8} {max_ms:>7.0f}')
+
+
+def _hammer(cache, lookup, args):
+    loads = []
+
+    def _load():
+        loads.append(1)
+        time.sleep(args.load_ms / 1000)
+        return 'Stellar Dynamics'
+
+    def _worker(_):
+        count = 0
+        max_seconds = 0
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            lookup(cache, _load, args.ttl)
+            max_seconds = max(max_seconds, time.perf_counter() - start)
+            count += 1
+            time.sleep(0.001)
+        return count, max_seconds
+    with ThreadPoolExecutor(max_workers=args.threads) as executor:
+        results = list(executor.map(_worker, range(args.threads)))
+    return len(loads), sum(count for count, _ in results), max(seconds for _, seconds in results) * 1000
+
+
+def _naive_lookup(cache, load, ttl):
+    value = cache.get('canvas', '1010101')
+    if value is None:
+        value = load()
+        cache.set('canvas', '1010101', value, ttl)
+    return value
+
+
+def _protected_lookup(cache, load, ttl):
+    return cache.get_or_load('canvas', '1010101', load, ttl)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,74 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import argparse
+import time
+
+from ripley.externals.calnet import Client, PEOPLE_BASE
+from ripley.externals.fake_calnet import FakeDirectory, generate_entries
+
+DESCRIPTION = """Compare per-UID and batched CalNet lookups against the local directory stand-in.
+
+Usage:
+    python -m scripts.benchmarks.calnet_lookups --users 2000 --latency-ms 2
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--latency-ms', type=float, default=2, help='Simulated round trip per LDAP search')
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    directory = FakeDirectory(latency=args.latency_ms / 1000)
+    for entry in generate_entries(args.users):
+        directory.add_entry(entry)
+    uids = list(directory.entries[PEOPLE_BASE])
+
+    def _new_client():
+        return Client(directory.connection, batch_size=args.batch_size, pool_size=args.pool_size)
+
+    client = _new_client()
+    start = time.perf_counter()
+    for uid in uids:
+        client.get_users([uid])
+    per_uid_elapsed = time.perf_counter() - start
+    per_uid_searches = client.search_count
+
+    client = _new_client()
+    start = time.perf_counter()
+    profiles = client.get_users(uids)
+    batched_elapsed = time.perf_counter() - start
+    assert len(profiles) == len(uids)
+
+    print(f'{len(uids)} users, {args.latency_ms} ms simulated latency per search')
+    print(f'  per-UID: {per_uid_searches:>6} searches {per_uid_elapsed:>8.3f}s')
+    print(f'  batched: {client.search_count:>6} searches {batched_elapsed:>8.3f}s')
+    print(f'  speedup: {per_uid_elapsed / batched_elapsed:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
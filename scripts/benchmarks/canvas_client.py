@@ -0,0 +1,85 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import time
+
+import requests
+from ripley.externals.canvas import Client
+from ripley.externals.fake_canvas import FakeCanvas, FakeCanvasServer, generate_course
+
+DESCRIPTION = """Fetch the rosters of many course sites from a local fake Canvas with simulated latency.
+
+Compares a fresh connection per request, sequential fetches over a keep-alive session, and fan-out over the bounded
+thread pool.
+
+Usage:
+    python -m scripts.benchmarks.canvas_client --sites 50 --users 300 --latency-ms 20 --pool-size 8
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--sites', type=int, default=50)
+    parser.add_argument('--users', type=int, default=300)
+    args = parser.parse_args()
+
+    canvas = FakeCanvas(latency=args.latency_ms / 1000)
+    course_ids = list(range(1000001, 1000001 + args.sites))
+    for course_id in course_ids:
+        canvas.add_course(**generate_course(course_id, args.users))
+    with FakeCanvasServer(canvas) as server:
+        client = Client(server.url, 'a token', pool_size=args.pool_size)
+
+        def _roster(course_id):
+            return len(list(client.paginate(f'/api/v1/courses/{course_id}/users')))
+
+        def _roster_without_session(course_id):
+            url = f'{server.url}/api/v1/courses/{course_id}/users?per_page=100'
+            count = 0
+            while url:
+                response = requests.get(url, headers={'Authorization': 'Bearer a token'})
+                count += len(response.json())
+                url = response.links.get('next', {}).get('url')
+            return count
+
+        _timed('new connection per request', canvas, lambda: [_roster_without_session(c) for c in course_ids])
+        _timed('keep-alive, sequential', canvas, lambda: [_roster(c) for c in course_ids])
+        _timed(f'keep-alive, {args.pool_size} threads', canvas, lambda: dict(client.fan_out(_roster, course_ids)))
+        client.close()
+
+
+def _timed(label, canvas, fn):
+    requests_before = canvas.request_count
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<28} {elapsed:>7.2f} s  {canvas.request_count - requests_before} requests')
+
+
+if __name__ == '__main__':
+    main()
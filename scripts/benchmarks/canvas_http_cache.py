@@ -0,0 +1,88 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import tempfile
+import time
+
+from ripley.externals.canvas import Client
+from ripley.externals.fake_canvas import FakeCanvas, FakeCanvasServer, generate_course
+from ripley.lib.http_cache import HttpCache
+
+DESCRIPTION = """Repeat a sync run (course, sections and roster of many sites) against a local fake Canvas.
+
+Compares no HTTP cache, a cache revalidated by ETag on every request, and a cache with a TTL on course and section
+endpoints. The first run with a cache is cold; later runs are warm.
+
+Usage:
+    python -m scripts.benchmarks.canvas_http_cache --sites 50 --users 300 --latency-ms 20 --runs 3
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=20)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--sites', type=int, default=50)
+    parser.add_argument('--users', type=int, default=300)
+    args = parser.parse_args()
+
+    canvas = FakeCanvas(latency=args.latency_ms / 1000)
+    course_ids = list(range(1000001, 1000001 + args.sites))
+    for course_id in course_ids:
+        canvas.add_course(**generate_course(course_id, args.users))
+    modes = [
+        ('no cache', None),
+        ('ETag revalidation', {}),
+        ('TTL on course, sections', {r'/courses/\d+$': 3600, r'/courses/\d+/sections$': 3600}),
+    ]
+    print(f"{'mode':<26} {'run':>3} {'seconds':>8} {'requests':>9} {'304s':>5} {'avoided':>8} {'MB sent':>8} {'MB saved':>9}")
+    with FakeCanvasServer(canvas) as server:
+        for label, ttls in modes:
+            with tempfile.TemporaryDirectory() as directory:
+                http_cache = None if ttls is None else HttpCache(directory, ttls=ttls)
+                client = Client(server.url, 'a token', http_cache=http_cache)
+
+                def _sync(course_id):
+                    client.get(f'/api/v1/courses/{course_id}')
+                    list(client.paginate(f'/api/v1/courses/{course_id}/sections'))
+                    return len(list(client.paginate(f'/api/v1/courses/{course_id}/users')))
+                for run in range(1, args.runs + 1):
+                    requests_before, not_modified_before, bytes_before = canvas.request_count, canvas.not_modified_count, canvas.bytes_sent
+                    stats_before = http_cache.stats() if http_cache else {'bytesSaved': 0, 'requestsAvoided': 0}
+                    start = time.perf_counter()
+                    dict(client.fan_out(_sync, course_ids))
+                    elapsed = time.perf_counter() - start
+                    stats = http_cache.stats() if http_cache else stats_before
+                    print(
+                        f'{label:<26} {run:>3} {elapsed:>8.2f} {canvas.request_count - requests_before:>9} '
+                        f'{canvas.not_modified_count - not_modified_before:>5} {stats["requestsAvoided"] - stats_before["requestsAvoided"]:>8} '
+                        f'{(canvas.bytes_sent - bytes_before) / 1e6:>8.2f} {(stats["bytesSaved"] - stats_before["bytesSaved"]) / 1e6:>9.2f}',
+                    )
+                client.close()
+
+
+if __name__ == '__main__':
+    main()
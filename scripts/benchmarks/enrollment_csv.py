@@ -0,0 +1,100 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import csv
+import io
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from ripley import db
+from ripley.factory import create_app
+from ripley.lib.sis_import_csv import export_query_to_csv
+from sqlalchemy import text
+
+DESCRIPTION = """Peak RSS and rows per second of an enrollment CSV export: streamed and chunked vs. built in memory.
+
+Each mode runs in a fresh subprocess so that peak RSS is its own. Rows come from generate_series on the configured
+PostgreSQL database.
+
+Usage:
+    RIPLEY_ENV=test python -m scripts.benchmarks.enrollment_csv --rows 1000000
+"""
+
+ENROLLMENTS_SQL = """SELECT 'CRS:2023-B-' || (n % 5000) AS course_id, 'UID:' || (10000000 + n) AS user_id,
+    'student' AS role, 'SEC:2023-B-' || (n % 9000) AS section_id, 'active' AS status
+    FROM generate_series(1, :count) AS n"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--compress', action='store_true')
+    parser.add_argument('--mode', choices=['in-memory', 'streamed'])
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(_run(args)))
+        return
+    print(f"{'mode':<10} {'rows':>9} {'seconds':>8} {'rows/s':>9} {'peak RSS MB':>12} {'files':>6}")
+    for mode in ('in-memory', 'streamed'):
+        command = [sys.executable, '-m', 'scripts.benchmarks.enrollment_csv', '--mode', mode, '--rows', str(args.rows)]
+        output = subprocess.run(command + (['--compress'] if args.compress else []), capture_output=True, check=True, text=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(
+            f"{mode:<10} {args.rows:>9} {result['seconds']:>8.2f} {args.rows / result['seconds']:>9.0f} "
+            f"{result['peakRssMb']:>12.1f} {result['files']:>6}",
+        )
+
+
+def _run(args):
+    app = create_app()
+    with app.app_context(), tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        if args.mode == 'streamed':
+            summary = export_query_to_csv(ENROLLMENTS_SQL, directory, 'enrollments', params={'count': args.rows}, compress=args.compress)
+            file_count = len(summary['files'])
+        else:
+            result = db.session.execute(text(ENROLLMENTS_SQL), {'count': args.rows})
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(result.keys())
+            writer.writerows(result.fetchall())
+            with open(f'{directory}/enrollments.csv', 'w') as file:
+                file.write(buffer.getvalue())
+            file_count = 1
+        return {
+            'files': file_count,
+            'peakRssMb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            'seconds': time.perf_counter() - start,
+        }
+
+
+if __name__ == '__main__':
+    main()
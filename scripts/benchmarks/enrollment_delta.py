@@ -0,0 +1,79 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import os
+import random
+import resource
+import tempfile
+import time
+
+from ripley.factory import create_app
+from ripley.lib.sis_import_delta import EnrollmentDelta
+
+DESCRIPTION = """Size and cost of a delta enrollment set against a full one, for a term in which a small share of enrollments change.
+
+Usage:
+    RIPLEY_ENV=test python -m scripts.benchmarks.enrollment_delta --enrollments 1000000 --changed 0.005
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--changed', type=float, default=0.005, help='Share of enrollments dropped, and again added')
+    parser.add_argument('--enrollments', type=int, default=1000000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context(), tempfile.TemporaryDirectory() as directory:
+        delta = EnrollmentDelta(os.path.join(directory, 'enrollments.db'))
+        _timed('full set', lambda: delta.export(_enrollments(args.enrollments), directory, 'full'))
+        delta.commit()
+        print(f"snapshot on disk: {os.path.getsize(os.path.join(directory, 'enrollments.db')) / 1024 / 1024:.1f} MB")
+
+        changed = int(args.enrollments * args.changed)
+        dropped = set(random.sample(range(args.enrollments), changed))
+        rows = (row for n, row in enumerate(_enrollments(args.enrollments + changed)) if n not in dropped)
+        _timed('delta', lambda: delta.export(rows, directory, 'delta'))
+
+
+def _enrollments(count):
+    for n in range(count):
+        yield [f'CRS:2023-B-{n % 5000}', f'UID:{10000000 + n}', 'student', f'SEC:2023-B-{n % 9000}', 'active']
+
+
+def _timed(label, fn):
+    start = time.perf_counter()
+    summary = fn()
+    elapsed = time.perf_counter() - start
+    size = sum(os.path.getsize(path) for path in summary['files']) / 1024 / 1024
+    print(
+        f"{label:<9} {elapsed:>6.2f} s  rows uploaded={summary['added'] + summary['dropped']:>8} CSV={size:>7.2f} MB  "
+        f'peak RSS={resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB',
+    )
+
+
+if __name__ == '__main__':
+    main()
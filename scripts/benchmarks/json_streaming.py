@@ -0,0 +1,98 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import time
+import tracemalloc
+
+from flask import Flask
+from ripley.lib import http
+
+DESCRIPTION = """Compare tolerant_jsonify with tolerant_jsonify_stream on a large roster-like payload.
+
+Rows come from a generator, as from a server-side cursor. Reports time to first byte, total time to drain the
+response, and peak memory (traced in a separate run, since tracing slows encoding). The streaming encoder is measured
+with and without orjson.
+
+Usage:
+    python -m scripts.benchmarks.json_streaming --rows 10000 100000
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    orjson = http.orjson
+    modes = [('tolerant_jsonify', lambda rows: http.tolerant_jsonify(list(rows)), None)]
+    modes.append(('stream, simplejson', http.tolerant_jsonify_stream, None))
+    if orjson:
+        modes.append(('stream, orjson', http.tolerant_jsonify_stream, orjson))
+    print(f"{'rows':>8} {'mode':<20} {'first byte ms':>14} {'total ms':>9} {'peak MB':>8} {'MB out':>7}")
+    for row_count in args.rows:
+        for label, jsonify, encoder in modes:
+            http.orjson = encoder
+            with app.test_request_context():
+                first_byte, total, size = _drain(lambda: jsonify(_rows(row_count)))
+                tracemalloc.start()
+                _drain(lambda: jsonify(_rows(row_count)))
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            print(f'{row_count:>8} {label:<20} {first_byte * 1000:>14.1f} {total * 1000:>9.1f} {peak / 1e6:>8.1f} {size / 1e6:>7.1f}')
+    http.orjson = orjson
+
+
+def _drain(make_response):
+    start = time.perf_counter()
+    response = make_response()
+    first_byte = None
+    size = 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(chunk)
+    return first_byte, time.perf_counter() - start, size
+
+
+def _rows(count):
+    for i in range(count):
+        yield {
+            'id': i,
+            'mailingListId': 1357911,
+            'emailAddress': f'student-{i}@berkeley.edu',
+            'canSend': i % 50 == 0,
+            'firstName': f'Student {i}',
+            'lastName': 'Hicks',
+            'deletedAt': None,
+            'welcomedAt': '2026-08-24T09:00:00-07:00',
+            'createdAt': '2026-08-20T02:00:00-07:00',
+            'updatedAt': '2026-08-20T02:00:00-07:00',
+        }
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import argparse
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import statistics
+import tempfile
+import time
+
+from flask.logging import default_handler
+from ripley.factory import create_app
+from ripley.logger import ACCESS_LOGGER_NAME, initialize_logger, logging_queue_stats
+
+DESCRIPTION = """Compare API request latency with file logging (app log and access log) off, synchronous and queued.
+
+A local SSD absorbs writes in the page cache, so use --disk-latency-ms to approximate a slow or contended volume.
+
+Usage:
+    python -m scripts.benchmarks.logging_latency --requests 5000 --disk-latency-ms 0.5
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--disk-latency-ms', type=float, default=0, help='Simulated delay per log file write')
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+    if args.disk_latency_ms:
+        _slow_down_file_writes(args.disk_latency_ms / 1000)
+
+    os.environ.setdefault('RIPLEY_ENV', 'test')
+    app = create_app()
+    app.logger.removeHandler(default_handler)
+    client = app.test_client()
+    with tempfile.TemporaryDirectory() as log_dir:
+        for mode in ['off', 'sync', 'queue']:
+            _configure_logging(app, mode, os.path.join(log_dir, f'ripley-{mode}.log'))
+            latencies = []
+            for _ in range(args.requests):
+                start = time.perf_counter()
+                client.get('/api/config')
+                latencies.append((time.perf_counter() - start) * 1000)
+            latencies.sort()
+            print(
+                f'{mode:>6}: mean {statistics.mean(latencies):.3f} ms, '
+                f'p50 {latencies[len(latencies) // 2]:.3f} ms, '
+                f'p99 {latencies[int(len(latencies) * 0.99)]:.3f} ms, '
+                f'max {latencies[-1]:.3f} ms',
+            )
+            if mode == 'queue':
+                stats = logging_queue_stats()['logging_queue']
+                start = time.perf_counter()
+                for key in ['access_log_queue', 'logging_queue']:
+                    app.extensions[key].listener.stop()
+                print(f"        queue depth {stats['depth']}, dropped {stats['dropped']}, drained in {time.perf_counter() - start:.3f}s")
+            _reset_handlers()
+
+
+def _configure_logging(app, mode, location):
+    _reset_handlers()
+    if mode == 'off':
+        for logger in _loggers():
+            logger.setLevel(logging.CRITICAL)
+        return
+    app.config['ACCESS_LOG_LOCATION'] = f'{location}.access'
+    app.config['ACCESS_LOG_SAMPLE_RATE'] = 1
+    app.config['LOGGING_LOCATION'] = location
+    app.config['LOGGING_QUEUE_ENABLED'] = mode == 'queue'
+    initialize_logger(app)
+
+
+def _slow_down_file_writes(delay):
+    emit = RotatingFileHandler.emit
+
+    def _slow_emit(self, record):
+        time.sleep(delay)
+        emit(self, record)
+    RotatingFileHandler.emit = _slow_emit
+
+
+def _loggers():
+    return [logging.getLogger(), logging.getLogger('ldap3'), logging.getLogger(ACCESS_LOGGER_NAME)]
+
+
+def _reset_handlers():
+    for logger in _loggers():
+        for handler in list(logger.handlers):
+            logger.removeHandler(handler)
+            handler.close()
+
+
+if __name__ == '__main__':
+    main()
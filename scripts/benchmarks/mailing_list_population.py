@@ -0,0 +1,112 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import random
+import time
+
+from ripley import db, std_commit
+from ripley.factory import create_app
+from ripley.lib.mailing_lists import populate_mailing_list
+from ripley.models.mailing_list import MailingList
+from ripley.models.mailing_list_members import MailingListMembers
+from sqlalchemy import text
+
+DESCRIPTION = """Compare row-by-row ORM writes with populate_mailing_list (COPY, upsert, bulk soft delete).
+
+Runs against the configured database and deletes what it creates. The second round changes roughly 10% of the
+roster: adds, removals, can_send flips and name changes.
+
+Usage:
+    RIPLEY_ENV=test python -m scripts.benchmarks.mailing_list_population --members 1000 10000
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--members', type=int, nargs='+', default=[1000, 10000])
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        print(f"{'members':>8} {'row-by-row s':>13} {'bulk s':>8} {'resync s':>9}")
+        for count in args.members:
+            roster = [_member(i) for i in range(count)]
+            row_by_row = _time_row_by_row(roster)
+            mailing_list = MailingList.create(canvas_site_id=_unused_canvas_site_id())
+            try:
+                start = time.perf_counter()
+                populate_mailing_list(mailing_list.id, roster)
+                bulk = time.perf_counter() - start
+                start = time.perf_counter()
+                populate_mailing_list(mailing_list.id, _changed(roster))
+                resync = time.perf_counter() - start
+            finally:
+                _delete(mailing_list.id)
+            print(f'{count:>8} {row_by_row:>13.2f} {bulk:>8.2f} {resync:>9.2f}')
+
+
+def _time_row_by_row(roster):
+    mailing_list = MailingList.create(canvas_site_id=_unused_canvas_site_id())
+    try:
+        start = time.perf_counter()
+        for member in roster:
+            db.session.add(MailingListMembers(mailing_list_id=mailing_list.id, **member))
+            std_commit(allow_test_environment=True)
+        return time.perf_counter() - start
+    finally:
+        _delete(mailing_list.id)
+
+
+def _changed(roster):
+    changed = []
+    for i, member in enumerate(roster):
+        if i % 40 == 0:
+            continue
+        if i % 40 == 1:
+            member = {**member, 'can_send': not member['can_send']}
+        if i % 40 == 2:
+            member = {**member, 'first_name': 'Renamed'}
+        changed.append(member)
+    return changed + [_member(len(roster) + i) for i in range(len(roster) // 40)]
+
+
+def _delete(mailing_list_id):
+    params = {'id': mailing_list_id}
+    db.session.execute(text('DELETE FROM canvas_site_mailing_list_members WHERE mailing_list_id = :id'), params)
+    db.session.execute(text('DELETE FROM canvas_site_mailing_lists WHERE id = :id'), params)
+    std_commit(allow_test_environment=True)
+
+
+def _member(i):
+    return {'can_send': i % 25 == 0, 'email_address': f'student-{i}@berkeley.edu', 'first_name': 'Student', 'last_name': str(i)}
+
+
+def _unused_canvas_site_id():
+    return random.randint(10 ** 8, 10 ** 9)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+import os
+import tempfile
+import time
+
+from ripley.externals.fake_smtp import SmtpSink
+from ripley.externals.smtp import SmtpPool
+
+DESCRIPTION = """Relay one message with an attachment to lists of increasing size, through a local SMTP sink.
+
+Compares one SMTP transaction per recipient (the whole message sent to each) with batches of many RCPT per
+transaction, streamed from one spooled copy. The sink counts bytes received rather than keeping messages.
+
+Usage:
+    python -m scripts.benchmarks.mailing_list_relay --members 10 100 1000 5000 --attachment-kb 256 --latency-ms 1
+"""
+
+
+class CountingSink(SmtpSink):
+
+    def __init__(self, latency):
+        super().__init__(latency=latency)
+        self.bytes_received = 0
+        self.transactions = 0
+
+    def add_message(self, mail_from, recipients, data):
+        with self._lock:
+            self.bytes_received += len(data)
+            self.transactions += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--attachment-kb', type=int, default=256)
+    parser.add_argument('--batch-size', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--latency-ms', type=float, default=1)
+    parser.add_argument('--members', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    args = parser.parse_args()
+
+    message = _message(os.urandom(args.attachment_kb * 1024))
+    with tempfile.NamedTemporaryFile(suffix='.eml') as file, CountingSink(latency=args.latency_ms / 1000) as sink:
+        file.write(message.as_bytes())
+        file.flush()
+        pool = SmtpPool(sink.host, sink.port, size=args.concurrency)
+        print(f"{'members':>8} {'mode':<22} {'seconds':>8} {'transactions':>13} {'MB sent':>8}")
+        for member_count in args.members:
+            recipients = [f'student-{i}@berkeley.edu' for i in range(member_count)]
+
+            def _per_recipient():
+                def _send(recipient):
+                    with pool.connection() as connection:
+                        connection.sendmail('xeno-bio-bounces@berkeley.edu', [recipient], message.as_bytes())
+                with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                    list(executor.map(_send, recipients))
+            _timed(member_count, 'per recipient', sink, _per_recipient)
+
+            def _batched():
+                batches = [recipients[i:i + args.batch_size] for i in range(0, len(recipients), args.batch_size)]
+                with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+                    list(executor.map(lambda batch: pool.send_file('xeno-bio-bounces@berkeley.edu', batch, file.name), batches))
+            _timed(member_count, f'batches of {args.batch_size}', sink, _batched)
+        pool.close()
+
+
+def _message(attachment):
+    message = EmailMessage()
+    message['From'] = 'ripley@berkeley.edu'
+    message['To'] = 'xeno-bio@bcourses-lists.berkeley.edu'
+    message['Subject'] = 'Specimen photos'
+    message.set_content('See attached.')
+    message.add_attachment(attachment, maintype='application', subtype='octet-stream', filename='specimen.bin')
+    return message
+
+
+def _timed(member_count, label, sink, fn):
+    bytes_before, transactions_before = sink.bytes_received, sink.transactions
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    megabytes = (sink.bytes_received - bytes_before) / 1024 / 1024
+    print(f'{member_count:>8} {label:<22} {elapsed:>8.2f} {sink.transactions - transactions_before:>13} {megabytes:>8.1f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import random
+
+from ripley import db, std_commit
+from ripley.factory import create_app
+from ripley.lib.mailing_lists import sync_mailing_lists
+from ripley.models.mailing_list import MailingList
+from sqlalchemy import text
+
+DESCRIPTION = """Time a nightly mailing-list sync in which most site rosters are unchanged, with and without fingerprint skipping.
+
+Runs against the configured database and deletes what it creates.
+
+Usage:
+    RIPLEY_ENV=test python -m scripts.benchmarks.mailing_list_sync --sites 2000 --members 60 --changed 0.05
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--changed', type=float, default=0.05, help='Fraction of sites whose roster changes')
+    parser.add_argument('--members', type=int, default=60)
+    parser.add_argument('--sites', type=int, default=2000)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        first_site_id = random.randint(10 ** 8, 10 ** 9)
+        rosters = {first_site_id + i: _roster(i, args.members) for i in range(args.sites)}
+        for canvas_site_id in rosters:
+            MailingList.create(canvas_site_id=canvas_site_id)
+        try:
+            _timed('initial population', rosters, force=True)
+            for canvas_site_id in random.sample(sorted(rosters), int(args.sites * args.changed)):
+                rosters[canvas_site_id] = rosters[canvas_site_id][1:] + [_member(canvas_site_id, args.members)]
+            _timed('nightly, fingerprints', rosters, force=False)
+            _timed('nightly, forced re-diff', rosters, force=True)
+        finally:
+            site_ids = {'site_ids': tuple(rosters)}
+            db.session.execute(
+                text("""DELETE FROM canvas_site_mailing_list_members WHERE mailing_list_id IN
+                    (SELECT id FROM canvas_site_mailing_lists WHERE canvas_site_id IN :site_ids)"""),
+                site_ids,
+            )
+            db.session.execute(text('DELETE FROM canvas_site_mailing_lists WHERE canvas_site_id IN :site_ids'), site_ids)
+            std_commit(allow_test_environment=True)
+
+
+def _timed(label, rosters, force):
+    summary = sync_mailing_lists(lambda canvas_site_id: rosters[canvas_site_id], force=force)
+    print(f"{label:<24} {summary['seconds']:>7.2f} s  populated={summary['populated']} skipped={summary['skipped']} failed={summary['failed']}")
+
+
+def _member(site, i):
+    return {'can_send': i == 0, 'email_address': f'student-{site}-{i}@berkeley.edu', 'first_name': 'Student', 'last_name': str(i)}
+
+
+def _roster(site, count):
+    return [_member(site, i) for i in range(count)]
+
+
+if __name__ == '__main__':
+    main()
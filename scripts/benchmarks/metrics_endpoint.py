@@ -0,0 +1,80 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+from ripley.lib.metrics import MetricsRegistry
+
+DESCRIPTION = """Measure the cost of recording request metrics and of rendering /api/metrics.
+
+Usage:
+    python -m scripts.benchmarks.metrics_endpoint --routes 50 --workers 8
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--routes', type=int, default=50)
+    parser.add_argument('--workers', type=int, default=8, help='Simulated mod_wsgi worker snapshots')
+    args = parser.parse_args()
+
+    registry = MetricsRegistry()
+    statuses = ['200', '304', '401', '404', '500']
+    routes = [f'/api/route/{i}' for i in range(args.routes)]
+
+    count = 100000
+    start = time.perf_counter()
+    for i in range(count):
+        route = routes[i % len(routes)]
+        registry.inc('ripley_http_requests_total', (('method', 'GET'), ('route', route), ('status', statuses[i % len(statuses)])))
+        registry.observe('ripley_http_request_duration_seconds', (i % 1000) / 1000, (('method', 'GET'), ('route', route)))
+    print(f'Record per request: {(time.perf_counter() - start) / count * 1e6:.2f} µs')
+
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        content = registry.render()
+    elapsed = (time.perf_counter() - start) / args.iterations
+    print(f'Render, single process: {elapsed * 1000:.2f} ms ({len(content.splitlines())} lines, {len(content)} bytes)')
+
+    with tempfile.TemporaryDirectory() as directory:
+        snapshot = registry.snapshot()
+        # Fake worker PIDs; most will not be alive, so their gauges are dropped but counters and histograms are merged.
+        for pid in range(1, args.workers):
+            with open(os.path.join(directory, f'{pid + 4000000}.json'), 'w') as file:
+                json.dump({**snapshot, 'pid': pid + 4000000}, file)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            registry.flush(directory)
+            content = registry.render(directory=directory)
+        elapsed = (time.perf_counter() - start) / args.iterations
+        print(f'Flush and render, {args.workers} workers: {elapsed * 1000:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+DESCRIPTION = """Measure the memory of HTTP workers: independently started, versus forked from a warmed-up master.
+
+'independent' starts one single-process server per worker, as mod_wsgi daemon processes each import and load the app.
+'forked' is 'flask serve': create_app and warm_up run once, then workers are forked. 'forked, no gc.freeze' is the same
+without gc.freeze, to show its share. Each worker serves some requests and makes a full garbage collection before
+memory is read from /proc (Linux only).
+Unique is the memory of a worker that no other process shares (USS). PSS splits shared pages among their sharers.
+
+Usage:
+    python -m scripts.benchmarks.prefork_memory --workers 4 --requests 200
+"""
+
+SERVE_SCRIPT = """
+import gc, signal, sys
+from ripley.factory import create_app
+from ripley.lib.prefork import serve
+if sys.argv[3] == 'no-freeze':
+    gc.freeze = lambda: None
+# A full collection, as a long-running worker will eventually make, on demand.
+signal.signal(signal.SIGUSR1, lambda signum, frame: gc.collect())
+serve(create_app(), workers=int(sys.argv[2]), threads=4, host='127.0.0.1', port=int(sys.argv[1]))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print(f"{'model':<24} {'unique MB/worker':>17} {'PSS MB/worker':>14} {'total PSS MB':>13}")
+    _report('independent', _independent(args.workers, args.requests))
+    _report('forked', _forked(args.workers, args.requests, 'freeze'))
+    _report('forked, no gc.freeze', _forked(args.workers, args.requests, 'no-freeze'))
+
+
+def _independent(workers, requests):
+    ports = [_free_port() for _ in range(workers)]
+    processes = [_start(port, 0, 'freeze') for port in ports]
+    try:
+        for port in ports:
+            _exercise(port, requests // workers)
+        _collect(process.pid for process in processes)
+        return [_memory(process.pid) for process in processes]
+    finally:
+        for process in processes:
+            _stop(process)
+
+
+def _forked(workers, requests, variant):
+    port = _free_port()
+    master = _start(port, workers, variant)
+    try:
+        while len(_children(master.pid)) < workers:
+            time.sleep(0.05)
+        _exercise(port, requests)
+        _collect(_children(master.pid))
+        # The master is counted too: it holds the pages that its workers share.
+        return [_memory(pid) for pid in _children(master.pid)] + [_memory(master.pid)]
+    finally:
+        _stop(master)
+
+
+def _start(port, workers, variant):
+    process = subprocess.Popen(
+        [sys.executable, '-c', SERVE_SCRIPT, str(port), str(workers), variant],
+        stderr=subprocess.DEVNULL,
+        stdout=subprocess.DEVNULL,
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/api/config').read()
+            return process
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def _exercise(port, requests):
+    for i in range(requests):
+        path = '/api/config' if i % 2 else '/api/version'
+        urllib.request.urlopen(f'http://127.0.0.1:{port}{path}').read()
+
+
+def _collect(pids):
+    for pid in pids:
+        os.kill(pid, signal.SIGUSR1)
+    time.sleep(1)
+
+
+def _memory(pid):
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as file:
+        for line in file:
+            key, _, value = line.partition(':')
+            if value.strip().endswith('kB'):
+                fields[key] = int(value.split()[0])
+    return {'pss': fields['Pss'], 'unique': fields['Private_Clean'] + fields['Private_Dirty']}
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as file:
+        return [int(child) for child in file.read().split()]
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _report(label, usages):
+    workers = len(usages)
+    unique = sum(usage['unique'] for usage in usages) / 1024
+    pss = sum(usage['pss'] for usage in usages) / 1024
+    print(f'{label:<24} {unique / workers:>17.1f} {pss / workers:>14.1f} {pss:>13.1f}')
+
+
+def _stop(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+if __name__ == '__main__':
+    os.environ.setdefault('RIPLEY_ENV', 'test')
+    main()
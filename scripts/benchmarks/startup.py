@@ -0,0 +1,74 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from ripley.lib.startup import _shell_environment, parse_env_file
+
+DESCRIPTION = """Measure worker bootstrap: loading the environment, then create_app() in a fresh interpreter.
+
+Usage:
+    python -m scripts.benchmarks.startup --runs 10 --variables 100
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--variables', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.NamedTemporaryFile('w', suffix='.env') as file:
+        for i in range(args.variables):
+            file.write(f'export RIPLEY_BENCHMARK_{i}="value {i} with spaces"\n')
+        file.flush()
+        _report('environment: bash -c env', args.runs, _shell_environment)
+
+        def _parse():
+            with open(file.name) as env_file:
+                return parse_env_file(env_file)
+        _report('environment: env file parse', args.runs, _parse)
+
+    script = 'from ripley.factory import create_app; create_app()'
+    _report('import and create_app', args.runs, lambda: subprocess.run([sys.executable, '-c', script], check=True, env=os.environ))
+
+
+def _report(label, runs, fn):
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    print(f'{label:<30} median {statistics.median(durations) * 1000:8.2f} ms, max {max(durations) * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
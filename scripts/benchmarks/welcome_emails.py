@@ -0,0 +1,89 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+import smtplib
+import time
+
+from ripley.externals.fake_smtp import SmtpSink
+from ripley.externals.smtp import SmtpPool
+
+DESCRIPTION = """Send welcome emails for one large course to a local SMTP sink with simulated per-command latency.
+
+Compares one SMTP session per message, sent serially, with pooled connections and a concurrency cap.
+
+Usage:
+    python -m scripts.benchmarks.welcome_emails --messages 1500 --latency-ms 5 --pool-size 1 4 8
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=DESCRIPTION, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--latency-ms', type=float, default=5)
+    parser.add_argument('--messages', type=int, default=1500)
+    parser.add_argument('--pool-size', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+
+    messages = [_message(i) for i in range(args.messages)]
+    with SmtpSink(latency=args.latency_ms / 1000) as sink:
+        print(f"{'mode':<26} {'seconds':>8} {'messages/s':>11} {'SMTP sessions':>14}")
+
+        def _serial_sessions():
+            for message in messages:
+                with smtplib.SMTP(sink.host, sink.port) as connection:
+                    connection.send_message(message)
+        _timed('session per message', sink, _serial_sessions, len(messages))
+
+        for pool_size in args.pool_size:
+            pool = SmtpPool(sink.host, sink.port, size=pool_size)
+
+            def _pooled():
+                with ThreadPoolExecutor(max_workers=pool_size) as executor:
+                    list(executor.map(pool.send, messages))
+            _timed(f'pooled, {pool_size} connections', sink, _pooled, len(messages))
+            pool.close()
+
+
+def _message(i):
+    message = EmailMessage()
+    message['From'] = 'no-reply@berkeley.edu'
+    message['To'] = f'student-{i}@berkeley.edu'
+    message['Subject'] = 'Welcome to xeno-bio'
+    message.set_content(f'Hello Student {i}, you are now on xeno-bio.')
+    return message
+
+
+def _timed(label, sink, fn, count):
+    sessions_before = sink.session_count
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f'{label:<26} {elapsed:>8.2f} {count / elapsed:>11.0f} {sink.session_count - sessions_before:>14}')
+
+
+if __name__ == '__main__':
+    main()
@@ -45,14 +45,21 @@ ALTER TABLE IF EXISTS ONLY public.user_data
 
 --
 
+DROP INDEX IF EXISTS public.canvas_site_mailing_list_members_active_idx;
 DROP INDEX IF EXISTS public.canvas_site_mailing_list_members_deleted_at_idx;
+DROP INDEX IF EXISTS public.canvas_site_mailing_list_members_unwelcomed_idx;
 DROP INDEX IF EXISTS public.canvas_site_mailing_list_members_welcomed_at_idx;
+DROP INDEX IF EXISTS public.job_history_job_key_started_at_idx;
+DROP INDEX IF EXISTS public.jobs_active_job_key_idx;
+DROP INDEX IF EXISTS public.jobs_queued_run_after_idx;
 
 --
 
 DROP TABLE IF EXISTS public.canvas_site_mailing_list_members;
 DROP TABLE IF EXISTS public.canvas_site_mailing_lists;
 DROP TABLE IF EXISTS public.canvas_synchronization;
+DROP TABLE IF EXISTS public.job_history;
+DROP TABLE IF EXISTS public.jobs;
 DROP TABLE IF EXISTS public.user_auths;
 DROP TABLE IF EXISTS public.user_data;
 
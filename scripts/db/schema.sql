@@ -51,8 +51,14 @@ ALTER TABLE ONLY canvas_site_mailing_list_members
     ADD CONSTRAINT canvas_site_mailing_list_members_unique_constraint UNIQUE (mailing_list_id, email_address);
 CREATE INDEX canvas_site_mailing_list_members_deleted_at_idx
     ON canvas_site_mailing_list_members USING btree (deleted_at);
+-- Keyset pagination of current members, per list.
+CREATE INDEX canvas_site_mailing_list_members_active_idx
+    ON canvas_site_mailing_list_members USING btree (mailing_list_id, id) WHERE deleted_at IS NULL;
 CREATE INDEX canvas_site_mailing_list_members_welcomed_at_idx
     ON canvas_site_mailing_list_members USING btree (welcomed_at);
+-- Keyset pagination of members yet to be welcomed, per list.
+CREATE INDEX canvas_site_mailing_list_members_unwelcomed_idx
+    ON canvas_site_mailing_list_members USING btree (mailing_list_id, id) WHERE welcomed_at IS NULL AND deleted_at IS NULL;
 
 --
 
@@ -65,6 +71,7 @@ CREATE TABLE canvas_site_mailing_lists (
     populate_add_errors INTEGER,
     populate_remove_errors INTEGER,
     populated_at TIMESTAMP WITH TIME ZONE,
+    roster_fingerprint CHARACTER VARYING(64),
     state CHARACTER VARYING(255),
     type CHARACTER VARYING(255),
     welcome_email_active BOOLEAN DEFAULT FALSE NOT NULL,
@@ -86,6 +93,42 @@ CREATE TABLE canvas_synchronization (
     last_instructor_sync TIMESTAMP WITH TIME ZONE
 );
 
+CREATE TABLE job_history (
+    id SERIAL PRIMARY KEY,
+    job_id INTEGER,
+    job_key CHARACTER VARYING(255) NOT NULL,
+    attempt INTEGER NOT NULL,
+    status CHARACTER VARYING(32) NOT NULL,
+    worker CHARACTER VARYING(255),
+    details TEXT,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    finished_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    duration_ms INTEGER NOT NULL
+);
+CREATE INDEX job_history_job_key_started_at_idx ON job_history USING btree (job_key, started_at);
+
+--
+
+CREATE TABLE jobs (
+    id SERIAL PRIMARY KEY,
+    job_key CHARACTER VARYING(255) NOT NULL,
+    args JSONB DEFAULT '{}'::JSONB NOT NULL,
+    status CHARACTER VARYING(32) DEFAULT 'queued' NOT NULL,
+    attempts INTEGER DEFAULT 0 NOT NULL,
+    max_attempts INTEGER NOT NULL,
+    run_after TIMESTAMP WITH TIME ZONE NOT NULL,
+    locked_by CHARACTER VARYING(255),
+    locked_at TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL
+);
+-- At most one queued or running instance of each job: two nodes never run the same sync.
+CREATE UNIQUE INDEX jobs_active_job_key_idx ON jobs USING btree (job_key) WHERE status IN ('queued', 'running');
+CREATE INDEX jobs_queued_run_after_idx ON jobs USING btree (run_after) WHERE status = 'queued';
+
+--
+
 CREATE TABLE user_auths (
     id SERIAL PRIMARY KEY,
     uid CHARACTER VARYING(255) NOT NULL,
@@ -0,0 +1,173 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import argparse
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+# Benchmark measurement and history.
+#
+# Benchmarks under tests/test_benchmarks run only with 'pytest --benchmark'. Each run's results are appended to a JSON
+# history file (--benchmark-history, default benchmark-history.json). To compare the latest run with the one before:
+#
+#     python -m tests.benchmark compare --metric p50Ms --threshold 10
+#
+# The command exits with status 1 if any benchmark regressed by more than the threshold, in percent.
+
+DEFAULT_HISTORY_PATH = 'benchmark-history.json'
+
+# Metrics of latency are better lower; of throughput, higher.
+METRICS = {
+    'meanMs': 'lower',
+    'opsPerSecond': 'higher',
+    'p50Ms': 'lower',
+    'p95Ms': 'lower',
+    'p99Ms': 'lower',
+}
+
+
+def measure(fn, seconds=1.0, min_iterations=20, warmup=5):
+    """Call fn repeatedly for about the given number of seconds. Return throughput and latency percentiles."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    deadline = time.perf_counter() + seconds
+    while len(durations) < min_iterations or time.perf_counter() < deadline:
+        start = time.perf_counter()
+        fn()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    total = sum(durations)
+    return {
+        'iterations': len(durations),
+        'maxMs': round(durations[-1] * 1000, 4),
+        'meanMs': round(total / len(durations) * 1000, 4),
+        'opsPerSecond': round(len(durations) / total, 1),
+        'p50Ms': round(_percentile(durations, 50) * 1000, 4),
+        'p95Ms': round(_percentile(durations, 95) * 1000, 4),
+        'p99Ms': round(_percentile(durations, 99) * 1000, 4),
+    }
+
+
+def load_history(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {'runs': []}
+
+
+def append_run(path, results):
+    """Append a run of benchmark results to the history file. The file is replaced atomically."""
+    history = load_history(path)
+    history['runs'].append({
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'results': dict(sorted(results.items())),
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    })
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(history, file, indent=2)
+    os.replace(tmp_path, path)
+    return history['runs'][-1]
+
+
+def compare(baseline, current, metric='p50Ms', threshold=10):
+    """Compare benchmarks common to two runs. Return rows of (name, baseline value, current value, percent change, regressed)."""
+    better = METRICS[metric]
+    rows = []
+    for name in sorted(set(baseline['results']) & set(current['results'])):
+        before = baseline['results'][name][metric]
+        after = current['results'][name][metric]
+        change = (after - before) / before * 100 if before else 0.0
+        worse_by = change if better == 'lower' else -change
+        rows.append((name, before, after, change, worse_by > threshold))
+    return rows
+
+
+def find_run(runs, selector):
+    """Select a run by index (negative counts from the latest) or by commit prefix."""
+    try:
+        return runs[int(selector)]
+    except ValueError:
+        matches = [run for run in runs if (run.get('commit') or '').startswith(selector)]
+        if not matches:
+            raise LookupError(f'No run of commit {selector}')
+        return matches[-1]
+    except IndexError:
+        raise LookupError(f'No run at index {selector}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m tests.benchmark', description='Compare benchmark runs.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compare_parser = subparsers.add_parser('compare', help='Compare the current run with a baseline run.')
+    compare_parser.add_argument('--baseline', default='-2', help='Index or commit of the baseline run. Default: the run before.')
+    compare_parser.add_argument('--current', default='-1', help='Index or commit of the current run. Default: the latest.')
+    compare_parser.add_argument('--history', default=DEFAULT_HISTORY_PATH)
+    compare_parser.add_argument('--metric', choices=sorted(METRICS), default='p50Ms')
+    compare_parser.add_argument('--threshold', type=float, default=10, help='Percent by which a benchmark may regress.')
+    args = parser.parse_args(argv)
+
+    runs = load_history(args.history)['runs']
+    try:
+        baseline = find_run(runs, args.baseline)
+        current = find_run(runs, args.current)
+    except LookupError as e:
+        print(e, file=sys.stderr)
+        return 2
+    print(f"Baseline {baseline.get('commit')} at {baseline['timestamp']}, current {current.get('commit')} at {current['timestamp']}")
+    print(f"{'benchmark':<40} {'baseline':>12} {'current':>12} {'change':>9}")
+    rows = compare(baseline, current, metric=args.metric, threshold=args.threshold)
+    for name, before, after, change, regressed in rows:
+        print(f"{name:<40} {before:>12.4f} {after:>12.4f} {change:>+8.1f}%{'  REGRESSED' if regressed else ''}")
+    regressions = [row for row in rows if row[4]]
+    if regressions:
+        print(f'{len(regressions)} of {len(rows)} benchmarks regressed by more than {args.threshold}% in {args.metric}.')
+        return 1
+    return 0
+
+
+def _git_commit():
+    try:
+        result = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, check=True, text=True)
+        return result.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _percentile(sorted_values, percent):
+    index = min(len(sorted_values) - 1, round(percent / 100 * (len(sorted_values) - 1)))
+    return sorted_values[index]
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -26,16 +26,38 @@ import os
 
 import pytest
 import ripley.factory
+from tests.benchmark import append_run, DEFAULT_HISTORY_PATH, measure
 
 
 os.environ['RIPLEY_ENV'] = 'test'  # noqa
 
+BENCHMARK_RESULTS = pytest.StashKey[dict]()
+
 # Because app and db fixtures are only created once per pytest run, individual tests
 # are not able to modify application configuration values before the app is created.
 # Per-test customizations could be supported via a fixture scope of 'function' and
 # the @pytest.mark.parametrize annotation.
 
 
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true', help='Run benchmarks, which are otherwise skipped.')
+    parser.addoption('--benchmark-history', default=DEFAULT_HISTORY_PATH, help='JSON file to which benchmark results are appended.')
+    parser.addoption('--benchmark-seconds', type=float, default=1.0, help='Duration of each benchmark.')
+
+
+def pytest_terminal_summary(terminalreporter, exitstatus, config):
+    results = config.stash.get(BENCHMARK_RESULTS, None)
+    if not results:
+        return
+    terminalreporter.section('benchmarks')
+    terminalreporter.write_line(f"{'benchmark':<40} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in sorted(results.items()):
+        terminalreporter.write_line(
+            f"{name:<40} {result['opsPerSecond']:>10.1f} {result['p50Ms']:>9.3f} {result['p95Ms']:>9.3f} {result['p99Ms']:>9.3f}",
+        )
+    terminalreporter.write_line(f"Appended to {config.getoption('--benchmark-history')}")
+
+
 @pytest.fixture(scope='session')
 def app(request):
     """Fixture application object, shared by all tests."""
@@ -51,3 +73,59 @@ def app(request):
 
     request.addfinalizer(teardown)
     return _app
+
+
+@pytest.fixture(scope='session')
+def db(app):
+    """Fixture database object, shared by all tests."""
+    from ripley.models import development_db
+    # Drop all tables before re-loading the schemas.
+    # If we dropped at teardown instead, an interrupted test run would block the next test run.
+    development_db.clear()
+    return development_db.load()
+
+
+@pytest.fixture(scope='function')
+def db_session(db):
+    """Database session of a single test. In the test environment std_commit only flushes, so a rollback undoes all."""
+    yield db.session
+    db.session.rollback()
+
+
+@pytest.fixture(scope='function')
+def admin_client(client, monkeypatch):
+    """Test client with a session for an admin user."""
+    from ripley.models.user import User
+    monkeypatch.setattr(User, 'is_admin', property(lambda self: True))
+    with client.session_transaction() as session:
+        session['_user_id'] = '2040'
+    return client
+
+
+@pytest.fixture(scope='function')
+def smtp_sink(app):
+    """In-memory SMTP server that receives the mail sent in the test environment."""
+    from ripley.externals.smtp import get_smtp_pool
+    get_smtp_pool()
+    return app.extensions['smtp_sink']
+
+
+@pytest.fixture(scope='session')
+def benchmark_results(request):
+    """Results of all benchmarks in this run, appended to the benchmark history when the run is done."""
+    results = request.config.stash[BENCHMARK_RESULTS] = {}
+    yield results
+    if results:
+        append_run(request.config.getoption('--benchmark-history'), results)
+
+
+@pytest.fixture(scope='function')
+def benchmark(request, benchmark_results):
+    """Measure a callable, recording the results under the name of the test. Skipped unless pytest is run with --benchmark."""
+    if not request.config.getoption('--benchmark'):
+        pytest.skip('Benchmarks run only with --benchmark')
+
+    def _benchmark(fn):
+        results = benchmark_results[request.node.name] = measure(fn, seconds=request.config.getoption('--benchmark-seconds'))
+        return results
+    return _benchmark
@@ -22,6 +22,9 @@ SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
 "AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
 ENHANCEMENTS, OR MODIFICATIONS.
 """
+import json
+
+from tests.util import override_config
 
 
 class TestVersion:
@@ -34,6 +37,37 @@ class TestVersion:
         assert 'version' in response.json
         assert 'build' in response.json
 
+    def test_if_none_match(self, client):
+        """Unchanged version info gets a 304."""
+        etag = client.get('/api/version').headers['ETag']
+        response = client.get('/api/version', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+    def test_reload_build_summary(self, app, client, tmp_path):
+        """Version info is refreshed when the build summary changes on disk."""
+        etag = client.get('/api/version').headers['ETag']
+        (tmp_path / 'config').mkdir()
+        (tmp_path / 'config' / 'build-summary.json').write_text(json.dumps({'build': {'gitCommit': 'abc123'}}))
+        try:
+            with override_config(app, 'BASE_DIR', str(tmp_path)), override_config(app, 'BUILD_SUMMARY_CHECK_INTERVAL', 0):
+                response = client.get('/api/version', headers={'If-None-Match': etag})
+                assert response.status_code == 200
+                assert response.json['build'] == {'gitCommit': 'abc123'}
+                assert response.headers['ETag'] != etag
+        finally:
+            # Payloads are re-serialized on next request.
+            app.extensions.pop('api_payloads')
+
+    def test_unexpected_error(self, app, client, monkeypatch):
+        """An unhandled exception gets a 500."""
+        def _raise():
+            raise RuntimeError('Mother is offline.')
+        monkeypatch.setitem(app.view_functions, 'app_version', _raise)
+        response = client.get('/api/version')
+        assert response.status_code == 500
+        assert response.json == {'message': 'Mother is offline.'}
+
 
 class TestConfigController:
 
@@ -50,3 +84,11 @@ class TestConfigController:
         api_json_lower_string = str(api_json).lower()
         for keyword in ('password', 'secret'):
             assert keyword not in api_json_lower_string
+
+    def test_etag(self, client):
+        """Configs are served with a strong ETag and honor If-None-Match."""
+        response = client.get('/api/config')
+        etag = response.headers['ETag']
+        assert not etag.startswith('W/')
+        assert client.get('/api/config', headers={'If-None-Match': etag}).status_code == 304
+        assert client.get('/api/config', headers={'If-None-Match': '"stale"'}).status_code == 200
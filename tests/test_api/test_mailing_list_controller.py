@@ -0,0 +1,87 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import json
+
+import pytest
+from ripley import db
+from ripley.lib.mailing_lists import populate_mailing_list
+from ripley.models.mailing_list import MailingList
+
+
+@pytest.fixture()
+def mailing_list(db_session):
+    mailing_list = MailingList.create(canvas_site_id=1357911, canvas_site_name='Xenomorph Biology', list_name='xeno-bio')
+    populate_mailing_list(mailing_list.id, [{'email_address': f'student-{i}@berkeley.edu'} for i in range(25)])
+    db.session.execute(
+        db.text("UPDATE canvas_site_mailing_list_members SET deleted_at = now() WHERE email_address = 'student-3@berkeley.edu'"),
+    )
+    return mailing_list
+
+
+class TestMailingListMembers:
+
+    def test_anonymous(self, client, mailing_list):
+        """Denies anonymous user."""
+        assert client.get(f'/api/mailing_lists/{mailing_list.id}/members').status_code == 401
+
+    def test_not_found(self, admin_client, db_session):
+        assert admin_client.get('/api/mailing_lists/999999/members').status_code == 404
+
+    def test_bad_request(self, admin_client, mailing_list):
+        assert admin_client.get(f'/api/mailing_lists/{mailing_list.id}/members?after=x').status_code == 400
+        assert admin_client.get(f'/api/mailing_lists/{mailing_list.id}/members?limit=0').status_code == 400
+        assert admin_client.get(f'/api/mailing_lists/{mailing_list.id}/members?limit=10001').status_code == 400
+
+    def test_keyset_pagination(self, admin_client, mailing_list):
+        """Pages follow the last id received. Removed members are left out."""
+        pages = []
+        after_id = 0
+        while True:
+            response = admin_client.get(f'/api/mailing_lists/{mailing_list.id}/members?after={after_id}&limit=10')
+            assert response.status_code == 200
+            assert response.is_streamed
+            page = response.json
+            pages.append(page)
+            if len(page) < 10:
+                break
+            after_id = page[-1]['id']
+        assert [len(page) for page in pages] == [10, 10, 4]
+        members = [member for page in pages for member in page]
+        assert [m['id'] for m in members] == sorted(m['id'] for m in members)
+        assert 'student-3@berkeley.edu' not in {m['emailAddress'] for m in members}
+        assert members[0]['mailingListId'] == mailing_list.id
+        assert members[0]['deletedAt'] is None
+
+    def test_empty_page(self, admin_client, mailing_list):
+        response = admin_client.get(f'/api/mailing_lists/{mailing_list.id}/members?after=999999999')
+        assert response.json == []
+
+    def test_ndjson_export(self, admin_client, mailing_list):
+        response = admin_client.get(f'/api/mailing_lists/{mailing_list.id}/members?format=ndjson&includeDeleted=true')
+        assert response.mimetype == 'application/x-ndjson'
+        members = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert len(members) == 25
+        assert next(m for m in members if m['emailAddress'] == 'student-3@berkeley.edu')['deletedAt']
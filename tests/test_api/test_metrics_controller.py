@@ -0,0 +1,120 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import gc
+import json
+import os
+import threading
+
+from ripley.lib.metrics import MetricsRegistry, render_snapshots
+
+
+class TestMetricsController:
+
+    def test_anonymous(self, client):
+        """Denies anonymous user."""
+        assert client.get('/api/metrics').status_code == 401
+
+    def test_admin(self, admin_client):
+        """Admin user gets request counts, latency histograms and cache stats."""
+        admin_client.get('/api/config')
+        response = admin_client.get('/api/metrics')
+        assert response.status_code == 200
+        assert response.mimetype == 'text/plain'
+        text = response.data.decode('utf-8')
+        assert 'ripley_http_requests_total{method="GET",route="/api/config",status="200"}' in text
+        assert 'ripley_http_request_duration_seconds_bucket{method="GET",route="/api/config",le="+Inf"}' in text
+        assert 'ripley_http_requests_in_flight 1' in text
+        assert 'ripley_cache_hits_total{cache="user"}' in text
+        assert 'ripley_cache_misses_total{cache="user"}' in text
+
+
+class TestMetricsRegistry:
+
+    def test_threads_and_histograms(self):
+        registry = MetricsRegistry()
+        labels = (('route', '/api/config'),)
+        for value in [0.001, 0.02, 0.3, 20]:
+            registry.observe('ripley_http_request_duration_seconds', value, labels)
+        registry.inc('ripley_http_requests_total', labels, 4)
+        text = render_snapshots([registry.snapshot()])
+        assert 'ripley_http_requests_total{route="/api/config"} 4' in text
+        assert 'ripley_http_request_duration_seconds_bucket{route="/api/config",le="0.005"} 1' in text
+        assert 'ripley_http_request_duration_seconds_bucket{route="/api/config",le="0.5"} 3' in text
+        assert 'ripley_http_request_duration_seconds_bucket{route="/api/config",le="+Inf"} 4' in text
+        assert 'ripley_http_request_duration_seconds_count{route="/api/config"} 4' in text
+
+    def test_shards_of_exited_threads_are_retired(self):
+        registry = MetricsRegistry()
+        labels = (('route', '/api/config'),)
+
+        def _request():
+            registry.request_started()
+            registry.inc('ripley_http_requests_total', labels)
+            registry.observe('ripley_http_request_duration_seconds', 0.02, labels)
+            registry.request_finished()
+        for _ in range(50):
+            thread = threading.Thread(target=_request)
+            thread.start()
+            thread.join()
+        gc.collect()
+        assert len(registry._shards) == 1
+        registry.inc('ripley_http_requests_total', labels)
+        text = render_snapshots([registry.snapshot()])
+        assert 'ripley_http_requests_total{route="/api/config"} 51' in text
+        assert 'ripley_http_request_duration_seconds_count{route="/api/config"} 50' in text
+        assert 'ripley_http_requests_in_flight 0' in text
+
+    def test_cache_hit_ratio(self):
+        registry = MetricsRegistry()
+        registry.register_collector('test', lambda: {
+            ('ripley_cache_hits_total', (('cache', 'test'),)): 3,
+            ('ripley_cache_misses_total', (('cache', 'test'),)): 1,
+        })
+        assert 'ripley_cache_hit_ratio{cache="test"} 0.75' in render_snapshots([registry.snapshot()])
+
+    def test_multiprocess(self, tmp_path):
+        registry = MetricsRegistry()
+        registry.inc('ripley_http_requests_total', (('route', '/api/config'),), 2)
+        registry.request_started()
+        # Snapshots of another live worker and of a worker that has exited.
+        for pid, in_flight in [(os.getppid(), 3), (2 ** 22 + 1, 5)]:
+            with open(tmp_path / f'{pid}.json', 'w') as file:
+                json.dump({
+                    'counters': [['ripley_http_requests_total', [['route', '/api/config']], 10]],
+                    'gauges': [['ripley_http_requests_in_flight', [], in_flight]],
+                    'histograms': [],
+                    'pid': pid,
+                }, file)
+        text = registry.render(directory=str(tmp_path))
+        assert 'ripley_http_requests_total{route="/api/config"} 22' in text
+        assert 'ripley_http_requests_in_flight 4' in text
+
+    def test_flush(self, tmp_path):
+        registry = MetricsRegistry()
+        registry.inc('ripley_http_requests_total', (('route', '/api/version'),))
+        registry.flush(str(tmp_path))
+        with open(tmp_path / f'{os.getpid()}.json') as file:
+            snapshot = json.load(file)
+        assert snapshot['counters'] == [['ripley_http_requests_total', [['route', '/api/version']], 1]]
@@ -0,0 +1,87 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+from tests.util import override_config
+
+
+class _SigningCounter:
+
+    def __init__(self, app, monkeypatch):
+        self.count = 0
+        get_signing_serializer = app.session_interface.get_signing_serializer
+
+        def _get_signing_serializer(_app):
+            serializer = get_signing_serializer(_app)
+            dumps = serializer.dumps
+
+            def _dumps(*args, **kwargs):
+                self.count += 1
+                return dumps(*args, **kwargs)
+            serializer.dumps = _dumps
+            return serializer
+        monkeypatch.setattr(app.session_interface, 'get_signing_serializer', _get_signing_serializer)
+
+
+def _log_in(client, uid='2040'):
+    with client.session_transaction() as session:
+        session['_user_id'] = uid
+
+
+def _set_cookie_count(client, path, requests=10):
+    return sum(1 for _ in range(requests) if 'Set-Cookie' in client.get(path).headers)
+
+
+class TestSlidingSession:
+
+    def test_anonymous_and_front_end_requests(self, app, client, monkeypatch):
+        """No session cookie is issued for anonymous API requests or front-end routes."""
+        signing = _SigningCounter(app, monkeypatch)
+        assert _set_cookie_count(client, '/api/config') == 0
+        _log_in(client)
+        signing.count = 0
+        assert _set_cookie_count(client, '/some/deep/link') == 0
+        assert signing.count == 0
+
+    def test_refresh_after_fraction_of_lifetime(self, app, client, monkeypatch):
+        """Authenticated API requests re-issue the cookie only once per refresh interval."""
+        now = [1700000000]
+        monkeypatch.setattr('ripley.routes.time.time', lambda: now[0])
+        _log_in(client)
+        signing = _SigningCounter(app, monkeypatch)
+        assert _set_cookie_count(client, '/api/config') == 1
+        assert signing.count == 1
+        # Refresh interval is 10% of 120 minutes.
+        now[0] += 12 * 60 - 1
+        assert _set_cookie_count(client, '/api/config') == 0
+        now[0] += 1
+        assert _set_cookie_count(client, '/api/config') == 1
+        assert signing.count == 2
+
+    def test_legacy_mode(self, app, client, monkeypatch):
+        """Without sliding expiration, every request re-issues the cookie."""
+        _log_in(client)
+        signing = _SigningCounter(app, monkeypatch)
+        with override_config(app, 'SESSION_SLIDING_EXPIRATION', False):
+            assert _set_cookie_count(client, '/api/config') == 10
+        assert signing.count == 10
@@ -0,0 +1,73 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import pytest
+from ripley import batched_commit, db
+from sqlalchemy import text
+
+
+def _insert_user_data(uid, preferred_name='Ripley'):
+    db.session.execute(
+        text("""INSERT INTO user_data (uid, preferred_name, created_at, updated_at)
+            VALUES (:uid, :preferred_name, now(), now())"""),
+        {'preferred_name': preferred_name, 'uid': uid},
+    )
+
+
+def _count_user_data():
+    return db.session.execute(text("SELECT COUNT(*) FROM user_data WHERE uid LIKE 'batch-%'")).scalar()
+
+
+class TestBatchedCommit:
+
+    def test_batches(self, app, db_session):
+        with batched_commit(every=4) as batch:
+            for i in range(10):
+                with batch.item(i):
+                    _insert_user_data(f'batch-{i}')
+        assert [b['items'] for b in batch.batches] == [4, 4, 2]
+        assert all(b['seconds'] >= 0 for b in batch.batches)
+        assert batch.stats()['items'] == 10
+        assert _count_user_data() == 10
+
+    def test_bad_row_does_not_roll_back_batch(self, app, db_session):
+        with batched_commit(every=500) as batch:
+            for uid in ['batch-1', 'batch-2', 'batch-1', 'batch-3']:
+                with batch.item(uid):
+                    _insert_user_data(uid)
+            with batch.item('null name'):
+                _insert_user_data('batch-4', preferred_name=None)
+        assert batch.stats()['items'] == 3
+        assert batch.error_count == 2
+        assert [e['item'] for e in batch.errors] == ['batch-1', 'null name']
+        assert 'user_data_unique_constraint' in batch.errors[0]['error']
+        assert _count_user_data() == 3
+
+    def test_unexpected_error_rolls_back(self, app, db_session):
+        with pytest.raises(ValueError):
+            with batched_commit(every=500) as batch:
+                with batch.item():
+                    _insert_user_data('batch-1')
+                raise ValueError('Boom')
+        assert _count_user_data() == 0
@@ -0,0 +1,62 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from tests.benchmark import append_run, compare, load_history, main, measure
+
+
+def _run(commit, **p50s):
+    return {'commit': commit, 'results': {name: {'opsPerSecond': 1000 / p50, 'p50Ms': p50} for name, p50 in p50s.items()}}
+
+
+class TestMeasure:
+
+    def test_stats(self):
+        results = measure(lambda: None, seconds=0, min_iterations=50)
+        assert results['iterations'] == 50
+        assert results['p50Ms'] <= results['p95Ms'] <= results['p99Ms'] <= results['maxMs']
+
+
+class TestCompare:
+
+    def test_threshold(self):
+        rows = compare(_run('a', fast=1.0, slow=10.0, gone=1.0), _run('b', fast=1.05, slow=12.0, new=1.0), threshold=10)
+        assert [(name, regressed) for name, _, _, _, regressed in rows] == [('fast', False), ('slow', True)]
+
+    def test_higher_is_better(self):
+        rows = compare(_run('a', fast=1.0), _run('b', fast=2.0), metric='opsPerSecond', threshold=10)
+        assert rows[0][3] == -50.0
+        assert rows[0][4] is True
+
+
+class TestCompareCommand:
+
+    def test_exit_status(self, tmp_path):
+        path = str(tmp_path / 'history.json')
+        append_run(path, {'test_config': {'p50Ms': 1.0}})
+        append_run(path, {'test_config': {'p50Ms': 1.2}})
+        assert len(load_history(path)['runs']) == 2
+        assert main(['compare', '--history', path, '--threshold', '25']) == 0
+        assert main(['compare', '--history', path, '--threshold', '10']) == 1
+        assert main(['compare', '--history', path, '--baseline', 'nosuchcommit']) == 2
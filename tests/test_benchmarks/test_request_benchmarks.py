@@ -0,0 +1,129 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import json
+
+from ripley.lib.http import tolerant_jsonify, tolerant_jsonify_stream
+from ripley.routes import _user_loader
+from tests.util import override_config
+
+# Throughput and latency of request paths, through the Flask test client. Run with 'pytest --benchmark'.
+
+
+def _rows(count):
+    for i in range(count):
+        yield {
+            'canvasSiteId': 1010101,
+            'emailAddress': f'student-{i}@berkeley.edu',
+            'firstName': 'Ellen',
+            'id': i,
+            'lastName': 'Ripley',
+            'role': 'StudentEnrollment',
+            'score': i / 3,
+        }
+
+
+def _raise_runtime_error():
+    raise RuntimeError('Mother is offline.')
+
+
+def _get(client, path, status, **kwargs):
+    def _request():
+        response = client.get(path, **kwargs)
+        assert response.status_code == status
+    return _request
+
+
+class TestApiBenchmarks:
+
+    def test_config(self, benchmark, client):
+        benchmark(_get(client, '/api/config', 200))
+
+    def test_config_not_modified(self, benchmark, client):
+        etag = client.get('/api/config').headers['ETag']
+        benchmark(_get(client, '/api/config', 304, headers={'If-None-Match': etag}))
+
+    def test_version(self, benchmark, client):
+        benchmark(_get(client, '/api/version', 200))
+
+    def test_unmatched_api_route(self, benchmark, client):
+        benchmark(_get(client, '/api/no/such/resource', 404))
+
+
+class TestErrorHandlerBenchmarks:
+
+    def test_unauthorized(self, benchmark, client):
+        benchmark(_get(client, '/api/mailing_lists/1/members', 401))
+
+    def test_resource_not_found(self, benchmark, admin_client, db_session):
+        benchmark(_get(admin_client, '/api/mailing_lists/999999/members', 404))
+
+    def test_unhandled_exception(self, app, benchmark, client, monkeypatch):
+        monkeypatch.setitem(app.view_functions, 'app_version', _raise_runtime_error)
+        benchmark(_get(client, '/api/version', 500))
+
+
+class TestFrontEndBenchmarks:
+
+    def test_catch_all(self, app, benchmark, client):
+        with override_config(app, 'VUE_LOCALHOST_BASE_URL', None):
+            benchmark(_get(client, '/courses/1010101/mailing_list', 200))
+
+    def test_catch_all_gzip(self, app, benchmark, client):
+        with override_config(app, 'VUE_LOCALHOST_BASE_URL', None):
+            benchmark(_get(client, '/courses/1010101/mailing_list', 200, headers={'Accept-Encoding': 'gzip'}))
+
+
+class TestJsonBenchmarks:
+
+    def test_tolerant_jsonify_large(self, app, benchmark):
+        rows = list(_rows(10000))
+
+        def _jsonify():
+            with app.test_request_context():
+                assert tolerant_jsonify(rows).content_length
+        benchmark(_jsonify)
+
+    def test_tolerant_jsonify_stream_large(self, app, benchmark):
+        def _jsonify_stream():
+            with app.test_request_context():
+                content = b''.join(tolerant_jsonify_stream(_rows(10000)).response)
+            assert json.loads(content)[-1]['id'] == 9999
+        benchmark(_jsonify_stream)
+
+
+class TestUserLoaderBenchmarks:
+
+    def test_user_loader(self, app, benchmark):
+        def _load():
+            with app.test_request_context():
+                assert _user_loader('2040').uid == '2040'
+        benchmark(_load)
+
+    def test_anonymous_user_loader(self, app, benchmark):
+        def _load():
+            with app.test_request_context():
+                assert _user_loader().uid is None
+        benchmark(_load)
@@ -0,0 +1,136 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import threading
+
+from ldap3.core.exceptions import LDAPBindError, LDAPSocketReceiveError
+import pytest
+from ripley.configs import ConfigurationError
+from ripley.externals.calnet import _connection_factory, Client, get_calnet_user_for_uid
+from ripley.externals.fake_calnet import FakeConnection, FakeDirectory, generate_entries
+from ripley.models.user import User
+from tests.util import override_config
+
+
+def _client(count=0, latency=0, **kwargs):
+    directory = FakeDirectory(latency=latency)
+    for entry in generate_entries(count):
+        directory.add_entry(entry)
+    return Client(directory.connection, **kwargs)
+
+
+class TestCalnet:
+
+    def test_get_calnet_user_for_uid(self, app):
+        profile = get_calnet_user_for_uid('61889')
+        assert profile['csid'] == '11667051'
+        assert profile['email'] == 'lambert@berkeley.edu'
+        assert profile['isExpiredPerLdap'] is False
+        assert profile['name'] == 'Joan Lambert'
+
+    def test_expired_user(self, app):
+        profile = get_calnet_user_for_uid('8675309')
+        assert profile['isExpiredPerLdap'] is True
+        assert profile['name'] == 'Ellen Louise Ripley'
+
+    def test_unknown_user(self, app):
+        assert get_calnet_user_for_uid('999999999') is None
+
+    def test_no_stand_in_outside_test_and_demo(self, app):
+        with override_config(app, 'TESTING', False), override_config(app, 'RIPLEY_ENV', 'production'):
+            with pytest.raises(ConfigurationError, match='LDAP_HOST'):
+                _connection_factory(app)
+
+    def test_failed_bind_raises(self):
+        class _RefusedConnection(FakeConnection):
+            def bind(self):
+                return False
+        client = Client(lambda: _RefusedConnection(FakeDirectory()))
+        with pytest.raises(LDAPBindError):
+            client.get_users(['2040'])
+        assert client.pool._created == 0
+
+    def test_chunked_or_filter_searches(self):
+        client = _client(count=1200, batch_size=500)
+        uids = [str(uid) for uid in range(10000000, 10001200)]
+        profiles = client.get_users(uids)
+        assert len(profiles) == 1200
+        assert profiles['10000042']['email'] == 'student10000042@berkeley.edu'
+        # Three chunks of current people; no expired-people search is needed when everyone is found.
+        assert client.search_count == 3
+
+    def test_pooled_connections(self):
+        client = _client(count=10, pool_size=2)
+        for uid in range(10000000, 10000010):
+            client.get_users([uid])
+        assert client.pool._created == 1
+
+    def test_concurrent_lookups_are_coalesced(self):
+        client = _client(count=1, latency=0.2, pool_size=4)
+        results = []
+
+        def _lookup():
+            results.append(client.get_users(['10000000']))
+        threads = [threading.Thread(target=_lookup) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 4
+        assert all(r['10000000']['uid'] == '10000000' for r in results)
+        assert client.search_count == 1
+
+
+class TestLoadUsers:
+
+    def test_load_users(self, app):
+        users = User.load_users(['2040', '1022796', 61889])
+        assert [u.uid for u in users] == ['2040', '1022796', '61889']
+        assert users[0].name == 'Arthur Dallas'
+        assert users[0].email_address == 'dallas@berkeley.edu'
+        assert users[1].name == 'Gilbert Kane'
+
+    def test_load_users_normalizes_uids(self, app):
+        users = User.load_users(['02040', 1022796, 'not-a-uid'])
+        assert [u.uid for u in users] == ['2040', '1022796']
+        assert users[0].name == 'Arthur Dallas'
+
+    def test_load_users_uses_cache(self, app):
+        User.load_users(['2040', '1022796'])
+        client = app.extensions['calnet']
+        search_count = client.search_count
+        User.load_users(['2040', '1022796'])
+        assert client.search_count == search_count
+
+    def test_failed_lookup_is_not_cached(self, app, monkeypatch):
+        def _outage(self, uids):
+            raise LDAPSocketReceiveError('Connection reset by peer')
+        app.extensions['user_cache'].clear()
+        with monkeypatch.context() as m:
+            m.setattr(Client, 'get_users', _outage)
+            with pytest.raises(LDAPSocketReceiveError):
+                User.load_users(['2040'])
+            with pytest.raises(LDAPSocketReceiveError):
+                User.load_user('2040')
+        assert User.load_user('2040')['isExpiredPerLdap'] is False
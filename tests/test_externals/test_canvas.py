@@ -0,0 +1,119 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from contextlib import contextmanager
+
+import pytest
+from ripley.configs import ConfigurationError
+from ripley.externals.canvas import _start_fake_canvas, CanvasApiError, Client, get_course, get_course_users, RateLimiter
+from ripley.externals.fake_canvas import FakeCanvas, FakeCanvasServer, generate_course
+from tests.util import override_config
+
+
+@contextmanager
+def _client(courses=(), canvas=None, **kwargs):
+    canvas = canvas or FakeCanvas()
+    for course_id, user_count in courses:
+        canvas.add_course(**generate_course(course_id, user_count))
+    with FakeCanvasServer(canvas) as server:
+        client = Client(server.url, 'a token', **kwargs)
+        try:
+            yield client, canvas
+        finally:
+            client.close()
+
+
+class TestCanvas:
+
+    def test_fixtures(self, app):
+        assert get_course(1010101)['name'] == 'Stellar Dynamics and Galactic Structure'
+        assert [u['login_id'] for u in get_course_users(1010101)] == ['2040', '1022796']
+        assert [u['login_id'] for u in get_course_users(1010101, enrollment_types=['teacher'])] == ['2040']
+
+    def test_no_stand_in_outside_test_and_demo(self, app):
+        with override_config(app, 'TESTING', False), override_config(app, 'RIPLEY_ENV', 'production'):
+            with pytest.raises(ConfigurationError, match='CANVAS_API_URL'):
+                _start_fake_canvas(app)
+
+    def test_pages_stream(self):
+        with _client(courses=[(1000001, 250)], per_page=100) as (client, canvas):
+            users = client.paginate('/api/v1/courses/1000001/users')
+            assert canvas.request_count == 0
+            first_page = [next(users) for _ in range(100)]
+            assert canvas.request_count == 1
+            rest = list(users)
+            assert canvas.request_count == 3
+            assert len({u['id'] for u in first_page + rest}) == 250
+
+    def test_not_found(self):
+        with _client() as (client, canvas):
+            with pytest.raises(CanvasApiError) as e:
+                client.get('/api/v1/courses/404')
+            assert e.value.status_code == 404
+
+    def test_fan_out(self, app):
+        course_ids = list(range(1000001, 1000021))
+        with _client(courses=[(course_id, 30) for course_id in course_ids], pool_size=4, per_page=10) as (client, canvas):
+            def _roster(course_id):
+                if course_id == 1000020:
+                    raise ValueError('Game over, man')
+                return len(list(client.paginate(f'/api/v1/courses/{course_id}/users')))
+            results = dict(client.fan_out(_roster, course_ids, return_exceptions=True))
+            assert isinstance(results.pop(1000020), ValueError)
+            assert set(results.values()) == {30}
+            assert canvas.request_count == 19 * 3
+            with pytest.raises(ValueError):
+                dict(client.fan_out(_roster, course_ids))
+
+    def test_throttled_requests_are_retried(self, app):
+        canvas = FakeCanvas(bucket_size=50, leak_rate=2000, request_cost=10)
+        with _client(canvas=canvas, courses=[(1000001, 100)], pool_size=4, per_page=5) as (client, canvas):
+            client.rate_limiter = RateLimiter(threshold=25, initial_backoff=0.01, max_delay=0.2)
+            results = dict(client.fan_out(lambda _: len(list(client.paginate('/api/v1/courses/1000001/users'))), range(4)))
+            assert set(results.values()) == {100}
+            assert canvas.throttled_count
+            assert canvas.request_count - canvas.throttled_count == 4 * 20
+
+
+class TestRateLimiter:
+
+    def test_pacing(self):
+        limiter = RateLimiter(threshold=200, max_delay=10)
+        assert limiter.delay() == 0
+        limiter.update('600.0')
+        assert limiter.delay() == 0
+        limiter.update('100.0')
+        assert limiter.delay() == 2.5
+        limiter.update('0')
+        assert limiter.delay() == 10
+
+    def test_backoff(self):
+        limiter = RateLimiter(initial_backoff=0.5, max_delay=3)
+        assert [limiter.throttled() for _ in range(4)] == [0.5, 1, 2, 3]
+        limiter.succeeded()
+        assert limiter.delay() == 1.5
+        for _ in range(3):
+            limiter.succeeded()
+        assert limiter.delay() == 0
@@ -0,0 +1,86 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from email.message import EmailMessage
+import smtplib
+import threading
+
+import pytest
+from ripley.configs import ConfigurationError
+from ripley.externals.fake_smtp import SmtpSink
+from ripley.externals.smtp import _start_smtp_sink, SmtpPool
+from tests.util import override_config
+
+
+def _message():
+    message = EmailMessage()
+    message['From'] = 'no-reply@berkeley.edu'
+    message['To'] = 'ripley@berkeley.edu'
+    message['Subject'] = 'Nostromo'
+    message.set_content('Final report of the commercial starship Nostromo.')
+    return message
+
+
+class TestSmtpPool:
+
+    def test_failed_reset_releases_connection(self):
+        errors = []
+
+        def _send_after_dropped_session(pool):
+            # Pool threads have no app context.
+            try:
+                with pool.connection() as connection:
+                    connection.close()
+                    raise smtplib.SMTPDataError(554, b'Transaction failed')
+            except Exception as e:
+                errors.append(e)
+
+        with SmtpSink() as sink:
+            pool = SmtpPool(sink.host, sink.port, size=1, timeout=1)
+            for _ in range(2):
+                thread = threading.Thread(target=_send_after_dropped_session, args=(pool,))
+                thread.start()
+                thread.join()
+            # The original error surfaces, and the connection is no longer counted against the pool.
+            assert [type(e) for e in errors] == [smtplib.SMTPDataError, smtplib.SMTPDataError]
+            assert pool._created == 0
+            pool.send(_message())
+            pool.close()
+        assert len(sink.messages) == 1
+
+    def test_reset_after_refusal_reuses_connection(self):
+        with SmtpSink() as sink:
+            pool = SmtpPool(sink.host, sink.port, size=1, timeout=1)
+            with pytest.raises(smtplib.SMTPSenderRefused):
+                with pool.connection():
+                    raise smtplib.SMTPSenderRefused(550, b'No', 'no-reply@berkeley.edu')
+            pool.send(_message())
+            assert sink.session_count == 1
+            pool.close()
+
+    def test_no_sink_outside_test_and_demo(self, app):
+        with override_config(app, 'TESTING', False), override_config(app, 'RIPLEY_ENV', 'production'):
+            with pytest.raises(ConfigurationError, match='SMTP_HOST'):
+                _start_smtp_sink(app)
@@ -0,0 +1,114 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from ripley import db
+from ripley.jobs.job_queue import claim_job, enqueue, fail_job, requeue_stale_jobs, schedule_due_jobs
+from ripley.lib.util import utc_now
+from sqlalchemy import text
+
+CLAIM_SQL = """SELECT id FROM jobs WHERE status = 'queued' AND job_key LIKE 'skip_locked_%'
+    ORDER BY id LIMIT 1 FOR UPDATE SKIP LOCKED"""
+
+
+def _job(job_id):
+    return db.session.execute(text('SELECT * FROM jobs WHERE id = :id'), {'id': job_id}).mappings().first()
+
+
+class TestJobQueue:
+
+    def test_one_active_instance_per_job(self, app, db_session):
+        job_id = enqueue('roster_sync', args={'term': '2023-B'})
+        assert job_id
+        assert enqueue('roster_sync') is None
+        job = claim_job('worker-1')
+        assert job['id'] == job_id
+        assert job['args'] == {'term': '2023-B'}
+        assert job['attempts'] == 1
+        assert claim_job('worker-2') is None
+        # Running counts as active, too.
+        assert enqueue('roster_sync') is None
+
+    def test_retry_with_backoff(self, app, db_session):
+        enqueue('roster_sync', max_attempts=2)
+        job = claim_job('worker-1')
+        assert fail_job(job, 'worker-1', utc_now(), 'ValueError: Boom') is True
+        queued = _job(job['id'])
+        assert queued['status'] == 'queued'
+        assert queued['last_error'] == 'ValueError: Boom'
+        backoff = db.session.execute(
+            text('SELECT EXTRACT(EPOCH FROM run_after - now()) FROM jobs WHERE id = :id'),
+            {'id': job['id']},
+        ).scalar()
+        assert backoff == app.config['JOB_RETRY_BACKOFF']
+        # Not due yet.
+        assert claim_job('worker-1') is None
+
+        db.session.execute(text('UPDATE jobs SET run_after = now() WHERE id = :id'), {'id': job['id']})
+        job = claim_job('worker-1')
+        assert job['attempts'] == 2
+        assert fail_job(job, 'worker-1', utc_now(), 'ValueError: Boom') is False
+        assert _job(job['id']) is None
+        history = db.session.execute(
+            text('SELECT status, attempt FROM job_history WHERE job_id = :id ORDER BY attempt'),
+            {'id': job['id']},
+        ).all()
+        assert [tuple(row) for row in history] == [('failed', 1), ('failed', 2)]
+
+    def test_requeue_stale_jobs(self, app, db_session):
+        job_id = enqueue('roster_sync')
+        claim_job('worker-1')
+        assert requeue_stale_jobs() == 0
+        db.session.execute(text("UPDATE jobs SET locked_at = now() - interval '1 day' WHERE id = :id"), {'id': job_id})
+        assert requeue_stale_jobs() == 1
+        assert _job(job_id)['status'] == 'queued'
+
+    def test_schedule_due_jobs(self, app, db_session):
+        app.config['JOB_SCHEDULE'] = {'roster_sync': 3600}
+        try:
+            assert schedule_due_jobs() == ['roster_sync']
+            assert schedule_due_jobs() == []
+            db.session.execute(text("DELETE FROM jobs WHERE job_key = 'roster_sync'"))
+            db.session.execute(
+                text("""INSERT INTO job_history (job_key, attempt, status, started_at, finished_at, duration_ms)
+                    VALUES ('roster_sync', 1, 'succeeded', now() - interval '10 minutes', now(), 1000)"""),
+            )
+            assert schedule_due_jobs() == []
+        finally:
+            app.config['JOB_SCHEDULE'] = {}
+
+    def test_skip_locked(self, app, db):
+        with db.engine.begin() as setup:
+            setup.execute(text("""INSERT INTO jobs (job_key, max_attempts, run_after, created_at, updated_at)
+                VALUES ('skip_locked_a', 1, now(), now(), now()), ('skip_locked_b', 1, now(), now(), now())"""))
+        try:
+            with db.engine.connect() as first, db.engine.connect() as second:
+                with first.begin(), second.begin():
+                    first_claim = first.execute(text(CLAIM_SQL)).scalar()
+                    second_claim = second.execute(text(CLAIM_SQL)).scalar()
+                    assert first_claim and second_claim
+                    assert first_claim != second_claim
+        finally:
+            with db.engine.begin() as teardown:
+                teardown.execute(text("DELETE FROM jobs WHERE job_key LIKE 'skip_locked_%'"))
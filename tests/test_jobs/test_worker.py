@@ -0,0 +1,76 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from ripley import db
+from ripley.jobs.job_queue import enqueue, get_job_history
+from ripley.jobs.registry import JOBS
+from ripley.jobs.worker import Worker
+from ripley.models.mailing_list import MailingList
+from sqlalchemy import text
+
+
+class TestWorker:
+
+    def test_run_pending(self, app, db_session):
+        calls = []
+        JOBS['test_succeeds'] = lambda **kwargs: calls.append(kwargs) or {'synced': 3}
+        JOBS['test_fails'] = lambda: 1 / 0
+        try:
+            enqueue('test_succeeds', args={'term': '2023-B'})
+            enqueue('test_fails', max_attempts=1)
+            enqueue('test_unregistered', max_attempts=3)
+            assert Worker(app).run_pending() == 3
+            assert calls == [{'term': '2023-B'}]
+            assert db.session.execute(text("SELECT COUNT(*) FROM jobs WHERE job_key LIKE 'test_%'")).scalar() == 0
+
+            history = {h['job_key']: h for h in get_job_history()}
+            assert history['test_succeeds']['status'] == 'succeeded'
+            assert history['test_succeeds']['details'] == '{"synced": 3}'
+            assert history['test_succeeds']['duration_ms'] >= 0
+            assert history['test_fails']['status'] == 'failed'
+            assert history['test_fails']['details'] == 'ZeroDivisionError: division by zero'
+            assert history['test_unregistered']['details'] == "LookupError: No job registered as 'test_unregistered'"
+        finally:
+            JOBS.pop('test_succeeds')
+            JOBS.pop('test_fails')
+
+    def test_failed_job_is_rolled_back(self, app, db_session):
+        def _writes_then_fails():
+            MailingList.create(canvas_site_id=8675309)
+            db.session.execute(text('SELECT 1 / 0'))
+        JOBS['test_writes_then_fails'] = _writes_then_fails
+        JOBS['test_succeeds'] = lambda: {'synced': 1}
+        try:
+            enqueue('test_writes_then_fails', max_attempts=1)
+            enqueue('test_succeeds')
+            assert Worker(app).run_pending() == 2
+            assert MailingList.find_by_canvas_site_id(8675309) is None
+            history = {h['job_key']: h for h in get_job_history()}
+            assert history['test_writes_then_fails']['status'] == 'failed'
+            assert history['test_writes_then_fails']['details'].startswith('DataError')
+            assert history['test_succeeds']['status'] == 'succeeded'
+        finally:
+            JOBS.pop('test_writes_then_fails')
+            JOBS.pop('test_succeeds')
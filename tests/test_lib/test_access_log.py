@@ -0,0 +1,101 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import json
+import logging
+
+import pytest
+from ripley.lib.access_log import latency_report
+from ripley.logger import ACCESS_LOGGER_NAME
+from tests.util import override_config
+
+
+@pytest.fixture()
+def access_log():
+    records = []
+
+    class _Handler(logging.Handler):
+        def emit(self, record):
+            records.append(json.loads(record.getMessage()))
+    handler = _Handler()
+    logger = logging.getLogger(ACCESS_LOGGER_NAME)
+    logger.addHandler(handler)
+    yield records
+    logger.removeHandler(handler)
+
+
+class TestAccessLog:
+
+    def test_api_request_record(self, app, client, access_log):
+        with override_config(app, 'ACCESS_LOG_SAMPLE_RATE', 1):
+            response = client.get('/api/config', headers={'X-Request-Id': 'lti-launch-42'})
+        assert response.headers['X-Request-Id'] == 'lti-launch-42'
+        assert len(access_log) == 1
+        record = access_log[0]
+        assert record['requestId'] == 'lti-launch-42'
+        assert record['route'] == '/api/config'
+        assert record['status'] == 200
+        assert record['durationMs'] >= 0
+        assert record['responseBytes'] == len(response.data)
+        assert record['uid'] is None
+
+    def test_generated_request_id(self, client, access_log):
+        response = client.get('/api/nonexistent', headers={'X-Request-Id': 'bad id with spaces'})
+        request_id = response.headers['X-Request-Id']
+        assert len(request_id) == 32
+        assert access_log[-1]['requestId'] == request_id
+
+    def test_sampling(self, app, client, access_log):
+        with override_config(app, 'ACCESS_LOG_SAMPLE_RATE', 0):
+            client.get('/api/config')
+            client.get('/api/nonexistent')
+        assert [r['status'] for r in access_log] == [404]
+        assert access_log[0]['sampleRate'] == 1
+
+    def test_front_end_routes_are_not_logged(self, app, client, access_log):
+        with override_config(app, 'ACCESS_LOG_SAMPLE_RATE', 1):
+            client.get('/some/deep/link')
+        assert access_log == []
+
+
+class TestLatencyReport:
+
+    def test_percentiles(self):
+        lines = [json.dumps({'durationMs': d, 'method': 'GET', 'route': '/api/config', 'sampleRate': 1, 'status': 200}) for d in range(1, 101)]
+        lines.append(json.dumps({'durationMs': 500, 'method': 'GET', 'route': '/api/version', 'sampleRate': 1, 'status': 500}))
+        lines.append('Not JSON')
+        rows = latency_report(lines)
+        assert [r['route'] for r in rows] == ['/api/version', '/api/config']
+        config_row = rows[1]
+        assert config_row['count'] == 100
+        assert (config_row['p50'], config_row['p95'], config_row['p99'], config_row['max']) == (50, 95, 99, 100)
+        assert rows[0]['errors'] == 1
+
+    def test_sampled_records_are_weighted(self):
+        lines = [json.dumps({'durationMs': 10, 'method': 'GET', 'route': '/api/config', 'sampleRate': 0.1, 'status': 200})] * 9
+        lines.append(json.dumps({'durationMs': 900, 'method': 'GET', 'route': '/api/config', 'sampleRate': 1, 'status': 404}))
+        row = latency_report(lines)[0]
+        assert row['count'] == 91
+        assert row['p95'] == 10
+        assert row['max'] == 900
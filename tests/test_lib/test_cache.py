@@ -0,0 +1,252 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import os
+import stat
+import threading
+import time
+
+import pytest
+from ripley.configs import ConfigurationError
+from ripley.externals.fake_redis import FakeRedisServer
+from ripley.lib.cache import Cache, cache_stats, create_backend, FileSystemBackend, LRUCache, memoize, RedisBackend
+from ripley.lib.metrics import registry
+from tests.util import override_config
+
+
+@pytest.fixture(scope='module')
+def redis_server():
+    with FakeRedisServer() as server:
+        yield server
+
+
+@pytest.fixture(params=['memory', 'filesystem', 'redis'])
+def backend(request, tmp_path, redis_server):
+    if request.param == 'memory':
+        return LRUCache()
+    if request.param == 'filesystem':
+        return FileSystemBackend(str(tmp_path / 'cache'))
+    backend = RedisBackend(f'redis://{redis_server.host}:{redis_server.port}/0', key_prefix='test:')
+    backend.clear()
+    return backend
+
+
+class _BrokenBackend:
+
+    def get(self, key):
+        raise ConnectionError('Connection refused')
+
+    def set(self, key, value, ttl=None):  # noqa: A003
+        raise ConnectionError('Connection refused')
+
+
+class TestBackends:
+
+    def test_get_set_delete(self, backend):
+        assert backend.get('canvas:1') is None
+        backend.set('canvas:1', {'name': 'Stellar Dynamics'}, 60)
+        backend.set('canvas:2', None, 60)
+        assert backend.get('canvas:1') == {'name': 'Stellar Dynamics'}
+        assert backend.delete('canvas:1')
+        assert backend.get('canvas:1') is None
+        assert not backend.delete('canvas:1')
+
+    def test_delete_prefix(self, backend):
+        for key in ['canvas:1', 'canvas:2', 'canvas_sections:1', 'ldap:[2040]']:
+            backend.set(key, key, 60)
+        assert backend.delete_prefix('canvas:') == 2
+        assert backend.get('canvas:1') is None
+        assert backend.get('canvas_sections:1') == 'canvas_sections:1'
+        assert backend.delete_prefix('ldap:[') == 1
+        assert backend.get('ldap:[2040]') is None
+
+    def test_expiry(self, backend):
+        backend.set('canvas:1', 'soon gone', 1)
+        backend.set('canvas:2', 'forever', None)
+        time.sleep(1.1)
+        assert backend.get('canvas:1') is None
+        assert backend.get('canvas:2') == 'forever'
+
+
+class TestCache:
+
+    def test_get_or_load(self):
+        cache = Cache(LRUCache(), default_ttl=60)
+        calls = []
+        for _ in range(3):
+            assert cache.get_or_load('ldap', '2040', lambda: calls.append(1) or 'Ellen Ripley') == 'Ellen Ripley'
+        assert len(calls) == 1
+        stats = cache.stats()['ldap']
+        assert stats['hits'] == 2
+        assert stats['misses'] == 1
+        assert stats['loads'] == 1
+        assert stats['hitRatio'] == 0.6667
+
+    def test_errors_are_not_cached(self):
+        cache = Cache(LRUCache(), default_ttl=60)
+
+        def _fail():
+            raise ValueError('Canvas is down')
+        with pytest.raises(ValueError):
+            cache.get_or_load('canvas', '1', _fail)
+        assert cache.get_or_load('canvas', '1', lambda: 'up') == 'up'
+
+    def test_single_flight(self):
+        cache = Cache(LRUCache(), default_ttl=60)
+        calls = []
+        barrier = threading.Barrier(8)
+
+        def _slow_load():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'Stellar Dynamics'
+
+        def _lookup(_):
+            barrier.wait()
+            return cache.get_or_load('canvas', '1010101', _slow_load)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            assert set(executor.map(_lookup, range(8))) == {'Stellar Dynamics'}
+        assert len(calls) == 1
+        assert cache.stats()['canvas']['coalesced'] == 7
+
+    def test_early_recompute(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr('ripley.lib.cache.time.time', lambda: now[0])
+        monkeypatch.setattr('ripley.lib.cache.random.random', lambda: 0.5)
+        cache = Cache(LRUCache(), default_ttl=60)
+        cache.get_or_load('canvas', '1', lambda: time.sleep(0.01) or 'old')
+        # Far from expiry, a hit. Near it, a recompute, more likely the costlier the load.
+        now[0] += 50
+        assert cache.get_or_load('canvas', '1', lambda: 'new') == 'old'
+        now[0] += 9.999
+        assert cache.get_or_load('canvas', '1', lambda: 'new') == 'new'
+        assert cache.stats()['canvas']['earlyRecomputes'] == 1
+
+    def test_backend_errors_are_misses(self):
+        cache = Cache(_BrokenBackend(), default_ttl=60)
+        assert cache.get_or_load('canvas', '1', lambda: 'loaded') == 'loaded'
+        assert cache.stats()['canvas']['errors'] == 2
+
+    def test_ttls(self):
+        backend = LRUCache()
+        cache = Cache(backend, default_ttl=60, ttls={'ldap': 3600})
+        cache.set('canvas', '1', 'a')
+        cache.set('ldap', '2040', 'b', ttl=5)
+        assert 59 < backend.get('canvas:1')[1] - time.time() <= 60
+        assert 3599 < backend.get('ldap:2040')[1] - time.time() <= 3600
+
+
+class TestMemoize:
+
+    def test_memoize(self, app):
+        calls = []
+
+        @memoize(namespace='test_memoize')
+        def get_profile(uid, include_email=False):
+            calls.append(uid)
+            return {'uid': uid, 'email': 'ripley@berkeley.edu' if include_email else None}
+        assert get_profile('2040') == get_profile('2040')
+        assert get_profile('2040', include_email=True)['email']
+        assert calls == ['2040', '2040']
+        get_profile.invalidate('2040')
+        get_profile('2040')
+        assert len(calls) == 3
+        get_profile.invalidate_all()
+        get_profile('2040', include_email=True)
+        assert len(calls) == 4
+        stats = cache_stats()['test_memoize']
+        assert stats['hits'] == 1
+        assert stats['invalidations'] == 2
+
+    def test_custom_key(self, app):
+        calls = []
+
+        @memoize(namespace='test_custom_key', key=lambda course: course['id'])
+        def get_course_name(course):
+            calls.append(course['id'])
+            return course['name']
+        get_course_name({'id': 1, 'name': 'Stellar Dynamics'})
+        assert get_course_name({'id': 1, 'name': 'ignored'}) == 'Stellar Dynamics'
+        assert calls == [1]
+
+    def test_without_app_context(self):
+        calls = []
+
+        @memoize()
+        def get_term():
+            calls.append(1)
+            return 'Fall 2026'
+        # Threads do not inherit the app context.
+        thread = threading.Thread(target=lambda: get_term() and get_term())
+        thread.start()
+        thread.join()
+        assert len(calls) == 2
+
+    def test_metrics(self, app):
+
+        @memoize(namespace='test_metrics')
+        def get_term():
+            return 'Fall 2026'
+        get_term()
+        get_term()
+        text = registry.render()
+        assert 'ripley_cache_hits_total{cache="test_metrics"} 1' in text
+        assert 'ripley_cache_misses_total{cache="test_metrics"} 1' in text
+        assert 'ripley_cache_load_seconds_count{cache="test_metrics"} 1' in text
+
+
+class TestCreateBackend:
+
+    def test_redis_stand_in(self, app):
+        with override_config(app, 'CACHE_BACKEND', 'redis'):
+            backend = create_backend(app)
+        backend.set('canvas:1', 'Stellar Dynamics', 60)
+        assert backend.get('canvas:1') == 'Stellar Dynamics'
+        assert backend.client.exists('ripley:canvas:1')
+
+    def test_no_redis_stand_in_outside_test_and_demo(self, app):
+        with override_config(app, 'CACHE_BACKEND', 'redis'), override_config(app, 'TESTING', False):
+            with override_config(app, 'RIPLEY_ENV', 'production'):
+                with pytest.raises(ConfigurationError, match='CACHE_REDIS_URL'):
+                    create_backend(app)
+
+    def test_filesystem_requires_directory(self, app):
+        with override_config(app, 'CACHE_BACKEND', 'filesystem'), override_config(app, 'CACHE_DIR', None):
+            with pytest.raises(ConfigurationError, match='CACHE_DIR'):
+                create_backend(app)
+
+    def test_filesystem_refuses_symlink(self, tmp_path):
+        (tmp_path / 'elsewhere').mkdir()
+        os.symlink(tmp_path / 'elsewhere', tmp_path / 'cache')
+        with pytest.raises(NotADirectoryError):
+            FileSystemBackend(str(tmp_path / 'cache'))
+
+    def test_filesystem(self, app, tmp_path):
+        with override_config(app, 'CACHE_BACKEND', 'filesystem'), override_config(app, 'CACHE_DIR', str(tmp_path)):
+            backend = create_backend(app)
+        assert isinstance(backend, FileSystemBackend)
+        assert backend.directory == str(tmp_path)
+        assert stat.S_IMODE(os.stat(tmp_path).st_mode) == 0o700
@@ -0,0 +1,109 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import gzip
+import os
+
+import pytest
+from ripley.lib.front_end import FrontEndShell
+from tests.util import override_config
+
+
+class TestFrontEndShell:
+
+    def test_identity(self, client):
+        response = client.get('/some/deep/link', headers={'Accept-Encoding': 'identity'})
+        assert response.status_code == 200
+        assert response.content_encoding is None
+        assert response.data == b'I am a Vue.js page.\n'
+        assert response.headers['Cache-Control'] == 'no-cache'
+        assert response.headers['Vary'] == 'Accept-Encoding'
+
+    def test_gzip(self, client):
+        response = client.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.content_encoding == 'gzip'
+        assert gzip.decompress(response.data) == b'I am a Vue.js page.\n'
+
+    def test_brotli(self, client):
+        brotli = pytest.importorskip('brotli')
+        response = client.get('/', headers={'Accept-Encoding': 'gzip, deflate, br'})
+        assert response.content_encoding == 'br'
+        assert brotli.decompress(response.data) == b'I am a Vue.js page.\n'
+
+    def test_conditional_get(self, client):
+        etag = client.get('/', headers={'Accept-Encoding': 'gzip'}).headers['ETag']
+        response = client.get('/other/route', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+        # A client that cannot decode gzip does not match the gzip variant.
+        response = client.get('/other/route', headers={'Accept-Encoding': 'identity', 'If-None-Match': etag})
+        assert response.status_code == 200
+
+    def test_lti_launch_post(self, client):
+        response = client.post('/canvas/launch', headers={'Accept-Encoding': 'identity'})
+        assert response.status_code == 200
+        assert response.data == b'I am a Vue.js page.\n'
+
+    def test_reload_if_changed(self, tmp_path):
+        path = tmp_path / 'index.html'
+        path.write_text('<p>v1</p>')
+        shell = FrontEndShell(str(path))
+        etag = shell.etag
+        assert shell.reload_if_changed() is False
+        path.write_text('<p>v2</p>')
+        os.utime(path, (shell.mtime + 5, shell.mtime + 5))
+        assert shell.reload_if_changed() is True
+        assert shell.etag != etag
+        assert gzip.decompress(shell.variants['gzip'][0]) == b'<p>v2</p>'
+
+
+class TestStaticAssets:
+
+    def test_immutable(self, app, client, tmp_path):
+        (tmp_path / 'assets').mkdir()
+        (tmp_path / 'assets' / 'index-3f9a1c07.js').write_text('console.log("Ripley")')
+        with override_config(app, 'STATIC_FOLDER', str(tmp_path)):
+            response = client.get('/static/assets/index-3f9a1c07.js')
+            assert response.status_code == 200
+            assert response.data == b'console.log("Ripley")'
+            cache_control = response.headers['Cache-Control']
+            assert 'immutable' in cache_control
+            assert 'max-age=31536000' in cache_control
+            response.close()
+
+    def test_unhashed_files_are_revalidated(self, app, client, tmp_path):
+        (tmp_path / 'favicon.ico').write_bytes(b'\x00\x00\x01\x00')
+        (tmp_path / 'vuetify-settings.js').write_text('export default {}')
+        with override_config(app, 'STATIC_FOLDER', str(tmp_path)):
+            for path in ['/static/favicon.ico', '/static/vuetify-settings.js']:
+                response = client.get(path)
+                assert response.status_code == 200
+                cache_control = response.headers['Cache-Control']
+                assert 'no-cache' in cache_control
+                assert 'immutable' not in cache_control
+                etag = response.headers['ETag']
+                response.close()
+                response = client.get(path, headers={'If-None-Match': etag})
+                assert response.status_code == 304
+                response.close()
@@ -0,0 +1,98 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from datetime import datetime
+from decimal import Decimal
+import json
+import math
+
+import pytest
+from ripley.lib import http
+from ripley.lib.http import tolerant_json_dumps, tolerant_jsonify_stream
+
+
+@pytest.fixture(params=['orjson', 'simplejson'])
+def encoder(request, monkeypatch):
+    if request.param == 'orjson' and not http.orjson:
+        pytest.skip('orjson is not installed')
+    if request.param == 'simplejson':
+        monkeypatch.setattr(http, 'orjson', None)
+    return request.param
+
+
+def _rows(count):
+    for i in range(count):
+        yield {'id': i, 'emailAddress': f'student-{i}@berkeley.edu', 'score': math.nan if i % 7 == 0 else i / 3}
+
+
+def _content(response):
+    return b''.join(response.response)
+
+
+class TestTolerantJsonifyStream:
+
+    def test_generator_as_array(self, app, encoder):
+        with app.test_request_context():
+            response = tolerant_jsonify_stream(_rows(1234))
+            assert response.is_streamed
+            assert response.mimetype == 'application/json'
+            assert 'Content-Length' not in response.headers
+            content = _content(response)
+        # Same document as tolerant_jsonify, whichever encoder.
+        assert json.loads(content) == json.loads(tolerant_json_dumps(list(_rows(1234))))
+        assert b' ' not in content
+        assert b'NaN' not in content
+
+    def test_chunks(self, app, encoder, monkeypatch):
+        monkeypatch.setattr(http, 'STREAM_BATCH_SIZE', 10)
+        with app.test_request_context():
+            chunks = list(tolerant_jsonify_stream(_rows(2000)).response)
+        assert len(chunks) > 1
+        assert all(len(chunk) >= http.STREAM_CHUNK_SIZE for chunk in chunks[:-1])
+
+    def test_empty(self, app, encoder):
+        with app.test_request_context():
+            assert _content(tolerant_jsonify_stream(iter([]))) == b'[]'
+            assert _content(tolerant_jsonify_stream([], ndjson=True)) == b''
+
+    def test_ndjson(self, app, encoder):
+        with app.test_request_context():
+            response = tolerant_jsonify_stream(_rows(3), ndjson=True)
+            assert response.mimetype == 'application/x-ndjson'
+            lines = _content(response).decode().splitlines()
+        assert [json.loads(line)['id'] for line in lines] == [0, 1, 2]
+        assert json.loads(lines[0])['score'] is None
+
+    def test_dict_with_generators(self, app, encoder):
+        with app.test_request_context():
+            content = _content(tolerant_jsonify_stream({'members': _rows(3), 'total': math.inf, 'ids': (i for i in range(2))}))
+        assert json.loads(content) == {'ids': [0, 1], 'members': json.loads(tolerant_json_dumps(list(_rows(3)))), 'total': None}
+
+    def test_same_semantics_as_tolerant_jsonify(self, app, encoder):
+        with app.test_request_context():
+            content = _content(tolerant_jsonify_stream([{'price': Decimal('1.10'), 1: 'one'}]))
+            assert content == b'[{"price":1.10,"1":"one"}]'
+            with pytest.raises(TypeError):
+                _content(tolerant_jsonify_stream([{'at': datetime(2026, 8, 24)}]))
@@ -0,0 +1,157 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from contextlib import contextmanager
+import os
+import stat
+
+import pytest
+from ripley.externals.canvas import CanvasApiError, Client
+from ripley.externals.fake_canvas import FakeCanvas, FakeCanvasServer, generate_course
+from ripley.lib.http_cache import HttpCache
+
+
+@contextmanager
+def _cached_client(directory, user_count=250, **kwargs):
+    canvas = FakeCanvas()
+    canvas.add_course(**generate_course(1000001, user_count))
+    with FakeCanvasServer(canvas) as server:
+        http_cache = HttpCache(str(directory), **kwargs)
+        client = Client(server.url, 'a token', http_cache=http_cache, per_page=100)
+        try:
+            yield client, canvas, http_cache
+        finally:
+            client.close()
+
+
+class TestHttpCache:
+
+    def test_revalidate_with_etag(self, tmp_path):
+        with _cached_client(tmp_path) as (client, canvas, http_cache):
+            course = client.get('/api/v1/courses/1000001')
+            assert http_cache.stats()['stored'] == 1
+            assert client.get('/api/v1/courses/1000001') == course
+            assert canvas.request_count == 2
+            assert canvas.not_modified_count == 1
+            stats = http_cache.stats()
+            assert stats['revalidated'] == 1
+            assert stats['bytesSaved'] > 0
+
+    def test_pages(self, tmp_path):
+        with _cached_client(tmp_path) as (client, canvas, http_cache):
+            users = list(client.paginate('/api/v1/courses/1000001/users'))
+            # Each page is cached with its 'Link' header, so pagination follows from cached pages.
+            assert list(client.paginate('/api/v1/courses/1000001/users')) == users
+            assert len(users) == 250
+            assert canvas.not_modified_count == 3
+            assert http_cache.stats()['entries'] == 3
+
+    def test_changed_resource(self, tmp_path):
+        with _cached_client(tmp_path) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+            canvas.courses[1000001]['course']['name'] = 'Renamed'
+            assert client.get('/api/v1/courses/1000001')['name'] == 'Renamed'
+            assert canvas.not_modified_count == 0
+            assert client.get('/api/v1/courses/1000001')['name'] == 'Renamed'
+            assert canvas.not_modified_count == 1
+
+    def test_ttl_overrides(self, tmp_path):
+        with _cached_client(tmp_path, ttls={r'/courses/\d+$': 60}) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+            client.get('/api/v1/courses/1000001')
+            list(client.paginate('/api/v1/courses/1000001/sections'))
+            list(client.paginate('/api/v1/courses/1000001/sections'))
+            # The course is fresh for 60 seconds. Sections are revalidated.
+            assert canvas.request_count == 3
+            assert http_cache.stats()['requestsAvoided'] == 1
+
+    def test_size_cap(self, tmp_path):
+        with _cached_client(tmp_path, user_count=1000, max_bytes=6000) as (client, canvas, http_cache):
+            list(client.paginate('/api/v1/courses/1000001/users'))
+            stats = http_cache.stats()
+            assert stats['evictions'] > 0
+            assert stats['totalBytes'] <= 6000
+            assert len(os.listdir(tmp_path)) == stats['entries']
+            # Least recently used pages were evicted; the last page is still cached.
+            before = canvas.not_modified_count
+            client.get('/api/v1/courses/1000001/users?per_page=100&page=10')
+            assert canvas.not_modified_count == before + 1
+
+    def test_persists_across_processes(self, tmp_path):
+        with _cached_client(tmp_path) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+            restarted = Client(client.base_url, 'a token', http_cache=HttpCache(str(tmp_path)))
+            assert restarted.get('/api/v1/courses/1000001')['id'] == 1000001
+            assert canvas.not_modified_count == 1
+            assert restarted.http_cache.stats()['entries'] == 1
+            restarted.close()
+
+    def test_scoped_by_access_token(self, tmp_path):
+        with _cached_client(tmp_path) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+            other = Client(client.base_url, 'another token', http_cache=http_cache)
+            other.get('/api/v1/courses/1000001')
+            # No validators were sent on behalf of the other token: its request was a miss.
+            assert canvas.not_modified_count == 0
+            assert http_cache.stats()['entries'] == 2
+            other.close()
+
+    def test_private_directory_of_json_entries(self, tmp_path):
+        directory = tmp_path / 'canvas_http'
+        with _cached_client(directory) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+        assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+        (entry,) = os.listdir(directory)
+        with open(directory / entry, 'rb') as file:
+            assert file.readline().startswith(b'{')
+        # Anything that is not an entry of ours is dropped, never deserialized.
+        (directory / 'planted').write_bytes(b'\x80\x04\x95cos\nsystem\n')
+        assert HttpCache(str(directory)).stats()['entries'] == 0
+        HttpCache(str(directory))._lookup('x')
+        assert not (directory / 'planted').exists()
+
+    def test_corrupt_entry_is_removed(self, tmp_path):
+        with _cached_client(tmp_path, ttls={r'/courses/\d+$': 60}) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+            (entry,) = os.listdir(tmp_path)
+            with open(tmp_path / entry, 'r+b') as file:
+                file.readline()
+                file.write(b'not zlib')
+                file.truncate()
+            del canvas.courses[1000001]
+            with pytest.raises(CanvasApiError):
+                client.get('/api/v1/courses/1000001')
+            assert os.listdir(tmp_path) == []
+            assert http_cache.stats()['totalBytes'] == 0
+
+    def test_report(self, tmp_path):
+        with _cached_client(tmp_path) as (client, canvas, http_cache):
+            client.get('/api/v1/courses/1000001')
+            with http_cache.report('sync') as report:
+                client.get('/api/v1/courses/1000001')
+                client.get('/api/v1/courses/1000001')
+            assert report['revalidated'] == 2
+            assert report['stored'] == 0
+            assert report['bytesSaved'] > 0
@@ -0,0 +1,124 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from email import message_from_string
+from email.message import EmailMessage
+import io
+
+import pytest
+from ripley import db
+from ripley.lib.mailing_list_relay import get_membership_index, relay_message
+from ripley.lib.mailing_lists import populate_mailing_list
+from tests.util import create_mailing_list, override_config
+
+
+@pytest.fixture()
+def index(app):
+    index = get_membership_index()
+    index.invalidate()
+    return index
+
+
+def _message(body='Game over, man.', attachment=None):
+    message = EmailMessage()
+    message['From'] = 'ripley@berkeley.edu'
+    message['To'] = 'xeno-bio@bcourses-lists.berkeley.edu'
+    message['Subject'] = 'Section cancelled'
+    message.set_content(body)
+    if attachment:
+        message.add_attachment(attachment, maintype='application', subtype='octet-stream', filename='specimen.bin')
+    return io.BytesIO(message.as_bytes())
+
+
+class TestMailingListRelay:
+
+    def test_fan_out_in_batches(self, app, db_session, index, smtp_sink):
+        messages_before = len(smtp_sink.messages)
+        create_mailing_list(1357911, 250, sender='ripley@berkeley.edu')
+        summary = relay_message('xeno-bio@bcourses-lists.berkeley.edu', 'Ripley@Berkeley.edu', _message('.\n..Leading dots.'))
+        assert summary['status'] == 'delivered'
+        assert summary['batches'] == 3
+        assert summary['delivered'] == 250
+        assert summary['failed'] == summary['refused'] == 0
+
+        # One SMTP transaction per batch, not per recipient.
+        messages = smtp_sink.messages[messages_before:]
+        assert sorted(len(m['recipients']) for m in messages) == [50, 100, 100]
+        assert len({r for m in messages for r in m['recipients']}) == 250
+        assert {m['mailFrom'] for m in messages} == {'xeno-bio-bounces@bcourses-lists.berkeley.edu'}
+        relayed = message_from_string(messages[0]['data'])
+        assert relayed['List-Id'] == '<xeno-bio.bcourses-lists.berkeley.edu>'
+        assert relayed['Subject'] == 'Section cancelled'
+        assert relayed.get_payload().splitlines() == ['.', '..Leading dots.']
+
+    def test_large_attachment(self, app, db_session, index, smtp_sink):
+        messages_before = len(smtp_sink.messages)
+        create_mailing_list(1357911, 30, sender='ripley@berkeley.edu')
+        attachment = bytes(range(256)) * 4096
+        with override_config(app, 'RELAY_BATCH_SIZE', 10):
+            summary = relay_message('xeno-bio', 'ripley@berkeley.edu', _message(attachment=attachment))
+        assert summary['delivered'] == 30
+        for message in smtp_sink.messages[messages_before:]:
+            relayed = message_from_string(message['data'])
+            assert relayed.get_payload()[1].get_payload(decode=True) == attachment
+
+    def test_sender_not_allowed(self, app, db_session, index, smtp_sink):
+        messages_before = len(smtp_sink.messages)
+        create_mailing_list(1357911, 5, sender='ripley@berkeley.edu')
+        assert relay_message('xeno-bio', 'student-1@berkeley.edu', _message())['status'] == 'rejected'
+        assert relay_message('xeno-bio', 'burke@weyland-yutani.com', _message())['status'] == 'rejected'
+        assert relay_message('no-such-list', 'ripley@berkeley.edu', _message())['status'] == 'unknown_list'
+        assert len(smtp_sink.messages) == messages_before
+
+    def test_index_refreshed_on_change(self, app, db_session, index):
+        mailing_list = create_mailing_list(1357911, 3, sender='ripley@berkeley.edu')
+        loads_before = index.stats()['loads']
+        members = index.get('xeno-bio')
+        assert members.recipients == ('ripley@berkeley.edu', 'student-0@berkeley.edu', 'student-1@berkeley.edu')
+        assert members.can_send('ripley@berkeley.edu')
+        assert not members.can_send('student-0@berkeley.edu')
+        assert index.get('XENO-BIO') is members
+        assert index.stats()['loads'] - loads_before == 1
+
+        # Repopulation in this process invalidates the list.
+        populate_mailing_list(mailing_list.id, [
+            {'can_send': True, 'email_address': 'ripley@berkeley.edu'},
+            {'can_send': True, 'email_address': 'hicks@berkeley.edu'},
+        ])
+        members = index.get('xeno-bio')
+        assert members.recipients == ('hicks@berkeley.edu', 'ripley@berkeley.edu')
+        assert members.can_send('hicks@berkeley.edu')
+
+        # Changes made by another process are found by the periodic version check.
+        db.session.execute(
+            db.text("UPDATE canvas_site_mailing_list_members SET deleted_at = now() WHERE email_address = 'hicks@berkeley.edu'"),
+        )
+        db.session.execute(
+            db.text("UPDATE canvas_site_mailing_lists SET updated_at = updated_at + interval '1 second' WHERE id = :id"),
+            {'id': mailing_list.id},
+        )
+        assert index.get('xeno-bio') is members
+        index._checked_at -= index.check_interval
+        assert index.get('xeno-bio').recipients == ('ripley@berkeley.edu',)
@@ -0,0 +1,202 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from ripley import db
+from ripley.lib.mailing_lists import compute_membership_changes, get_canvas_site_roster, populate_mailing_list, \
+    roster_fingerprint, sync_mailing_lists
+from ripley.models.mailing_list import MailingList
+from ripley.models.mailing_list_members import MailingListMembers
+
+
+def _member(email_address, can_send=False, first_name='Ellen', last_name='Ripley'):
+    return {'can_send': can_send, 'email_address': email_address, 'first_name': first_name, 'last_name': last_name}
+
+
+def _members_by_email(mailing_list_id, include_deleted=False):
+    members = MailingListMembers.get_mailing_list_members(mailing_list_id, include_deleted=include_deleted)
+    return {m.email_address: m for m in members}
+
+
+class TestComputeMembershipChanges:
+
+    def test_diff(self):
+        existing = {
+            'ash@berkeley.edu': {**_member('ash@berkeley.edu'), 'deleted_at': None},
+            'bishop@berkeley.edu': {**_member('bishop@berkeley.edu'), 'deleted_at': '2022-01-01'},
+            'dallas@berkeley.edu': {**_member('dallas@berkeley.edu', can_send=True), 'deleted_at': None},
+            'kane@berkeley.edu': {**_member('kane@berkeley.edu'), 'deleted_at': None},
+        }
+        roster = [
+            _member(' ASH@berkeley.edu'),
+            _member('bishop@berkeley.edu'),
+            _member('dallas@berkeley.edu', can_send=False),
+            _member('hicks@berkeley.edu'),
+            _member('hicks@berkeley.edu', can_send=True),
+            _member(None),
+        ]
+        changes = compute_membership_changes(existing, roster)
+        assert changes.adds == [_member('hicks@berkeley.edu', can_send=True)]
+        assert [m['email_address'] for m in changes.restores] == ['bishop@berkeley.edu']
+        assert [m['email_address'] for m in changes.updates] == ['dallas@berkeley.edu']
+        assert changes.removes == ['kane@berkeley.edu']
+        assert changes.unchanged == 1
+        assert len(changes.invalid) == 1
+
+
+class TestPopulateMailingList:
+
+    def test_populate(self, app, db_session):
+        mailing_list = MailingList.create(canvas_site_id=1234567, list_name='nostromo-crew')
+        summary = populate_mailing_list(mailing_list.id, [
+            _member('ash@berkeley.edu'),
+            _member('dallas@berkeley.edu', can_send=True),
+            _member('kane@berkeley.edu'),
+        ])
+        assert summary['added'] == 3
+        assert summary['membersCount'] == 3
+        assert set(_members_by_email(mailing_list.id)) == {'ash@berkeley.edu', 'dallas@berkeley.edu', 'kane@berkeley.edu'}
+
+        summary = populate_mailing_list(mailing_list.id, [
+            _member('ash@berkeley.edu', first_name='Science Officer'),
+            _member('dallas@berkeley.edu', can_send=False),
+            _member('lambert@berkeley.edu'),
+        ])
+        assert summary['added'] == 1
+        assert summary['removed'] == 1
+        assert summary['updated'] == 2
+        members = _members_by_email(mailing_list.id)
+        assert set(members) == {'ash@berkeley.edu', 'dallas@berkeley.edu', 'lambert@berkeley.edu'}
+        assert members['ash@berkeley.edu'].first_name == 'Science Officer'
+        assert members['dallas@berkeley.edu'].can_send is False
+        assert _members_by_email(mailing_list.id, include_deleted=True)['kane@berkeley.edu'].deleted_at
+
+        summary = populate_mailing_list(mailing_list.id, [
+            _member('ash@berkeley.edu', first_name='Science Officer'),
+            _member('kane@berkeley.edu'),
+        ])
+        assert summary['restored'] == 1
+        assert summary['removed'] == 2
+        assert summary['unchanged'] == 1
+        assert set(_members_by_email(mailing_list.id)) == {'ash@berkeley.edu', 'kane@berkeley.edu'}
+
+        mailing_list = MailingList.find_by_canvas_site_id(1234567)
+        assert mailing_list.members_count == 2
+        assert mailing_list.populate_add_errors == 0
+        assert mailing_list.populate_remove_errors == 0
+        assert mailing_list.populated_at
+
+    def test_errors_are_counted_per_row(self, app, db_session):
+        mailing_list = MailingList.create(canvas_site_id=7654321, list_name='sulaco-crew')
+        summary = populate_mailing_list(mailing_list.id, [
+            _member('hicks@berkeley.edu'),
+            _member('hudson@berkeley.edu', last_name='x' * 256),
+            _member('vasquez@berkeley.edu'),
+            _member(''),
+        ])
+        assert summary['addErrors'] == 2
+        assert summary['membersCount'] == 2
+        assert set(_members_by_email(mailing_list.id)) == {'hicks@berkeley.edu', 'vasquez@berkeley.edu'}
+        assert MailingList.find_by_canvas_site_id(7654321).populate_add_errors == 2
+
+
+class TestRosterFingerprint:
+
+    def test_fingerprint(self):
+        roster = [_member('ash@berkeley.edu'), _member('dallas@berkeley.edu', can_send=True)]
+        fingerprint = roster_fingerprint(roster)
+        assert roster_fingerprint([_member('dallas@berkeley.edu', can_send=True), _member('ASH@berkeley.edu')]) == fingerprint
+        assert roster_fingerprint(roster + [_member('dallas@berkeley.edu')]) == fingerprint
+        assert roster_fingerprint([_member('ash@berkeley.edu'), _member('dallas@berkeley.edu')]) != fingerprint
+        assert roster_fingerprint([_member('ash@berkeley.edu', last_name='Hyperdyne'), roster[1]]) != fingerprint
+
+
+class TestSyncMailingLists:
+
+    def test_unchanged_sites_are_skipped(self, app, db_session):
+        rosters = {
+            1111111: [_member('ash@berkeley.edu'), _member('dallas@berkeley.edu')],
+            2222222: [_member('hicks@berkeley.edu'), _member('hudson@berkeley.edu', last_name='x' * 256)],
+            3333333: [_member('ripley@berkeley.edu')],
+        }
+        for canvas_site_id in rosters:
+            MailingList.create(canvas_site_id=canvas_site_id)
+        summary = sync_mailing_lists(lambda canvas_site_id: rosters[canvas_site_id])
+        assert summary['populated'] == 3
+        assert summary['skipped'] == 0
+        # The list with an add error stored no fingerprint and is retried.
+        assert MailingList.find_by_canvas_site_id(2222222).roster_fingerprint is None
+
+        rosters[3333333].append(_member('jones@berkeley.edu'))
+        summary = sync_mailing_lists(lambda canvas_site_id: rosters[canvas_site_id])
+        assert summary['populated'] == 2
+        assert summary['skipped'] == 1
+        assert summary['secondsSavedEstimate'] >= 0
+        assert set(_members_by_email(MailingList.find_by_canvas_site_id(3333333).id)) == {
+            'jones@berkeley.edu',
+            'ripley@berkeley.edu',
+        }
+
+        summary = sync_mailing_lists(lambda canvas_site_id: rosters[canvas_site_id], force=True)
+        assert summary['populated'] == 3
+
+    def test_failed_site_does_not_stop_the_run(self, app, db_session):
+        rosters = {
+            1111111: [_member('ash@berkeley.edu')],
+            3333333: [_member('ripley@berkeley.edu')],
+        }
+        for canvas_site_id in (1111111, 2222222, 3333333):
+            MailingList.create(canvas_site_id=canvas_site_id)
+        # No roster for the second site: as when Canvas returns a 404 for a deleted site.
+        summary = sync_mailing_lists(lambda canvas_site_id: rosters[canvas_site_id])
+        assert summary['failed'] == 1
+        assert summary['populated'] == 2
+        assert set(_members_by_email(MailingList.find_by_canvas_site_id(3333333).id)) == {'ripley@berkeley.edu'}
+
+    def test_failed_site_is_rolled_back(self, app, db_session, monkeypatch):
+        for canvas_site_id in (1111111, 2222222, 3333333):
+            MailingList.create(canvas_site_id=canvas_site_id)
+        failing_id = MailingList.find_by_canvas_site_id(2222222).id
+        update_population_stats = MailingList.update_population_stats
+
+        def _update_population_stats(mailing_list_id, **kwargs):
+            if mailing_list_id == failing_id:
+                # Members are written by now. The failed statement aborts the transaction, up to the site's savepoint.
+                db.session.execute(db.text('SELECT 1 / 0'))
+            update_population_stats(mailing_list_id=mailing_list_id, **kwargs)
+        monkeypatch.setattr(MailingList, 'update_population_stats', _update_population_stats)
+        summary = sync_mailing_lists(lambda canvas_site_id: [_member(f'{canvas_site_id}@berkeley.edu')])
+        assert summary['failed'] == 1
+        assert summary['populated'] == 2
+        assert _members_by_email(failing_id) == {}
+        assert set(_members_by_email(MailingList.find_by_canvas_site_id(3333333).id)) == {'3333333@berkeley.edu'}
+
+
+class TestCanvasSiteRoster:
+
+    def test_roster(self, app):
+        assert get_canvas_site_roster(1010101) == [
+            {'can_send': True, 'email_address': 'dallas@berkeley.edu', 'first_name': 'Arthur', 'last_name': 'Dallas'},
+            {'can_send': False, 'email_address': 'kane@berkeley.edu', 'first_name': 'Gilbert', 'last_name': 'Kane'},
+        ]
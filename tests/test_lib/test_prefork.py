@@ -0,0 +1,142 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+from ripley.lib import prefork
+from ripley.lib.metrics import registry as metrics_registry
+from ripley.lib.prefork import PooledWSGIServer, warm_up
+
+SERVE_SCRIPT = """
+import sys
+from ripley.factory import create_app
+from ripley.lib.prefork import serve
+serve(create_app(), workers=2, threads=2, host='127.0.0.1', port=int(sys.argv[1]))
+"""
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _children(pid):
+    with open(f'/proc/{pid}/task/{pid}/children') as file:
+        return {int(child) for child in file.read().split()}
+
+
+def _wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except OSError:
+            pass
+        time.sleep(0.05)
+    return False
+
+
+class TestPooledWSGIServer:
+
+    def test_bounded_threads(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def _app(environ, start_response):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.1)
+            with lock:
+                active.pop()
+            start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '2')])
+            return [b'ok']
+
+        server = PooledWSGIServer('127.0.0.1', 0, _app, threads=2)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            url = f'http://127.0.0.1:{server.port}/'
+            responses = []
+            clients = [threading.Thread(target=lambda: responses.append(urllib.request.urlopen(url).read())) for _ in range(6)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert responses == [b'ok'] * 6
+        assert max(peak) == 2
+
+
+class TestWarmUp:
+
+    def test_shared_state_is_loaded(self, app):
+        warm_up(app)
+        assert all(module in sys.modules for module in prefork.WARM_UP_MODULES)
+        # Built by create_app, before any fork.
+        assert app.extensions['front_end_shell'].etag
+
+    def test_metrics_reset(self):
+        metrics_registry.inc('ripley_cache_requests_total', (('namespace', 'prefork'), ('result', 'hit')))
+        metrics_registry.reset()
+        assert not any(labels == [['namespace', 'prefork'], ['result', 'hit']] for _, labels, _ in metrics_registry.snapshot()['counters'])
+
+
+class TestServe:
+
+    def test_forked_workers(self, app):
+        port = _free_port()
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        master = subprocess.Popen([sys.executable, '-c', SERVE_SCRIPT, str(port)], cwd=root)
+        try:
+            url = f'http://127.0.0.1:{port}/api/config'
+            assert _wait_for(lambda: urllib.request.urlopen(url).status == 200)
+            assert _wait_for(lambda: len(_children(master.pid)) == 2)
+            workers = _children(master.pid)
+
+            # A worker that dies is replaced.
+            killed = workers.pop()
+            os.kill(killed, signal.SIGKILL)
+            assert _wait_for(lambda: len(_children(master.pid)) == 2 and killed not in _children(master.pid))
+            assert urllib.request.urlopen(url).status == 200
+
+            master.send_signal(signal.SIGTERM)
+            assert master.wait(timeout=30) == 0
+        finally:
+            if master.poll() is None:
+                master.kill()
+                master.wait()
@@ -0,0 +1,79 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import csv
+import gzip
+
+from ripley import stream_query
+from ripley.lib.sis_import_csv import ChunkedCsvWriter, ENROLLMENTS_CSV_HEADER, export_query_to_csv
+
+ENROLLMENTS_SQL = """SELECT 'CRS:' || (n % 7) AS course_id, 'UID:' || n AS user_id, 'student' AS role,
+    'SEC:' || (n % 7) AS section_id, 'active' AS status
+    FROM generate_series(1, :count) AS n ORDER BY n"""
+
+
+def _read_csv(path):
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', newline='') as file:
+        return list(csv.reader(file))
+
+
+class TestSisImportCsv:
+
+    def test_stream_query(self, app, db_session):
+        rows = stream_query(ENROLLMENTS_SQL, {'count': 2500}, yield_per=1000)
+        assert next(rows).user_id == 'UID:1'
+        assert sum(1 for _ in rows) == 2499
+
+    def test_export_splits_files(self, app, db_session, tmp_path):
+        summary = export_query_to_csv(ENROLLMENTS_SQL, str(tmp_path), 'enrollments', params={'count': 1000}, max_bytes=10000)
+        assert summary['rows'] == 1000
+        assert len(summary['files']) > 1
+        rows = []
+        for path in summary['files']:
+            assert path.endswith('.csv')
+            assert tmp_path.joinpath(path).stat().st_size <= 10000
+            file_rows = _read_csv(path)
+            assert file_rows[0] == ENROLLMENTS_CSV_HEADER
+            rows += file_rows[1:]
+        assert [r[1] for r in rows] == [f'UID:{n}' for n in range(1, 1001)]
+
+    def test_gzip(self, app, db_session, tmp_path):
+        summary = export_query_to_csv(ENROLLMENTS_SQL, str(tmp_path), 'enrollments', params={'count': 100}, compress=True)
+        assert len(summary['files']) == 1
+        assert summary['files'][0].endswith('enrollments-001.csv.gz')
+        rows = _read_csv(summary['files'][0])
+        assert len(rows) == 101
+        assert rows[1] == ['CRS:1', 'UID:1', 'student', 'SEC:1', 'active']
+
+    def test_empty_set_has_header(self, app, tmp_path):
+        with ChunkedCsvWriter(str(tmp_path), 'enrollments', header=ENROLLMENTS_CSV_HEADER) as writer:
+            writer.writerows([])
+        assert _read_csv(writer.paths[0]) == [ENROLLMENTS_CSV_HEADER]
+
+    def test_oversized_row_gets_its_own_file(self, app, tmp_path):
+        with ChunkedCsvWriter(str(tmp_path), 'users', header=['user_id', 'name'], max_bytes=30) as writer:
+            writer.writerows([['1', 'Ash'], ['2', 'x' * 50], ['3', 'Bishop']])
+        assert [len(_read_csv(path)) for path in writer.paths] == [2, 2, 2]
@@ -0,0 +1,90 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import csv
+
+from ripley.lib.sis_import_delta import diff_snapshots, EnrollmentDelta, write_snapshot
+
+
+def _enrollment(user_id, section_id='SEC:1', role='student', course_id='CRS:1', status='active'):
+    return [course_id, user_id, role, section_id, status]
+
+
+def _read_rows(paths):
+    rows = []
+    for path in paths:
+        with open(path, newline='') as file:
+            rows += list(csv.reader(file))[1:]
+    return rows
+
+
+class TestSisImportDelta:
+
+    def test_diff_snapshots(self, tmp_path):
+        previous_path = str(tmp_path / 'previous.db')
+        current_path = str(tmp_path / 'current.db')
+        assert write_snapshot(previous_path, [
+            _enrollment('UID:1'),
+            _enrollment('UID:2'),
+            _enrollment('UID:3'),
+            _enrollment('UID:4', section_id='SEC:2', course_id='CRS:2'),
+        ]) == 4
+        assert write_snapshot(current_path, [
+            _enrollment('UID:3'),
+            _enrollment('UID:1'),
+            _enrollment('UID:1'),
+            _enrollment('UID:1', role='ta'),
+            _enrollment('UID:4', section_id='SEC:2', course_id='CRS:3'),
+            _enrollment('UID:5'),
+            _enrollment('UID:6', status='deleted'),
+        ]) == 5
+        assert list(diff_snapshots(previous_path, current_path)) == [
+            ('add', ('SEC:1', 'UID:1', 'ta', 'CRS:1')),
+            ('drop', ('SEC:1', 'UID:2', 'student', 'CRS:1')),
+            ('add', ('SEC:1', 'UID:5', 'student', 'CRS:1')),
+            ('drop', ('SEC:2', 'UID:4', 'student', 'CRS:2')),
+            ('add', ('SEC:2', 'UID:4', 'student', 'CRS:3')),
+        ]
+
+    def test_export_and_commit(self, app, tmp_path):
+        snapshot_path = str(tmp_path / 'enrollments.db')
+        delta = EnrollmentDelta(snapshot_path)
+        summary = delta.export([_enrollment(f'UID:{n}') for n in range(100)], str(tmp_path), 'full')
+        assert summary['full'] is True
+        assert summary['added'] == 100
+        delta.commit()
+
+        summary = delta.export([_enrollment(f'UID:{n}') for n in range(1, 101)], str(tmp_path), 'delta')
+        assert summary['full'] is False
+        assert summary['enrollments'] == 100
+        assert _read_rows(summary['files']) == [
+            ['CRS:1', 'UID:0', 'student', 'SEC:1', 'deleted'],
+            ['CRS:1', 'UID:100', 'student', 'SEC:1', 'active'],
+        ]
+        # Not committed: the next delta is still against the first set.
+        delta.discard()
+        summary = delta.export([_enrollment(f'UID:{n}') for n in range(100)], str(tmp_path), 'unchanged')
+        assert summary['added'] == summary['dropped'] == 0
+        assert _read_rows(summary['files']) == []
@@ -0,0 +1,95 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+import os
+
+from ripley.lib import startup
+from ripley.lib.startup import load_environment, parse_env_file, StartupTimer
+
+
+class TestParseEnvFile:
+
+    def test_eb_format(self):
+        lines = [
+            'export RIPLEY_ENV="production"',
+            'export EMPTY=""',
+            'PLAIN=value',
+            '# comment',
+            '',
+        ]
+        assert parse_env_file(lines) == {'EMPTY': '', 'PLAIN': 'value', 'RIPLEY_ENV': 'production'}
+
+    def test_shell_quoting(self):
+        lines = [
+            'export QUOTED="say \\"hello\\""',
+            "SINGLE='a b  c'",
+            'export A=1 B=2',
+            'export UNBALANCED="oops',
+        ]
+        assert parse_env_file(lines) == {'A': '1', 'B': '2', 'QUOTED': 'say "hello"', 'SINGLE': 'a b  c'}
+
+
+class TestLoadEnvironment:
+
+    def test_env_file(self, tmp_path, monkeypatch):
+        path = tmp_path / 'env'
+        path.write_text('export RIPLEY_TEST_STARTUP="from file"\n')
+        monkeypatch.delenv('RIPLEY_TEST_STARTUP', raising=False)
+        monkeypatch.setenv('RIPLEY_ENV_FILE', str(path))
+        assert load_environment() == 1
+        assert os.environ['RIPLEY_TEST_STARTUP'] == 'from file'
+
+    def test_shell_fallback(self, tmp_path, monkeypatch):
+        calls = []
+
+        def _shell_environment():
+            calls.append(True)
+            return {'RIPLEY_TEST_STARTUP': 'from shell'}
+        monkeypatch.setattr(startup, '_shell_environment', _shell_environment)
+        monkeypatch.delenv('RIPLEY_TEST_STARTUP', raising=False)
+        assert load_environment(str(tmp_path / 'missing')) == 1
+        assert calls
+        assert os.environ['RIPLEY_TEST_STARTUP'] == 'from shell'
+
+
+class TestStartupTimer:
+
+    def test_phases(self):
+        timer = StartupTimer()
+        with timer.phase('first'):
+            pass
+        try:
+            with timer.phase('second'):
+                raise ValueError
+        except ValueError:
+            pass
+        feed = timer.to_api_json()
+        assert [phase['name'] for phase in feed['phases']] == ['first', 'second']
+        assert feed['totalSeconds'] >= sum(phase['seconds'] for phase in feed['phases'])
+
+    def test_app_records_phases(self, app):
+        names = [name for name, _ in app.extensions['startup_timer'].phases]
+        assert names[0] == 'load_configs'
+        assert 'register_routes' in names
@@ -0,0 +1,179 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import pytest
+from ripley import db
+from ripley.externals.fake_redis import FakeRedisServer
+from ripley.lib.cache import LRUCache, RedisBackend
+from ripley.lib.user_cache import get_user_profile, invalidate_user, user_cache_stats, UserCache
+from ripley.lib.util import utc_now
+from sqlalchemy import Column, DateTime, Integer, String
+from sqlalchemy.orm import declarative_base, Session
+
+
+class _UserData(declarative_base()):
+    __tablename__ = 'user_data'
+
+    id = Column(Integer, primary_key=True)  # noqa: A003
+    uid = Column(String(255), nullable=False)
+    preferred_name = Column(String(255), nullable=False)
+    created_at = Column(DateTime(timezone=True), default=utc_now)
+    updated_at = Column(DateTime(timezone=True), default=utc_now)
+
+
+class _CountingLoader:
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, uid):
+        self.calls.append(uid)
+        return {'uid': uid, 'name': f'UID {uid}'}
+
+
+class _DictBackend:
+
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl):  # noqa: A003
+        self.entries[key] = value
+
+    def delete(self, key):
+        self.entries.pop(key, None)
+
+
+class TestLRUCache:
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        assert cache.get('a') == 1
+        cache.set('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1
+        assert cache.get('c') == 3
+
+    def test_expires_entries(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr('ripley.lib.cache.time.monotonic', lambda: now[0])
+        cache = LRUCache(ttl=60)
+        cache.set('a', 1)
+        now[0] += 59
+        assert cache.get('a') == 1
+        now[0] += 2
+        assert cache.get('a') is None
+        assert len(cache) == 0
+
+
+class TestUserCache:
+
+    @pytest.fixture(autouse=True)
+    def clear_user_cache(self, app):
+        # Earlier tests may have cached these users' profiles, e.g. from the CalNet fixtures.
+        app.extensions['user_cache'].clear()
+
+    def test_memoized_within_request(self, app):
+        loader = _CountingLoader()
+        with app.test_request_context('/'):
+            for _ in range(3):
+                assert get_user_profile('2040', loader)['name'] == 'UID 2040'
+        with app.test_request_context('/'):
+            get_user_profile(2040, loader)
+        assert loader.calls == ['2040']
+
+    def test_invalidate(self, app):
+        loader = _CountingLoader()
+        with app.test_request_context('/'):
+            get_user_profile('1022796', loader)
+            invalidate_user('1022796')
+            get_user_profile('1022796', loader)
+        assert loader.calls == ['1022796', '1022796']
+
+    def test_invalidated_on_commit(self, app):
+        loader = _CountingLoader()
+        get_user_profile('61889', loader)
+        with db.engine.connect() as connection:
+            # The session joins an outer transaction, rolled back at the end of the test.
+            transaction = connection.begin()
+            session = Session(bind=connection)
+            user_data = _UserData(uid='61889', preferred_name='Parker')
+            session.add(user_data)
+            session.flush()
+            get_user_profile('61889', loader)
+            assert loader.calls == ['61889']
+            session.commit()
+            get_user_profile('61889', loader)
+            assert loader.calls == ['61889', '61889']
+            user_data.preferred_name = 'Brett'
+            session.flush()
+            session.rollback()
+            get_user_profile('61889', loader)
+            assert loader.calls == ['61889', '61889']
+            session.close()
+            if transaction.is_active:
+                transaction.rollback()
+
+    def test_hit_miss_counters(self, app):
+        before = user_cache_stats()
+        loader = _CountingLoader()
+        with app.test_request_context('/'):
+            get_user_profile('8675309', loader)
+            get_user_profile('8675309', loader)
+        with app.test_request_context('/'):
+            get_user_profile('8675309', loader)
+        after = user_cache_stats()
+        assert after['misses'] - before['misses'] == 1
+        assert after['requestHits'] - before['requestHits'] == 1
+        assert after['localHits'] - before['localHits'] == 1
+
+    def test_shared_backend(self):
+        backend = _DictBackend()
+        loader = _CountingLoader()
+        worker_1 = UserCache(max_size=10, ttl=60, backend=backend)
+        worker_2 = UserCache(max_size=10, ttl=60, backend=backend)
+        worker_1.get('61889', loader)
+        assert worker_2.get('61889', loader)['uid'] == '61889'
+        assert loader.calls == ['61889']
+        assert worker_2.stats()['sharedHits'] == 1
+        worker_2.invalidate('61889')
+        assert backend.get('user:61889') is None
+
+    def test_shared_key_is_prefixed_once(self):
+        with FakeRedisServer() as server:
+            backend = RedisBackend(f'redis://{server.host}:{server.port}/0', key_prefix='ripley:')
+            UserCache(max_size=10, ttl=60, backend=backend).get('61889', _CountingLoader())
+            assert backend.client.exists('ripley:user:61889')
+            assert not backend.client.exists('ripley:ripley:user:61889')
+
+    def test_anonymous_user_is_not_cached(self, client):
+        before = user_cache_stats()
+        assert client.get('/api/config').status_code == 200
+        after = user_cache_stats()
+        assert after['misses'] == before['misses']
+        assert after['size'] == before['size']
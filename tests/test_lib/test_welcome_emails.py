@@ -0,0 +1,100 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+
+from email import message_from_string
+
+from ripley import db
+from ripley.lib.mailing_lists import populate_mailing_list
+from ripley.lib.welcome_emails import send_welcome_emails
+from ripley.models.mailing_list_members import MailingListMembers
+from tests.util import create_mailing_list, override_config
+
+
+def _mailing_list(canvas_site_id, member_count, active=True):
+    return create_mailing_list(
+        canvas_site_id,
+        member_count,
+        welcome_email_active=active,
+        welcome_email_body='Hello $first_name, you are now on $list_name for $canvas_site_name.',
+        welcome_email_subject='Welcome to $list_name',
+    )
+
+
+class TestWelcomeEmails:
+
+    def test_batched_send(self, app, db_session, smtp_sink):
+        messages_before = len(smtp_sink.messages)
+        sessions_before = smtp_sink.session_count
+        mailing_list = _mailing_list(1357911, 25)
+        _mailing_list(2468101, 5, active=False)
+        with override_config(app, 'WELCOME_EMAIL_BATCH_SIZE', 10):
+            summary = send_welcome_emails()
+        assert summary['lists'] == 1
+        assert summary['sent'] == 25
+        assert summary['failed'] == 0
+        messages = smtp_sink.messages[messages_before:]
+        assert len(messages) == 25
+        # Connections are pooled, not opened per message.
+        assert smtp_sink.session_count - sessions_before <= app.config['SMTP_POOL_SIZE']
+
+        message = message_from_string(next(m['data'] for m in messages if m['recipients'] == ['student-7@berkeley.edu']))
+        assert message['Subject'] == 'Welcome to xeno-bio'
+        assert message.get_payload().strip() == 'Hello Student 7, you are now on xeno-bio for Xenomorph Biology.'
+        assert all(m.welcomed_at for m in MailingListMembers.get_mailing_list_members(mailing_list.id))
+
+        assert send_welcome_emails()['sent'] == 0
+
+    def test_placeholders_are_substituted_once(self, app, db_session, smtp_sink):
+        messages_before = len(smtp_sink.messages)
+        mailing_list = _mailing_list(1357911, 1)
+        mailing_list.canvas_site_name = 'Weyland-Yutani $first_name'
+        mailing_list.welcome_email_body = 'Hello $first_name, welcome to $canvas_site_name. Dues are $$5.'
+        db.session.flush()
+        assert send_welcome_emails(mailing_list.id)['sent'] == 1
+        message = message_from_string(smtp_sink.messages[messages_before]['data'])
+        assert message.get_payload().strip() == 'Hello Student 0, welcome to Weyland-Yutani $first_name. Dues are $5.'
+
+    def test_invalid_message_does_not_stop_the_run(self, app, db_session):
+        mailing_list = _mailing_list(1357911, 3)
+        db.session.execute(
+            db.text("UPDATE canvas_site_mailing_list_members SET email_address = 'bishop@berkeley.edu\nBcc: all@berkeley.edu' "
+                    "WHERE email_address = 'student-1@berkeley.edu'"),
+        )
+        summary = send_welcome_emails(mailing_list.id)
+        assert summary['sent'] == 2
+        assert summary['failed'] == 1
+
+    def test_new_and_removed_members(self, app, db_session):
+        mailing_list = _mailing_list(1357911, 3)
+        send_welcome_emails(mailing_list.id)
+        populate_mailing_list(mailing_list.id, [
+            {'can_send': False, 'email_address': 'student-0@berkeley.edu', 'first_name': 'Student 0', 'last_name': 'Hicks'},
+            {'can_send': False, 'email_address': 'newt@berkeley.edu', 'first_name': 'Newt', 'last_name': 'Jorden'},
+        ])
+        db.session.execute(
+            db.text("UPDATE canvas_site_mailing_list_members SET welcomed_at = NULL WHERE email_address = 'student-1@berkeley.edu'"),
+        )
+        # Only the new member: the un-welcomed member has been removed.
+        assert send_welcome_emails(mailing_list.id)['sent'] == 1
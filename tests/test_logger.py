@@ -0,0 +1,137 @@
+"""
+Copyright ©2022. The Regents of the University of California (Regents). All Rights Reserved.
+
+Permission to use, copy, modify, and distribute this software and its documentation
+for educational, research, and not-for-profit purposes, without fee and without a
+signed licensing agreement, is hereby granted, provided that the above copyright
+notice, this paragraph and the following two paragraphs appear in all copies,
+modifications, and distributions.
+
+Contact The Office of Technology Licensing, UC Berkeley, 2150 Shattuck Avenue,
+Suite 510, Berkeley, CA 94720-1620, (510) 643-7201, otl@berkeley.edu,
+http://ipira.berkeley.edu/industry-info for commercial licensing opportunities.
+
+IN NO EVENT SHALL REGENTS BE LIABLE TO ANY PARTY FOR DIRECT, INDIRECT, SPECIAL,
+INCIDENTAL, OR CONSEQUENTIAL DAMAGES, INCLUDING LOST PROFITS, ARISING OUT OF
+THE USE OF THIS SOFTWARE AND ITS DOCUMENTATION, EVEN IF REGENTS HAS BEEN ADVISED
+OF THE POSSIBILITY OF SUCH DAMAGE.
+
+REGENTS SPECIFICALLY DISCLAIMS ANY WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE. THE
+SOFTWARE AND ACCOMPANYING DOCUMENTATION, IF ANY, PROVIDED HEREUNDER IS PROVIDED
+"AS IS". REGENTS HAS NO OBLIGATION TO PROVIDE MAINTENANCE, SUPPORT, UPDATES,
+ENHANCEMENTS, OR MODIFICATIONS.
+"""
+import logging
+import queue
+import threading
+
+from ripley.lib.metrics import registry, render_snapshots
+from ripley.logger import access_log_location, ACCESS_LOGGER_NAME, BoundedQueueHandler, FlushingQueueListener, initialize_logger
+from tests.util import override_config
+
+
+class _CollectingHandler(logging.Handler):
+
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+        self.threads = set()
+
+    def emit(self, record):
+        self.threads.add(threading.current_thread().name)
+        self.lines.append(self.format(record))
+
+
+def _logger(name, handler):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.handlers = [handler]
+    logger.setLevel(logging.INFO)
+    return logger
+
+
+class TestQueueLogging:
+
+    def test_records_written_by_background_thread(self):
+        collector = _CollectingHandler()
+        collector.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+        log_queue = queue.Queue(maxsize=100)
+        listener = FlushingQueueListener(log_queue, collector, respect_handler_level=True)
+        listener.start()
+        logger = _logger('ripley.test.queue', BoundedQueueHandler(log_queue))
+        args = ['Ash']
+        logger.info('Hello, %s', args)
+        # The message is merged before the caller can mutate its args.
+        args.append('Bishop')
+        listener.stop()
+        assert collector.lines == ["INFO: Hello, ['Ash']"]
+        assert threading.current_thread().name not in collector.threads
+
+    def test_drop_policy(self):
+        log_queue = queue.Queue(maxsize=2)
+        handler = BoundedQueueHandler(log_queue)
+        logger = _logger('ripley.test.drop', handler)
+        for i in range(5):
+            logger.info(f'Record {i}')
+        assert handler.stats() == {'depth': 2, 'dropped': 3, 'maxSize': 2}
+
+    def test_block_policy_flushes_on_stop(self):
+        collector = _CollectingHandler()
+        log_queue = queue.Queue(maxsize=2)
+        listener = FlushingQueueListener(log_queue, collector)
+        listener.start()
+        handler = BoundedQueueHandler(log_queue, block=True)
+        logger = _logger('ripley.test.block', handler)
+        for i in range(50):
+            logger.info(f'Record {i}')
+        listener.stop()
+        assert handler.dropped == 0
+        assert len(collector.lines) == 50
+
+
+class TestInitializeLogger:
+
+    def test_listeners_are_replaced(self, app):
+        with override_config(app, 'LOGGING_QUEUE_ENABLED', True):
+            try:
+                initialize_logger(app)
+                first_listeners = [app.extensions[key].listener for key in ['logging_queue', 'access_log_queue']]
+                initialize_logger(app)
+                assert all(listener._thread is None for listener in first_listeners)
+                for name, key in [(None, 'logging_queue'), (ACCESS_LOGGER_NAME, 'access_log_queue')]:
+                    queue_handlers = [h for h in logging.getLogger(name).handlers if isinstance(h, BoundedQueueHandler)]
+                    assert queue_handlers == [app.extensions[key]]
+                    assert app.extensions[key].listener._thread.is_alive()
+            finally:
+                app.config['LOGGING_QUEUE_ENABLED'] = False
+                initialize_logger(app)
+        assert not [h for h in logging.getLogger().handlers if isinstance(h, BoundedQueueHandler)]
+
+    def test_queue_metrics(self, app):
+        with override_config(app, 'LOGGING_QUEUE_ENABLED', True):
+            try:
+                initialize_logger(app)
+                app.extensions['access_log_queue'].dropped = 3
+                text = render_snapshots([registry.snapshot()])
+            finally:
+                app.config['LOGGING_QUEUE_ENABLED'] = False
+                initialize_logger(app)
+        assert '# TYPE ripley_log_queue_depth gauge' in text
+        assert 'ripley_log_queue_depth{queue="logging_queue"}' in text
+        assert 'ripley_log_records_dropped_total{queue="access_log_queue"} 3' in text
+        assert 'ripley_log_records_dropped_total{queue="logging_queue"} 0' in text
+
+
+class TestAccessLogLocation:
+
+    def test_follows_logging_location(self, app):
+        with override_config(app, 'ACCESS_LOG_LOCATION', None):
+            with override_config(app, 'LOGGING_LOCATION', 'STDOUT'):
+                assert access_log_location(app) == 'STDOUT'
+            with override_config(app, 'LOGGING_LOCATION', '/var/log/ripley/ripley.log'):
+                assert access_log_location(app) == '/var/log/ripley/ripley-access.log'
+
+    def test_configured(self, app):
+        with override_config(app, 'ACCESS_LOG_LOCATION', '/tmp/access.log'):
+            assert access_log_location(app) == '/tmp/access.log'
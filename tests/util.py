@@ -24,6 +24,9 @@ ENHANCEMENTS, OR MODIFICATIONS.
 """
 from contextlib import contextmanager
 
+from ripley.lib.mailing_lists import populate_mailing_list
+from ripley.models.mailing_list import MailingList
+
 
 @contextmanager
 def override_config(app, key, value):
@@ -34,3 +37,17 @@ def override_config(app, key, value):
         yield
     finally:
         app.config[key] = old_value
+
+
+def create_mailing_list(canvas_site_id, member_count, list_name='xeno-bio', sender=None, **attributes):
+    """Create a populated mailing list of member_count members: the sender, if any, who may send to the list, then students."""
+    mailing_list = MailingList.create(canvas_site_id=canvas_site_id, canvas_site_name='Xenomorph Biology', list_name=list_name)
+    for key, value in attributes.items():
+        setattr(mailing_list, key, value)
+    roster = [{'can_send': True, 'email_address': sender, 'first_name': 'Ellen', 'last_name': 'Ripley'}] if sender else []
+    roster += [
+        {'can_send': False, 'email_address': f'student-{i}@berkeley.edu', 'first_name': f'Student {i}', 'last_name': 'Hicks'}
+        for i in range(member_count - len(roster))
+    ]
+    populate_mailing_list(mailing_list.id, roster)
+    return mailing_list